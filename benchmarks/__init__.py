@@ -0,0 +1 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
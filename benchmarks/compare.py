@@ -0,0 +1,61 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+"""
+Compares two result files of the benchmarks, for example of two revisions:
+
+    python -m benchmarks.compare before.json after.json
+"""
+
+import argparse
+import json
+
+keys = ("benchmark", "megapixels", "threads", "method", "preconditioner")
+
+
+def load(path):
+    """Reads the results of a JSON file, which have not been skipped
+
+    :param path: path of the JSON file
+    :return: (revision, dictionary of keys and seconds)
+    """
+    with open(path) as file:
+        data = json.load(file)
+    results = {
+        tuple(result.get(key) for key in keys): result["seconds"]
+        for result in data["results"]
+        if "skipped" not in result
+    }
+    return data.get("revision"), results
+
+
+def compare(before, after):
+    """Lines of a table with the seconds of both files and the speedup of the second one
+
+    :param before: dictionary of keys and seconds
+    :param after: dictionary of keys and seconds
+    :return: list of lines
+    """
+    lines = [
+        f"{'benchmark':40s} {'MP':>6s} {'threads':>7s} {'before':>10s} {'after':>10s} {'speedup':>8s}"
+    ]
+    for key in sorted(before.keys() & after.keys(), key=repr):
+        lines.append(
+            f"{key[0]:40s} {key[1]:6.2f} {key[2]:7d} {before[key]:10.4f} {after[key]:10.4f} "
+            f"{before[key] / after[key] if after[key] > 0 else float('inf'):8.2f}"
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("before", help="JSON result file")
+    parser.add_argument("after", help="JSON result file")
+    args = parser.parse_args()
+    revisionBefore, before = load(args.before)
+    revisionAfter, after = load(args.after)
+    print(f"before: {revisionBefore}\nafter:  {revisionAfter}")
+    print("\n".join(compare(before, after)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+"""
+Runs the solver headless with every configuration of method, preconditioner, kernel and pre- and post-iterations and
+records the iterations and the wall time until the relative error falls below each tolerance:
+
+    python -m benchmarks.convergence --sizes 0.25 1 --output convergence.json
+    python -m benchmarks.convergence --images canvas.png trimap.png --output convergence.json
+
+The results are written as JSON, the table is printed and written next to it and, if matplotlib is installed, the
+error curves of each image are plotted next to it.
+"""
+
+from benchmarks.util import makeImages, makeSolver, loadImages, save
+from model.enum import Method, Preconditioner, Kernel
+from time import perf_counter as time
+import argparse
+import os
+
+try:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+except ImportError:
+    plt = None
+
+tolerances = [4, 5, 6, 7]
+
+
+def configurations(methods, preconditioners, kernels, iterations):
+    """Combinations of the settings, the kernel and the pre- and post-iterations are only varied if a V-Cycle is used
+
+    :param methods: list of Method
+    :param preconditioners: list of Preconditioner, used by cgd
+    :param kernels: list of Kernel
+    :param iterations: list of (pre-iterations, post-iterations)
+    :return: list of dictionaries
+    """
+    result = []
+    for method in methods:
+        for preconditioner in preconditioners if method.isCgd() else [None]:
+            if method.isVcycle() or preconditioner and preconditioner.isVcycle():
+                for kernel in kernels:
+                    for preiter, postiter in iterations:
+                        result.append(
+                            {
+                                "method": method,
+                                "preconditioner": preconditioner,
+                                "kernel": kernel,
+                                "preiter": preiter,
+                                "postiter": postiter,
+                            }
+                        )
+            else:
+                result.append({"method": method, "preconditioner": preconditioner})
+    return result
+
+
+def name(configuration):
+    parts = [configuration["method"].name]
+    if configuration["preconditioner"] is not None:
+        parts[0] += "/" + configuration["preconditioner"].name
+    if "kernel" in configuration:
+        parts.append(configuration["kernel"].name)
+        parts.append(f"{configuration['preiter']}-{configuration['postiter']}")
+    return " ".join(parts)
+
+
+def converge(images, configuration, maxSeconds, maxIterations):
+    """Solves until the smallest tolerance or one of the limits is reached. Iterations are not chunked, such that the
+    iterations at which a tolerance is reached are exact.
+
+    :param images: (canvas, trimapPreview, alphaMatte), the alpha matte is not changed
+    :param configuration: dictionary of settings
+    :param maxSeconds: stop after this many seconds
+    :param maxIterations: stop after this many iterations
+    :return: dictionary with the history of (seconds, iterations, error) and the seconds spent building the Laplacian
+    """
+    canvas, trimapPreview, alphaMatte = images
+    solver = makeSolver(canvas, trimapPreview, alphaMatte.copy())
+    solver.setChunked(False)
+    solver.setRtol(max(tolerances))
+    solver.setMethod(configuration["method"])
+    if configuration["preconditioner"] is not None:
+        solver.setPreconditioner(configuration["preconditioner"])
+    if "kernel" in configuration:
+        solver.setKernel(configuration["kernel"])
+        solver.setPreIter(configuration["preiter"])
+        solver.setPostIter(configuration["postiter"])
+    laplacian = []
+    solver.laplacianBuilt.connect(lambda kind, seconds, nnz: laplacian.append(seconds))
+    history = []
+    start = time()
+    while True:
+        iterations = solver.telemetry.iteration
+        error = solver.solve()
+        elapsed = time() - start
+        if error is None:
+            break
+        history.append((elapsed, iterations, float(error)))
+        if (
+            error <= 10 ** -max(tolerances)
+            or elapsed >= maxSeconds
+            or iterations >= maxIterations
+        ):
+            break
+    solver.reset_pool()
+    return {"history": history, "laplacianSeconds": sum(laplacian)}
+
+
+def reached(history, tolerance):
+    """First entry of the history whose error is below 10^-tolerance
+
+    :param history: list of (seconds, iterations, error)
+    :param tolerance: exponent of the tolerance
+    :return: (seconds, iterations) or (None, None)
+    """
+    for seconds, iterations, error in history:
+        if error <= 10**-tolerance:
+            return seconds, iterations
+    return None, None
+
+
+def table(results):
+    """Formats the iterations and the seconds until each tolerance has been reached, excluding the construction of
+    the Laplacian
+
+    :param results: list of results
+    :return: list of lines
+    """
+    header = f"| {'image':24s} | {'configuration':28s} | {'L [s]':>7s} |"
+    header += "".join(f" {'1e-' + str(t):>16s} |" for t in tolerances)
+    lines = [
+        header,
+        "|" + "|".join("-" * len(c) for c in header.split("|")[1:-1]) + "|",
+    ]
+    for result in results:
+        line = f"| {result['image']:24s} | {result['configuration']:28s} | {result['laplacianSeconds']:7.2f} |"
+        for tolerance in tolerances:
+            seconds, iterations = reached(result["history"], tolerance)
+            if seconds is None:
+                cell = "-"
+            else:
+                seconds -= result["laplacianSeconds"]
+                cell = f"{iterations} it {seconds:.2f} s"
+            line += f" {cell:>16s} |"
+        lines.append(line)
+    return lines
+
+
+def plot(results, path):
+    """Plots the relative error over the iterations and over the seconds of every configuration of each image
+
+    :param results: list of results
+    :param path: path of the JSON file, the plots are written next to it
+    :return: list of written files
+    """
+    files = []
+    for image in dict.fromkeys(result["image"] for result in results):
+        figure, (byIterations, bySeconds) = plt.subplots(1, 2, figsize=(14, 6))
+        for result in results:
+            if result["image"] != image or not result["history"]:
+                continue
+            seconds, iterations, errors = zip(*result["history"])
+            byIterations.semilogy(iterations, errors, label=result["configuration"])
+            bySeconds.semilogy(
+                [s - result["laplacianSeconds"] for s in seconds],
+                errors,
+                label=result["configuration"],
+            )
+        for axis, label in [(byIterations, "iterations"), (bySeconds, "seconds")]:
+            for tolerance in tolerances:
+                axis.axhline(10**-tolerance, color="gray", linewidth=0.5)
+            axis.set_xlabel(label)
+            axis.set_ylabel("relative error")
+        byIterations.legend(fontsize="small")
+        figure.suptitle(image)
+        fileName = f"{os.path.splitext(path)[0]}-{image.replace(' ', '_')}.png"
+        figure.savefig(fileName, dpi=100)
+        plt.close(figure)
+        files.append(fileName)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=float,
+        nargs="*",
+        default=[0.25, 1],
+        help="sizes of generated images in megapixels",
+    )
+    parser.add_argument(
+        "--images",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("CANVAS", "TRIMAP"),
+        help="canvas and trimap files, may be given several times",
+    )
+    parser.add_argument(
+        "--methods",
+        nargs="+",
+        default=[method.name for method in Method],
+        choices=[method.name for method in Method],
+    )
+    parser.add_argument(
+        "--preconditioners",
+        nargs="+",
+        default=[preconditioner.name for preconditioner in Preconditioner],
+        choices=[preconditioner.name for preconditioner in Preconditioner],
+    )
+    parser.add_argument(
+        "--kernels",
+        nargs="+",
+        default=[kernel.name for kernel in Kernel],
+        choices=[kernel.name for kernel in Kernel],
+    )
+    parser.add_argument(
+        "--iterations",
+        nargs="+",
+        default=["1-1", "2-2"],
+        help="pre- and post-iterations of the V-Cycle as PRE-POST",
+    )
+    parser.add_argument(
+        "--max-seconds", type=float, default=60, help="time limit of a configuration"
+    )
+    parser.add_argument(
+        "--max-iterations",
+        type=int,
+        default=10000,
+        help="iteration limit of a configuration",
+    )
+    parser.add_argument("--output", default="convergence.json", help="JSON result file")
+    args = parser.parse_args()
+
+    images = []
+    for megapixels in args.sizes:
+        canvas, trimapPreview, alphaMatte = makeImages(megapixels)
+        images.append(
+            (f"{canvas.width()}x{canvas.height()}", (canvas, trimapPreview, alphaMatte))
+        )
+    for canvasPath, trimapPath in args.images:
+        canvas, trimapPreview, alphaMatte = loadImages(canvasPath, trimapPath)
+        images.append(
+            (
+                f"{os.path.basename(canvasPath)} {canvas.width()}x{canvas.height()}",
+                (canvas, trimapPreview, alphaMatte),
+            )
+        )
+    grid = configurations(
+        [Method[method] for method in args.methods],
+        [Preconditioner[preconditioner] for preconditioner in args.preconditioners],
+        [Kernel[kernel] for kernel in args.kernels],
+        [tuple(int(i) for i in pair.split("-")) for pair in args.iterations],
+    )
+
+    results = []
+    for imageName, imageSet in images:
+        for configuration in grid:
+            result = converge(
+                imageSet, configuration, args.max_seconds, args.max_iterations
+            )
+            results.append(
+                {
+                    "image": imageName,
+                    "configuration": name(configuration),
+                    **{
+                        key: value.name if hasattr(value, "name") else value
+                        for key, value in configuration.items()
+                    },
+                    **result,
+                }
+            )
+            print(table(results)[-1], flush=True)
+            save(args.output, results)
+
+    lines = table(results)
+    print("\n".join(lines))
+    with open(os.path.splitext(args.output)[0] + ".md", "w") as file:
+        file.write("\n".join(lines) + "\n")
+    if plt is None:
+        print("matplotlib is not installed, no plots have been written")
+    else:
+        for fileName in plot(results, args.output):
+            print(f"wrote {fileName}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+"""
+Times the kernels of the solver and one iteration of every method and preconditioner on generated images of several
+sizes and for several numbers of numba threads:
+
+    python -m benchmarks.kernels --sizes 0.25 1 4 --threads 1 4 --output kernels.json
+
+Sizes whose estimated memory exceeds the available memory are recorded as skipped. Two result files are compared with
+benchmarks.compare.
+"""
+
+from benchmarks.util import (
+    shapeOf,
+    makeImages,
+    makeSolver,
+    availableMemory,
+    measure,
+    save,
+)
+from model.misc.solver import sp_dot_, cgd_
+from model.enum import Method, Preconditioner
+from pymatting import cf_laplacian
+import argparse
+import numba
+
+combinations = [(Method.cgd, preconditioner) for preconditioner in Preconditioner]
+combinations += [(Method.vcycle, None), (Method.schwarz, None)]
+
+
+def defaultThreads():
+    """Powers of two up to the number of threads numba has been started with
+
+    :return: list of thread counts
+    """
+    maximum = numba.config.NUMBA_NUM_THREADS
+    threads = [2**i for i in range(maximum.bit_length()) if 2**i < maximum]
+    return threads + [maximum]
+
+
+def benchmarkSize(megapixels, threads, repeats, memoryLimit):
+    """Runs all benchmarks on images of the given size
+
+    :param megapixels: size of the images
+    :param threads: list of thread counts
+    :param repeats: number of measured calls of each benchmark
+    :param memoryLimit: sizes whose estimated memory exceeds this number of bytes are skipped, None to run all sizes
+    :return: list of results
+    """
+    h, w = shapeOf(megapixels)
+    size = {"megapixels": megapixels, "height": h, "width": w}
+    solver = makeSolver(*makeImages(megapixels))
+    estimate = solver.get_memory_estimate()
+    if memoryLimit is not None and estimate > memoryLimit:
+        reason = (
+            f"estimated {estimate / 1e9:.1f} GB exceed "
+            f"the available {memoryLimit / 1e9:.1f} GB"
+        )
+        print(f"{megapixels:6.2f} MP skipped: {reason}", flush=True)
+        return [{**size, "skipped": reason}]
+
+    results = []
+
+    def run(name, function, thread, method=None, preconditioner=None):
+        times = measure(function, repeats)
+        results.append(
+            {
+                **size,
+                "benchmark": name,
+                "threads": thread,
+                "method": method.name if method else None,
+                "preconditioner": preconditioner.name if preconditioner else None,
+                "seconds": min(times),
+                "times": times,
+            }
+        )
+        print(
+            f"{megapixels:6.2f} MP {thread:3d} threads {name:40s} {min(times):10.4f} s",
+            flush=True,
+        )
+
+    # the construction runs before the solver holds its own Laplacian
+    for thread in threads:
+        numba.set_num_threads(thread)
+        run(
+            "cf_laplacian",
+            lambda: cf_laplacian(
+                solver.canvas, solver.get_epsilon(), solver.get_radius()
+            ),
+            thread,
+        )
+
+    A = solver.get_A()
+    csr = (A.data, A.indices, A.indptr, A.shape)
+    alpha = solver.get_alpha()
+    r = solver.get_r()
+    shape = solver.get_shape()
+    kernel = solver.get_kernel()[1]
+    P, PT = solver.make_P(shape, kernel, A.dtype)
+    cache = {}
+    kernels = {
+        "sp_dot_": lambda: sp_dot_(csr, r),
+        "cgd_": lambda: cgd_(csr, alpha, r, r),
+        "vcycle": lambda: solver.vcycle(
+            A, r, shape, kernel, cache, solver.get_pre_iter(), solver.get_post_iter()
+        ),
+        "make_P": lambda: solver.make_P(shape, kernel, A.dtype),
+        "galerkin": lambda: solver.make_A_small(P, A, PT),
+    }
+    for thread in threads:
+        numba.set_num_threads(thread)
+        for name, function in kernels.items():
+            run(name, function, thread)
+    del A, csr, P, PT, cache, kernels
+
+    for thread in threads:
+        numba.set_num_threads(thread)
+        solver.setSchwarzWorkers(thread)
+        for method, preconditioner in combinations:
+            solver.setMethod(method)
+            if preconditioner is not None:
+                solver.setPreconditioner(preconditioner)
+            name = f"iterate {method.name}"
+            if preconditioner is not None:
+                name += f" {preconditioner.name}"
+            run(name, solver.iterate, thread, method, preconditioner)
+    solver.reset_pool()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=float,
+        nargs="+",
+        default=[0.25, 1, 4, 10, 40],
+        help="sizes of the images in megapixels",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        default=defaultThreads(),
+        help="numbers of numba threads and Schwarz workers",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="measured calls of each benchmark"
+    )
+    parser.add_argument(
+        "--memory",
+        type=float,
+        default=None,
+        help="skip sizes whose estimated memory exceeds this many GB, "
+        "defaults to the available memory",
+    )
+    parser.add_argument("--output", default="kernels.json", help="JSON result file")
+    args = parser.parse_args()
+    memoryLimit = args.memory * 1e9 if args.memory else availableMemory()
+    results = []
+    for megapixels in args.sizes:
+        results += benchmarkSize(megapixels, args.threads, args.repeats, memoryLimit)
+        save(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
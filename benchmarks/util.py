@@ -0,0 +1,166 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+from PyQt5 import QtCore as qtc
+from PyQt5 import QtGui as qtg
+from model.misc import Image, Solver
+from model.util import ndarrayToImage, grayToImage, trimapToRgba
+from threading import Event
+from queue import Queue
+from time import perf_counter as time
+from datetime import datetime
+import subprocess
+import platform
+import numba
+import numpy as np
+import scipy
+import json
+import os
+import config.config
+
+
+def shapeOf(megapixels):
+    """Height and width of a 4:3 image with the given number of megapixels
+
+    :param megapixels: size of the image
+    :return: (height, width)
+    """
+    h = int(round(np.sqrt(megapixels * 1e6 * 3 / 4)))
+    return h, int(round(h * 4 / 3))
+
+
+def makeImages(megapixels, seed=0):
+    """Generates a canvas with a noisy foreground blob in front of a colour gradient, the trimap of the blob with an
+    unknown band around its border and an empty alpha matte. The same seed gives the same images, such that the
+    benchmarks run offline and their results are comparable between revisions.
+
+    :param megapixels: size of the images
+    :param seed: seed of the noise
+    :return: (canvas, trimapPreview, alphaMatte)
+    """
+    h, w = shapeOf(megapixels)
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:h, 0:w] / max(h, w)
+    cy, cx = h / (2 * max(h, w)), w / (2 * max(h, w))
+    angle = np.arctan2(y - cy, x - cx)
+    # wavy border, such that the unknown band contains edges of every direction
+    distance = np.hypot(y - cy, x - cx) / (0.3 + 0.03 * np.sin(7 * angle))
+    foreground = distance < 1
+    rgb = np.empty((h, w, 3))
+    rgb[..., 0] = 40 + 150 * x
+    rgb[..., 1] = 90 + 100 * y
+    rgb[..., 2] = 200 - 80 * x
+    rgb[foreground] = [200, 80, 40]
+    rgb += rng.normal(0, 12, rgb.shape)
+    canvas = ndarrayToImage(np.clip(rgb, 0, 255).astype(np.uint8)).convertToFormat(
+        Image.Format_ARGB32
+    )
+    trimap = np.full((h, w), 160, dtype=np.uint8)
+    trimap[distance < 0.9] = 255
+    trimap[distance > 1.1] = 0
+    trimapPreview = trimapToRgba(grayToImage(trimap)).convertToFormat(
+        Image.Format_ARGB32
+    )
+    alphaMatte = Image.full(canvas.size(), qtc.Qt.black, qtg.QImage.Format_Grayscale8)
+    return canvas, trimapPreview, alphaMatte
+
+
+class NoWaitEvent(Event):
+    """Continue event of a solver without thread, which returns from solve once the tolerance has been reached
+    instead of waiting for new events"""
+
+    def wait(self, timeout=None):
+        return False
+
+
+def makeSolver(canvas, trimapPreview, alphaMatte):
+    """Creates a solver without starting its thread. Its methods, including solve, are called directly.
+
+    :param canvas: canvas image
+    :param trimapPreview: rgba trimap
+    :param alphaMatte: grayscale alpha matte
+    :return: Solver
+    """
+    return Solver(canvas, trimapPreview, alphaMatte, Queue(), NoWaitEvent())
+
+
+def loadImages(canvasPath, trimapPath):
+    """Loads a canvas and its grayscale trimap from files
+
+    :param canvasPath: path of the canvas
+    :param trimapPath: path of the trimap
+    :return: (canvas, trimapPreview, alphaMatte)
+    """
+    canvas = Image(canvasPath).convertToFormat(Image.Format_ARGB32)
+    trimapPreview = trimapToRgba(Image(trimapPath)).convertToFormat(Image.Format_ARGB32)
+    alphaMatte = Image.full(canvas.size(), qtc.Qt.black, qtg.QImage.Format_Grayscale8)
+    return canvas, trimapPreview, alphaMatte
+
+
+def availableMemory():
+    """Bytes of physical memory that are currently available, None if the platform does not tell
+
+    :return: bytes or None
+    """
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def measure(function, repeats):
+    """Calls function once to compile and warm up the caches and then measures 'repeats' calls
+
+    :param function: function without arguments
+    :param repeats: number of measured calls
+    :return: list of durations in seconds
+    """
+    function()
+    times = []
+    for i in range(repeats):
+        start = time()
+        function()
+        times.append(time() - start)
+    return times
+
+
+def environment():
+    """Describes the revision and the machine the benchmarks ran on
+
+    :return: dictionary
+    """
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        revision = ""
+    return {
+        "revision": revision or None,
+        "date": datetime.now().isoformat(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "numba": numba.__version__,
+        "config": {
+            "parallel": config.config.parallel,
+            "cache": config.config.cache,
+            "nogil": config.config.nogil,
+        },
+    }
+
+
+def save(path, results):
+    """Writes the results together with the environment into a JSON file
+
+    :param path: path of the JSON file
+    :param results: list of dictionaries
+    :return: None
+    """
+    with open(path, "w") as file:
+        json.dump({**environment(), "results": results}, file, indent=1)
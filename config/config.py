@@ -3,9 +3,12 @@
 
 """
 Enable/disable parallelism, caching and nogil. The program needs to be restarted to take effect since these options
-only effect numba functions which need to be recompiled.
+only effect numba functions which need to be recompiled. The same holds for running the solver in its own process.
 """
 
 parallel = True
 cache = True
 nogil = True
+
+# Run the solver in a separate process, whose images live in shared memory, instead of a thread of the GUI process
+solverProcess = False
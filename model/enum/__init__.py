@@ -7,5 +7,7 @@ from .mode import *
 from .preconditioner import *
 from .reason import *
 from .kernel import *
+from .laplacian import *
 from .reason import *
 from .status import *
+from .storage import *
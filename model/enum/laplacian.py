@@ -0,0 +1,37 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+from enum import Enum
+
+
+class Laplacian(Enum):
+    closedForm = (0,)
+    knn = (1,)
+    randomWalk = (2,)
+    learningBased = (3,)
+    largeKernel = 4
+
+    def isClosedForm(self):
+        return self == Laplacian.closedForm
+
+    def isKnn(self):
+        return self == Laplacian.knn
+
+    def isRandomWalk(self):
+        return self == Laplacian.randomWalk
+
+    def isLearningBased(self):
+        return self == Laplacian.learningBased
+
+    def isLargeKernel(self):
+        return self == Laplacian.largeKernel
+
+    def hasWindows(self):
+        """The closed-form and the large kernel Laplacian are the same matrix, which also has a matrix free and a
+        stencil form"""
+        return self.isClosedForm() or self.isLargeKernel()
+
+    def isLocal(self):
+        """All Laplacians but the KNN Laplacian only connect pixels that are at most 2 * radius apart, such that the
+        rows of a tile that are that far from its border are the same for the Laplacian of the tile and of the image
+        """
+        return not self.isKnn()
@@ -5,10 +5,14 @@ from enum import Enum
 
 class Method(Enum):
     cgd = (0,)
-    vcycle = 1
+    vcycle = (1,)
+    schwarz = 2
 
     def isCgd(self):
         return self == Method.cgd
 
     def isVcycle(self):
         return self == Method.vcycle
+
+    def isSchwarz(self):
+        return self == Method.schwarz
@@ -19,4 +19,21 @@ class Reason(Enum):
     trimapPreviewChanged = (14,)
     trimapPreviewUpdated = (15,)
     imagesChanged = (16,)
-    printErrorChanged = 17
+    printErrorChanged = (17,)
+    fusedChanged = (18,)
+    chunkedChanged = (19,)
+    timeBudgetChanged = (20,)
+    reducedChanged = (21,)
+    storageChanged = (22,)
+    singlePrecisionChanged = (23,)
+    refinementChanged = (24,)
+    progressiveChanged = (25,)
+    schwarzTileSizeChanged = (26,)
+    schwarzWorkersChanged = (27,)
+    projectPathChanged = (28,)
+    laplacianChanged = (29,)
+    previewChanged = (30,)
+    localSolveChanged = (31,)
+    telemetryLogChanged = (32,)
+    backgroundRebuildChanged = 33
+    projectSaved = (34,)
@@ -0,0 +1,18 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+from enum import Enum
+
+
+class Storage(Enum):
+    csr = (0,)
+    stencil = (1,)
+    matrixFree = 2
+
+    def isCsr(self):
+        return self == Storage.csr
+
+    def isStencil(self):
+        return self == Storage.stencil
+
+    def isMatrixFree(self):
+        return self == Storage.matrixFree
@@ -1,10 +1,17 @@
 # Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
 from .image import *
+from .sharedimage import *
 from .adjustingrect import *
 from .cutoutrect import *
 from .screenshot import *
 from .undostack import *
+from .stencilmatrix import *
+from .cflaplacian import *
+from .laplacian import *
+from .diskcache import *
+from .telemetry import *
 from .solver import *
+from .solverprocess import *
 from .controller import *
 from .project import *
 from .filenamevalidator import *
@@ -0,0 +1,394 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+from numba import njit, prange
+from numba.core.types import f8, i8, Tuple, void
+import numpy as np
+import scipy.sparse
+import config.config
+from model.misc.stencilmatrix import StencilMatrix
+
+
+class CfLaplacianOperator:
+    """Matrix free version of pymatting's closed-form Laplacian plus a data term: A@x = L@x + c * x.
+
+    Instead of the (4r+1)^2 entries per pixel of the sparse matrix, only the mean color and the inverse of the
+    regularized covariance matrix of every window are stored, which are calculated once from the image. L@x is then
+    evaluated on the fly in two passes, the first one over the windows and the second one over the pixels.
+    """
+
+    def __init__(self, image, epsilon, radius, c=None, windows=None):
+        """
+        :param image: normalized rgb image of shape (h, w, 3)
+        :param epsilon: regularization of the covariance matrices
+        :param radius: radius of the windows
+        :param c: data term, zero if None
+        :param windows: (means, inverse covariances) of another operator of the same image
+        """
+        h, w, _ = image.shape
+        self.image = image
+        self.epsilon = epsilon
+        self.radius = radius
+        self.shape = (h * w, h * w)
+        self.mu, self.inv = (
+            cf_windows_(image, epsilon, radius) if windows is None else windows
+        )
+        self.c = np.zeros((h * w,)) if c is None else c
+        self.ab = None if self.mu is None else np.zeros((h, w, 4))
+
+    def shifted(self, c):
+        """Returns the operator L + diag(c), which shares the windows with this operator
+
+        :param c: data term
+        :return: CfLaplacianOperator
+        """
+        return CfLaplacianOperator(
+            self.image, self.epsilon, self.radius, c, (self.mu, self.inv)
+        )
+
+    def tuple(self):
+        return self.image, self.mu, self.inv, self.c, self.ab, self.radius
+
+    def dot(self, x):
+        result = np.empty_like(x)
+        cf_dot_(self.tuple(), x, result)
+        return result
+
+    def diagonal(self):
+        return cf_diag_(self.tuple())
+
+    def squaredSum(self, cols=None):
+        """Returns the sum of the squared entries of each row, which equals the column sums since L is symmetric
+
+        :param cols: columns or None for all columns
+        :return: (A.multiply(A)).sum(axis=0)[cols]
+        """
+        result = cf_squared_sum_(self.tuple())
+        return result if cols is None else result[cols]
+
+    def crop(self, rows):
+        """Returns the operator of the part of the image around the given rows. It extends their bounding box by 2r
+        pixels, such that it contains every window that overlaps one of the rows and their rows are the same as the
+        ones of this operator.
+
+        :param rows: rows of the operator
+        :return: (CfLaplacianOperator, (x0, y0, xn, yn) of the part inside of the image, rows inside of the part)
+        """
+        h, w, _ = self.image.shape
+        ys, xs = np.divmod(rows, w)
+        m = 2 * self.radius
+        x0, y0 = max(xs.min() - m, 0), max(ys.min() - m, 0)
+        xn, yn = min(xs.max() + 1 + m, w), min(ys.max() + 1 + m, h)
+        operator = CfLaplacianOperator(
+            self.image[y0:yn, x0:xn],
+            self.epsilon,
+            self.radius,
+            self.c.reshape(h, w)[y0:yn, x0:xn].ravel(),
+            (
+                None
+                if self.mu is None
+                else (self.mu[y0:yn, x0:xn], self.inv[y0:yn, x0:xn])
+            ),
+        )
+        local = (ys - y0) * (xn - x0) + xs - x0
+        return operator, (x0, y0, xn, yn), local
+
+    def updateResidualRows(self, b, x, rows, r):
+        """Recalculates r = b - A@x in place for the given rows from the windows that overlap them
+
+        :param b: right hand side
+        :param x: current solution
+        :param rows: rows to recalculate
+        :param r: residual, updated in place
+        :return: None
+        """
+        if len(rows) == 0:
+            return
+        h, w, _ = self.image.shape
+        operator, (x0, y0, xn, yn), local = self.crop(rows)
+        product = operator.dot(
+            np.ascontiguousarray(x.reshape(h, w)[y0:yn, x0:xn]).ravel()
+        )
+        r[rows] = b[rows] - product[local]
+
+    def rows(self, rows):
+        """Returns the given rows as csr matrix, assembled from the windows that overlap them
+
+        :param rows: rows of the operator
+        :return: scipy.sparse.csr_matrix of shape (len(rows), n)
+        """
+        h, w, _ = self.image.shape
+        operator, (x0, y0, xn, yn), local = self.crop(rows)
+        result = operator.toStencil().rows(local)
+        ys, xs = np.divmod(result.indices, xn - x0)
+        return scipy.sparse.csr_matrix(
+            (result.data, (ys + y0) * w + xs + x0, result.indptr),
+            shape=(len(rows), h * w),
+        )
+
+    def toStencil(self):
+        """Assembles the operator into a StencilMatrix, whose stencil has twice the radius of the windows
+
+        :return: StencilMatrix
+        """
+        return StencilMatrix(
+            cf_stencil_(self.tuple()), self.image.shape[1], 2 * self.radius
+        )
+
+    def spai0Step(self, b, x, m_diag, iterations):
+        """Same as spai0_step_ of the solver
+
+        :param b: Dense Vector b
+        :param x: current solution for Ax=b or None
+        :param m_diag: sparse approximate inverse
+        :param iterations: how often x should be smoothed
+        :return: smoothed x
+        """
+        if x is None:
+            if iterations > 0:
+                x = m_diag * b
+                iterations -= 1
+            else:
+                x = np.zeros_like(b)
+        for iteration in range(iterations):
+            x = x - m_diag * (self.dot(x) - b)
+        return x
+
+
+@njit(
+    Tuple((f8[:, :, :], f8[:, :, :]))(f8[:, :, :], f8, i8),
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cf_windows_(image, epsilon, r):
+    """Calculates the mean color and the inverse regularized covariance matrix (m00, m01, m02, m11, m12, m22) of each
+    window the same way as pymatting's cf_laplacian. Only windows that lie completely inside the image are used.
+    """
+    h, w, d = image.shape
+    size = 2 * r + 1
+    window_area = size * size
+    mu = np.zeros((h, w, 3))
+    inv = np.zeros((h, w, 6))
+    for y in prange(r, max(r, h - r)):
+        c = np.empty((size, size, 3))
+        for x in range(r, w - r):
+            for dc in range(3):
+                s = 0.0
+                for dy in range(size):
+                    for dx in range(size):
+                        s += image[y + dy - r, x + dx - r, dc]
+                mu[y, x, dc] = s / window_area
+                for dy in range(size):
+                    for dx in range(size):
+                        c[dy, dx, dc] = (
+                            image[y + dy - r, x + dx - r, dc] - s / window_area
+                        )
+
+            a00 = epsilon
+            a01 = 0.0
+            a02 = 0.0
+            a11 = epsilon
+            a12 = 0.0
+            a22 = epsilon
+            for dy in range(size):
+                for dx in range(size):
+                    a00 += c[dy, dx, 0] * c[dy, dx, 0]
+                    a01 += c[dy, dx, 0] * c[dy, dx, 1]
+                    a02 += c[dy, dx, 0] * c[dy, dx, 2]
+                    a11 += c[dy, dx, 1] * c[dy, dx, 1]
+                    a12 += c[dy, dx, 1] * c[dy, dx, 2]
+                    a22 += c[dy, dx, 2] * c[dy, dx, 2]
+            a00 /= window_area
+            a01 /= window_area
+            a02 /= window_area
+            a11 /= window_area
+            a12 /= window_area
+            a22 /= window_area
+
+            det = (
+                a00 * a12 * a12
+                + a01 * a01 * a22
+                + a02 * a02 * a11
+                - a00 * a11 * a22
+                - 2 * a01 * a02 * a12
+            )
+            inv_det = 1.0 / det
+            inv[y, x, 0] = (a12 * a12 - a11 * a22) * inv_det
+            inv[y, x, 1] = (a01 * a22 - a02 * a12) * inv_det
+            inv[y, x, 2] = (a02 * a11 - a01 * a12) * inv_det
+            inv[y, x, 3] = (a02 * a02 - a00 * a22) * inv_det
+            inv[y, x, 4] = (a00 * a12 - a01 * a02) * inv_det
+            inv[y, x, 5] = (a01 * a01 - a00 * a11) * inv_det
+    return mu, inv
+
+
+@njit(nogil=config.config.nogil, cache=config.config.cache)
+def cf_inv_dot_(inv, y, x, v0, v1, v2):
+    """Multiplies the inverse covariance matrix of the window at (y, x) with the vector (v0, v1, v2)"""
+    m = inv[y, x]
+    return (
+        m[0] * v0 + m[1] * v1 + m[2] * v2,
+        m[1] * v0 + m[3] * v1 + m[4] * v2,
+        m[2] * v0 + m[4] * v1 + m[5] * v2,
+    )
+
+
+@njit(
+    void(
+        Tuple((f8[:, :, :], f8[:, :, :], f8[:, :, :], f8[:], f8[:, :, :], i8)),
+        f8[:],
+        f8[:],
+    ),
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cf_dot_(op, v, result):
+    """Calculates result = L@v + c * v.
+
+    With the centered colors c_i = I_i - mu_k of a window k, L@v is the sum over the windows k containing i of
+    v_i - mean_k(v) - c_i * a_k, where a_k = inv_k @ mean_k(c_j * v_j). The first pass stores a_k and
+    b_k = mean_k(v) - mu_k * a_k for each window, the second pass sums them up for each pixel.
+    """
+    image, mu, inv, c, ab, r = op
+    h, w, _ = image.shape
+    size = 2 * r + 1
+    window_area = size * size
+    for y in prange(r, max(r, h - r)):
+        for x in range(r, w - r):
+            s = 0.0
+            s0 = 0.0
+            s1 = 0.0
+            s2 = 0.0
+            for dy in range(-r, r + 1):
+                for dx in range(-r, r + 1):
+                    value = v[(y + dy) * w + x + dx]
+                    s += value
+                    s0 += (image[y + dy, x + dx, 0] - mu[y, x, 0]) * value
+                    s1 += (image[y + dy, x + dx, 1] - mu[y, x, 1]) * value
+                    s2 += (image[y + dy, x + dx, 2] - mu[y, x, 2]) * value
+            a0, a1, a2 = cf_inv_dot_(
+                inv, y, x, s0 / window_area, s1 / window_area, s2 / window_area
+            )
+            ab[y, x, 0] = a0
+            ab[y, x, 1] = a1
+            ab[y, x, 2] = a2
+            ab[y, x, 3] = (
+                s / window_area - mu[y, x, 0] * a0 - mu[y, x, 1] * a1 - mu[y, x, 2] * a2
+            )
+    for y in prange(h):
+        for x in range(w):
+            i = y * w + x
+            count = 0
+            a0 = 0.0
+            a1 = 0.0
+            a2 = 0.0
+            b = 0.0
+            for ky in range(max(r, y - r), min(h - r, y + r + 1)):
+                for kx in range(max(r, x - r), min(w - r, x + r + 1)):
+                    count += 1
+                    a0 += ab[ky, kx, 0]
+                    a1 += ab[ky, kx, 1]
+                    a2 += ab[ky, kx, 2]
+                    b += ab[ky, kx, 3]
+            result[i] = (
+                (count + c[i]) * v[i]
+                - b
+                - image[y, x, 0] * a0
+                - image[y, x, 1] * a1
+                - image[y, x, 2] * a2
+            )
+
+
+@njit(nogil=config.config.nogil, cache=config.config.cache)
+def cf_entry_(image, mu, inv, window_area, ky, kx, yi, xi, yj, xj):
+    """Contribution of the window at (ky, kx) to L_ij"""
+    ci0 = image[yi, xi, 0] - mu[ky, kx, 0]
+    ci1 = image[yi, xi, 1] - mu[ky, kx, 1]
+    ci2 = image[yi, xi, 2] - mu[ky, kx, 2]
+    m0, m1, m2 = cf_inv_dot_(inv, ky, kx, ci0, ci1, ci2)
+    temp = (
+        m0 * (image[yj, xj, 0] - mu[ky, kx, 0])
+        + m1 * (image[yj, xj, 1] - mu[ky, kx, 1])
+        + m2 * (image[yj, xj, 2] - mu[ky, kx, 2])
+    )
+    return (1.0 if (yi == yj and xi == xj) else 0.0) - (1 + temp) / window_area
+
+
+@njit(
+    f8[:](Tuple((f8[:, :, :], f8[:, :, :], f8[:, :, :], f8[:], f8[:, :, :], i8))),
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cf_diag_(op):
+    image, mu, inv, c, ab, r = op
+    h, w, _ = image.shape
+    window_area = (2 * r + 1) ** 2
+    result = np.empty((h * w,))
+    for y in prange(h):
+        for x in range(w):
+            res = c[y * w + x]
+            for ky in range(max(r, y - r), min(h - r, y + r + 1)):
+                for kx in range(max(r, x - r), min(w - r, x + r + 1)):
+                    res += cf_entry_(image, mu, inv, window_area, ky, kx, y, x, y, x)
+            result[y * w + x] = res
+    return result
+
+
+@njit(
+    f8[:](Tuple((f8[:, :, :], f8[:, :, :], f8[:, :, :], f8[:], f8[:, :, :], i8))),
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cf_squared_sum_(op):
+    """Assembles each row of L + diag(c) in a (4r+1)x(4r+1) stencil and returns the sum of its squared entries"""
+    image, mu, inv, c, ab, r = op
+    h, w, _ = image.shape
+    window_area = (2 * r + 1) ** 2
+    size = 4 * r + 1
+    result = np.empty((h * w,))
+    for y in prange(h):
+        row = np.empty((size, size))
+        for x in range(w):
+            row[:, :] = 0.0
+            row[2 * r, 2 * r] = c[y * w + x]
+            for ky in range(max(r, y - r), min(h - r, y + r + 1)):
+                for kx in range(max(r, x - r), min(w - r, x + r + 1)):
+                    for yj in range(ky - r, ky + r + 1):
+                        for xj in range(kx - r, kx + r + 1):
+                            row[yj - y + 2 * r, xj - x + 2 * r] += cf_entry_(
+                                image, mu, inv, window_area, ky, kx, y, x, yj, xj
+                            )
+            result[y * w + x] = np.sum(row * row)
+    return result
+
+
+@njit(
+    f8[:, :](Tuple((f8[:, :, :], f8[:, :, :], f8[:, :, :], f8[:], f8[:, :, :], i8))),
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cf_stencil_(op):
+    """Assembles the entries of L + diag(c) into the layout of a StencilMatrix with radius 2r"""
+    image, mu, inv, c, ab, r = op
+    h, w, _ = image.shape
+    window_area = (2 * r + 1) ** 2
+    size = 4 * r + 1
+    result = np.zeros((size * size, h * w))
+    for y in prange(h):
+        for x in range(w):
+            i = y * w + x
+            result[size * size // 2, i] = c[i]
+            for ky in range(max(r, y - r), min(h - r, y + r + 1)):
+                for kx in range(max(r, x - r), min(w - r, x + r + 1)):
+                    for yj in range(ky - r, ky + r + 1):
+                        for xj in range(kx - r, kx + r + 1):
+                            result[
+                                (yj - y + 2 * r) * size + xj - x + 2 * r, i
+                            ] += cf_entry_(
+                                image, mu, inv, window_area, ky, kx, y, x, yj, xj
+                            )
+    return result
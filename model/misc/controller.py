@@ -2,6 +2,7 @@
 
 from PyQt5 import QtCore as qtc
 from model.misc import Solver
+from model.misc.solverprocess import SolverProcess, sharedContinueEvent, context
 from model.events import (
     PauseEvent,
     StopEvent,
@@ -10,8 +11,9 @@ from model.events import (
     UpdateEvent,
     Event,
 )
-from model.enum import Reason, Method, Kernel, Preconditioner
+from model.enum import Reason, Method, Kernel, Preconditioner, Storage, Laplacian
 from queue import Queue
+import config.config
 
 
 class Controller(qtc.QObject):
@@ -26,6 +28,14 @@ class Controller(qtc.QObject):
     # Signal(Minimum Error)
     toleranceChanged = qtc.pyqtSignal(object)
     toleranceReached = qtc.pyqtSignal()
+    # Signal(Estimated Bytes)
+    memoryEstimated = qtc.pyqtSignal(object)
+    # Signal(Laplacian, Seconds, Nonzeros)
+    laplacianBuilt = qtc.pyqtSignal(object, object, object)
+    # Signal(Telemetry Record)
+    iterated = qtc.pyqtSignal(object)
+    # Signal(Stage, Fraction)
+    constructionProgressed = qtc.pyqtSignal(object, object)
 
     def __init__(self, project):
         super(Controller, self).__init__()
@@ -35,7 +45,14 @@ class Controller(qtc.QObject):
         self.continueEvent = ContinueEvent()
         self.eventQueue = Queue()
         self.queueEvent(self.stopEvent)
-        self.solver = Solver(
+        if config.config.solverProcess:
+            self.continueEvent = sharedContinueEvent()
+            self.alphaLock = context.RLock()
+            self.shareImages()
+            backend = SolverProcess
+        else:
+            backend = Solver
+        self.solver = backend(
             self.project.canvas(),
             self.project.trimapPreview(),
             self.project.alphaMatte(),
@@ -49,23 +66,50 @@ class Controller(qtc.QObject):
         self.project.canvasChanged.connect(self.changeCanvas)
         self.project.alphaMatteChanged.connect(self.changeAlphaMatte)
         self.project.trimapPreviewChanged.connect(self.changeTrimapPreview)
+        self.project.pathChanged.connect(self.changeProjectPath)
+        self.project.edited.connect(self.saveProject)
         self.solver.calculated.connect(self.project.setEdited)
         self.solver.calculated.connect(self.calculated.emit)
         self.solver.toleranceChanged.connect(self.toleranceChanged.emit)
         self.solver.toleranceReached.connect(self.toleranceReached.emit)
+        self.solver.memoryEstimated.connect(self.memoryEstimated.emit)
+        self.solver.laplacianBuilt.connect(self.laplacianBuilt.emit)
+        self.solver.iterated.connect(self.iterated.emit)
+        self.solver.constructionProgressed.connect(self.constructionProgressed.emit)
+
+    def shareImages(self):
+        if config.config.solverProcess:
+            self.project.shareImages(self.alphaLock)
 
     def changeCanvas(self):
+        self.shareImages()
         self.queueUpdateEvent(Reason.canvasChanged, self.project.canvas())
         self.restart()
 
     def changeAlphaMatte(self):
+        self.shareImages()
         self.queueUpdateEvent(Reason.alphaMatteChanged, self.project.alphaMatte())
         self.restart()
 
     def changeTrimapPreview(self):
+        self.shareImages()
         self.queueUpdateEvent(Reason.trimapPreviewChanged, self.project.trimapPreview())
         self.restart()
 
+    def changeProjectPath(self, path: str):
+        self.queueUpdateEvent(Reason.projectPathChanged, path)
+        self.restart()
+
+    def saveProject(self, edited: bool, path: str, title: str):
+        # the project has been saved or opened, the coarse matrices of the hierarchy belong to its trimap
+        if not edited and path:
+            self.queueUpdateEvent(Reason.projectSaved)
+            self.restart()
+
+    def changeLaplacian(self, laplacian: Laplacian):
+        self.queueUpdateEvent(Reason.laplacianChanged, laplacian)
+        self.restart()
+
     def changeMethod(self, method: Method):
         self.queueUpdateEvent(Reason.methodChanged, method)
         self.restart()
@@ -105,6 +149,61 @@ class Controller(qtc.QObject):
     def changePrintError(self, printError: bool):
         self.queueUpdateEvent(Reason.printErrorChanged, printError)
 
+    def changeTelemetryLog(self, telemetryLog: bool):
+        self.queueUpdateEvent(Reason.telemetryLogChanged, telemetryLog)
+
+    def changeFused(self, fused: bool):
+        self.queueUpdateEvent(Reason.fusedChanged, fused)
+        self.restart()
+
+    def changeChunked(self, chunked: bool):
+        self.queueUpdateEvent(Reason.chunkedChanged, chunked)
+        self.restart()
+
+    def changeTimeBudget(self, timeBudget: int):
+        self.queueUpdateEvent(Reason.timeBudgetChanged, timeBudget)
+        self.restart()
+
+    def changeReduced(self, reduced: bool):
+        self.queueUpdateEvent(Reason.reducedChanged, reduced)
+        self.restart()
+
+    def changeStorage(self, storage: Storage):
+        self.queueUpdateEvent(Reason.storageChanged, storage)
+        self.restart()
+
+    def changeSinglePrecision(self, singlePrecision: bool):
+        self.queueUpdateEvent(Reason.singlePrecisionChanged, singlePrecision)
+        self.restart()
+
+    def changeRefinement(self, refinement: bool):
+        self.queueUpdateEvent(Reason.refinementChanged, refinement)
+        self.restart()
+
+    def changeProgressive(self, progressive: bool):
+        self.queueUpdateEvent(Reason.progressiveChanged, progressive)
+        self.restart()
+
+    def changePreview(self, preview: bool):
+        self.queueUpdateEvent(Reason.previewChanged, preview)
+        self.restart()
+
+    def changeLocalSolve(self, localSolve: bool):
+        self.queueUpdateEvent(Reason.localSolveChanged, localSolve)
+        self.restart()
+
+    def changeBackgroundRebuild(self, backgroundRebuild: bool):
+        self.queueUpdateEvent(Reason.backgroundRebuildChanged, backgroundRebuild)
+        self.restart()
+
+    def changeSchwarzTileSize(self, tileSize: int):
+        self.queueUpdateEvent(Reason.schwarzTileSizeChanged, tileSize)
+        self.restart()
+
+    def changeSchwarzWorkers(self, workers: int):
+        self.queueUpdateEvent(Reason.schwarzWorkersChanged, workers)
+        self.restart()
+
     def start(self):
         self.unblockSolver()
         self.started.emit()
@@ -142,13 +241,13 @@ class Controller(qtc.QObject):
         self.continueEvent.set()
 
     def isPaused(self):
-        return not self.pauseEvent.isSet()
+        return not self.pauseEvent.is_set()
 
     def isStopped(self):
-        return not self.stopEvent.isSet()
+        return not self.stopEvent.is_set()
 
     def isWaiting(self):
-        return not self.continueEvent.isSet()
+        return not self.continueEvent.is_set()
 
     def clearEventQueue(self):
         while not self.eventQueue.empty():
@@ -159,3 +258,5 @@ class Controller(qtc.QObject):
         self.queueEvent(QuitEvent())
         self.unblockSolver()
         self.solver.join()
+        if config.config.solverProcess:
+            self.project.releaseImages()
@@ -0,0 +1,178 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+from strings import cacheFolderName
+import scipy.sparse
+import numpy as np
+import hashlib
+import shutil
+import os
+
+
+class DiskCache:
+    """Stores the Laplacian and the V-Cycle hierarchy of a project as .npy files inside its project folder. Each entry
+    is a folder whose name contains the key it has been calculated for and only the latest entry of each kind is kept.
+    Arrays are memory mapped copy-on-write, such that only the touched pages are read from disk and in place updates of
+    the solver never reach the files.
+    """
+
+    def __init__(self, projectPath):
+        self.path = os.path.join(projectPath, cacheFolderName)
+
+    @staticmethod
+    def key(*parts):
+        """Hashes arrays by their content and everything else by its representation
+
+        :param parts: values the cached data depends on
+        :return: hex digest
+        """
+        sha = hashlib.sha1()
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                sha.update(repr((part.dtype, part.shape)).encode())
+                sha.update(np.ascontiguousarray(part).data)
+            else:
+                sha.update(repr(part).encode())
+        return sha.hexdigest()
+
+    def has(self, name, key):
+        return os.path.isdir(os.path.join(self.path, f"{name}-{key}"))
+
+    def save(self, name, key, arrays):
+        """Writes the arrays into a temporary folder, which replaces the older entries of the same name once it is
+        complete
+
+        :param name: kind of the entry
+        :param key: key of the entry
+        :param arrays: dictionary of file names and arrays
+        :return: True if the entry has been written
+        """
+        folder = os.path.join(self.path, f"{name}-{key}")
+        temporary = folder + ".tmp"
+        try:
+            shutil.rmtree(temporary, ignore_errors=True)
+            os.makedirs(temporary)
+            for fileName, array in arrays.items():
+                np.save(os.path.join(temporary, fileName + ".npy"), array)
+            for entry in os.listdir(self.path):
+                if entry.startswith(name + "-") and entry != os.path.basename(
+                    temporary
+                ):
+                    shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+            os.replace(temporary, folder)
+            return True
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)
+            return False
+
+    def load(self, name, key):
+        """
+        :param name: kind of the entry
+        :param key: key of the entry
+        :return: dictionary of file names and memory mapped arrays or None if there is no such entry
+        """
+        folder = os.path.join(self.path, f"{name}-{key}")
+        if not os.path.isdir(folder):
+            return None
+        try:
+            return {
+                fileName[:-4]: np.load(os.path.join(folder, fileName), mmap_mode="c")
+                for fileName in os.listdir(folder)
+                if fileName.endswith(".npy")
+            }
+        except (OSError, ValueError):
+            return None
+
+    def saveLaplacian(self, key, L):
+        return self.save("laplacian", key, self.matrixArrays("L", L))
+
+    def loadLaplacian(self, key):
+        arrays = self.load("laplacian", key)
+        return None if arrays is None else self.matrix(arrays, "L")
+
+    def saveTransfer(self, key, cache):
+        """
+        :param key: key of the transfer operators
+        :param cache: V-Cycle cache {shape: (P, PT, A_diag, A_small, m_diag)}
+        :return: True if the transfer operators have been written
+        """
+        arrays = {}
+        for (h, w), (P, PT, _, _, _) in cache.items():
+            prefix = f"{h}x{w}"
+            arrays.update(self.matrixArrays(prefix + "-P", P))
+            arrays.update(self.matrixArrays(prefix + "-PT", PT))
+        return self.save("transfer", key, arrays)
+
+    def loadTransfer(self, key):
+        """
+        :param key: key of the transfer operators
+        :return: {shape: (P, PT)} or None
+        """
+        arrays = self.load("transfer", key)
+        if arrays is None:
+            return None
+        transfer = {}
+        for fileName in arrays:
+            if fileName.endswith("-P-shape"):
+                prefix = fileName[: -len("-P-shape")]
+                h, w = map(int, prefix.split("x"))
+                transfer[(h, w)] = (
+                    self.matrix(arrays, prefix + "-P"),
+                    self.matrix(arrays, prefix + "-PT"),
+                )
+        return transfer
+
+    def saveHierarchy(self, key, cache):
+        """Writes the coarse matrices of the hierarchy, the transfer operators are stored by saveTransfer
+
+        :param key: key of the hierarchy
+        :param cache: V-Cycle cache {shape: (P, PT, A_diag, A_small, m_diag)}
+        :return: True if the hierarchy has been written
+        """
+        arrays = {}
+        for (h, w), (_, _, A_diag, A_small, m_diag) in cache.items():
+            prefix = f"{h}x{w}"
+            arrays.update(self.matrixArrays(prefix + "-A_small", A_small))
+            arrays[prefix + "-A_diag"] = A_diag
+            arrays[prefix + "-m_diag"] = m_diag
+        return self.save("hierarchy", key, arrays)
+
+    def loadHierarchy(self, key):
+        """
+        :param key: key of the hierarchy
+        :return: coarse matrices {shape: (A_diag, A_small, m_diag)} or None
+        """
+        arrays = self.load("hierarchy", key)
+        if arrays is None:
+            return None
+        levels = {}
+        for fileName in arrays:
+            if fileName.endswith("-A_diag"):
+                prefix = fileName[: -len("-A_diag")]
+                h, w = map(int, prefix.split("x"))
+                levels[(h, w)] = (
+                    arrays[prefix + "-A_diag"],
+                    self.matrix(arrays, prefix + "-A_small"),
+                    arrays[prefix + "-m_diag"],
+                )
+        return levels
+
+    @staticmethod
+    def matrixArrays(prefix, mat):
+        return {
+            prefix + "-data": mat.data,
+            prefix + "-indices": mat.indices,
+            prefix + "-indptr": mat.indptr,
+            prefix + "-shape": np.array(mat.shape, dtype=np.int64),
+        }
+
+    @staticmethod
+    def matrix(arrays, prefix):
+        return scipy.sparse.csr_matrix(
+            (
+                arrays[prefix + "-data"],
+                arrays[prefix + "-indices"],
+                arrays[prefix + "-indptr"],
+            ),
+            shape=tuple(int(size) for size in arrays[prefix + "-shape"]),
+            copy=False,
+        )
@@ -0,0 +1,129 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+from numba import njit, prange
+from numba.core.types import f8, i8
+import numpy as np
+import config.config
+
+
+@njit(
+    f8[:, :](f8[:, :], i8),
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def box_mean_(a, r):
+    """Mean over the (2r+1)x(2r+1) window around each pixel, windows are cut off at the border of the image. Running
+    sums over the rows and then over the columns make the cost independent of r. The column sums are kept for a whole
+    row at once, such that both passes read the image contiguously."""
+    h, w = a.shape
+    rows = np.empty((h, w))
+    for y in prange(h):
+        s = 0.0
+        for x in range(min(r, w)):
+            s += a[y, x]
+        for x in range(w):
+            if x + r < w:
+                s += a[y, x + r]
+            if x - r - 1 >= 0:
+                s -= a[y, x - r - 1]
+            rows[y, x] = s
+    counts = np.empty(w)
+    for x in range(w):
+        counts[x] = min(w - 1, x + r) - max(0, x - r) + 1
+    result = np.empty((h, w))
+    s = np.zeros(w)
+    for y in range(min(r, h)):
+        s += rows[y]
+    for y in range(h):
+        if y + r < h:
+            s += rows[y + r]
+        if y - r - 1 >= 0:
+            s -= rows[y - r - 1]
+        result[y] = s / (counts * (min(h - 1, y + r) - max(0, y - r) + 1))
+    return result
+
+
+@njit(
+    f8[:, :](f8[:, :, :], f8[:, :], i8, f8),
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def guided_filter_(image, p, r, epsilon):
+    """Guided filter of p with the color image as guide (He et al. 2013, "Guided Image Filtering"). In every window,
+    p is approximated by a linear function a_k . I + b_k of the colors, such that the edges of the image carry over
+    into the result. It needs a constant number of box filters and therefore costs O(h * w) for every radius.
+
+    :param image: normalized rgb image of shape (h, w, 3)
+    :param p: image to filter of shape (h, w)
+    :param r: radius of the windows
+    :param epsilon: regularization of the covariance matrices, larger values smooth more
+    :return: filtered p
+    """
+    h, w, _ = image.shape
+    mean_p = box_mean_(p, r)
+    mean_I = np.empty((3, h, w))
+    cov_Ip = np.empty((3, h, w))
+    for i in range(3):
+        mean_I[i] = box_mean_(np.ascontiguousarray(image[:, :, i]), r)
+        cov_Ip[i] = (
+            box_mean_(np.ascontiguousarray(image[:, :, i]) * p, r) - mean_I[i] * mean_p
+        )
+    # upper triangle of the covariance matrices: 00, 01, 02, 11, 12, 22
+    cov_II = np.empty((6, h, w))
+    k = 0
+    for i in range(3):
+        for j in range(i, 3):
+            cov_II[k] = (
+                box_mean_(
+                    np.ascontiguousarray(image[:, :, i])
+                    * np.ascontiguousarray(image[:, :, j]),
+                    r,
+                )
+                - mean_I[i] * mean_I[j]
+            )
+            k += 1
+    ab = np.empty((4, h, w))
+    for y in prange(h):
+        for x in range(w):
+            s00 = cov_II[0, y, x] + epsilon
+            s01 = cov_II[1, y, x]
+            s02 = cov_II[2, y, x]
+            s11 = cov_II[3, y, x] + epsilon
+            s12 = cov_II[4, y, x]
+            s22 = cov_II[5, y, x] + epsilon
+            i00 = s11 * s22 - s12 * s12
+            i01 = s02 * s12 - s01 * s22
+            i02 = s01 * s12 - s02 * s11
+            i11 = s00 * s22 - s02 * s02
+            i12 = s01 * s02 - s00 * s12
+            i22 = s00 * s11 - s01 * s01
+            det = s00 * i00 + s01 * i01 + s02 * i02
+            c0 = cov_Ip[0, y, x]
+            c1 = cov_Ip[1, y, x]
+            c2 = cov_Ip[2, y, x]
+            a0 = (i00 * c0 + i01 * c1 + i02 * c2) / det
+            a1 = (i01 * c0 + i11 * c1 + i12 * c2) / det
+            a2 = (i02 * c0 + i12 * c1 + i22 * c2) / det
+            ab[0, y, x] = a0
+            ab[1, y, x] = a1
+            ab[2, y, x] = a2
+            ab[3, y, x] = (
+                mean_p[y, x]
+                - a0 * mean_I[0, y, x]
+                - a1 * mean_I[1, y, x]
+                - a2 * mean_I[2, y, x]
+            )
+    for i in range(4):
+        ab[i] = box_mean_(ab[i], r)
+    result = np.empty((h, w))
+    for y in prange(h):
+        for x in range(w):
+            result[y, x] = (
+                ab[0, y, x] * image[y, x, 0]
+                + ab[1, y, x] * image[y, x, 1]
+                + ab[2, y, x] * image[y, x, 2]
+                + ab[3, y, x]
+            )
+    return result
@@ -3,11 +3,16 @@
 from PyQt5 import QtCore as qtc
 from PyQt5 import QtGui as qtg
 from qimage2ndarray import byte_view, rgb_view, raw_view, alpha_view
+from threading import RLock
 
 
 class Image(qtg.QImage):
     """Wraps the QImage class providing functionalities to generate views into the memory if an instance"""
 
+    def __init__(self, *args, **kwargs):
+        super(Image, self).__init__(*args, **kwargs)
+        self.__lock = RLock()
+
     @classmethod
     def empty(cls, size: qtc.QSize, format=qtg.QImage.Format_ARGB32):
         return Image.full(size, qtc.Qt.transparent, format)
@@ -18,6 +23,13 @@ class Image(qtg.QImage):
         image.fill(color)
         return Image(image)
 
+    def lock(self):
+        """Returns the lock that guards the memory of this image against being read while another thread writes it
+
+        :return: RLock
+        """
+        return self.__lock
+
     def clear(self):
         self.fill(qtc.Qt.transparent)
 
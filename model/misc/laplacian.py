@@ -0,0 +1,179 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+from model.misc.cflaplacian import CfLaplacianOperator, cf_windows_
+from model.misc.stencilmatrix import StencilMatrix
+from pymatting import (
+    cf_laplacian,
+    knn_laplacian,
+    rw_laplacian,
+    lbdm_laplacian,
+    lkm_laplacian,
+)
+import scipy.sparse
+import numpy as np
+
+
+class LkmLaplacianOperator(CfLaplacianOperator):
+    """Matrix free closed-form Laplacian plus a data term, whose products are evaluated with the box filters of
+    pymatting's large kernel matting Laplacian. A product costs the same for every radius. The solver iterates with
+    dot instead of the kernels of CfLaplacianOperator, so its windows are only calculated once toStencil or
+    squaredSum need them.
+    """
+
+    def __init__(self, image, epsilon, radius, c=None, windows=None, lkm=None):
+        """
+        :param image: normalized rgb image of shape (h, w, 3)
+        :param epsilon: regularization of the covariance matrices
+        :param radius: radius of the windows
+        :param c: data term, zero if None
+        :param windows: (means, inverse covariances) of another operator of the same image
+        :param lkm: (matvec, diagonal) of another operator of the same image
+        """
+        super(LkmLaplacianOperator, self).__init__(
+            image, epsilon, radius, c, (None, None) if windows is None else windows
+        )
+        self.matvec, self.L_diag = (
+            lkm_laplacian(image, epsilon, radius) if lkm is None else lkm
+        )
+
+    def shifted(self, c):
+        """Returns the operator L + diag(c), which shares the windows and box filters with this operator
+
+        :param c: data term
+        :return: LkmLaplacianOperator
+        """
+        return LkmLaplacianOperator(
+            self.image,
+            self.epsilon,
+            self.radius,
+            c,
+            (self.mu, self.inv),
+            (self.matvec, self.L_diag),
+        )
+
+    def tuple(self):
+        if self.mu is None:
+            h, w, _ = self.image.shape
+            self.mu, self.inv = cf_windows_(self.image, self.epsilon, self.radius)
+            self.ab = np.zeros((h, w, 4))
+        return super(LkmLaplacianOperator, self).tuple()
+
+    def dot(self, x):
+        return self.matvec(x) + self.c * x
+
+    def diagonal(self):
+        return self.L_diag + self.c
+
+
+def make_laplacian(laplacian, image, epsilon, radius, progress=None, blockSize=2**16):
+    """Builds the csr matrix of the given Laplacian. The large kernel Laplacian equals the closed-form Laplacian, which
+    is its only form with entries. The closed-form Laplacian is built in blocks of rows, the others at once.
+
+    :param laplacian: Laplacian
+    :param image: normalized rgb image of shape (h, w, 3)
+    :param epsilon: regularization of the closed-form and the learning based Laplacian
+    :param radius: radius of the windows or neighbourhoods
+    :param progress: called with the finished fraction after each block, may raise to cancel the construction
+    :param blockSize: pixels per block
+    :return: symmetric scipy.sparse.csr_matrix
+    """
+    if laplacian.hasWindows():
+        return cf_laplacian_rows(image, epsilon, radius, progress, blockSize)
+    if laplacian.isKnn():
+        L = symmetrized(knn_laplacian(image))
+    elif laplacian.isRandomWalk():
+        L = symmetrized(rw_laplacian(image, radius=radius))
+    else:
+        L = lbdm_laplacian(image, epsilon, radius)
+    if progress is not None:
+        progress(1.0)
+    return L.tocsr()
+
+
+def row_blocks(h, w, halo, blockSize):
+    """Splits the rows of an image into blocks of about blockSize pixels. The entries of the rows of a block only
+    depend on the rows of its strip, which extends the block by halo rows on both sides.
+
+    :param h: height of the image
+    :param w: width of the image
+    :param halo: number of rows the entries of a row depend on in each direction
+    :param blockSize: pixels per block
+    :return: generator of (first row, end row, first row of the strip, end row of the strip)
+    """
+    step = max(1, blockSize // max(w, 1))
+    for y0 in range(0, h, step):
+        y1 = min(h, y0 + step)
+        yield y0, y1, max(0, y0 - halo), min(h, y1 + halo)
+
+
+def cf_laplacian_rows(image, epsilon, radius, progress=None, blockSize=2**16):
+    """Builds pymatting's closed-form Laplacian in blocks of rows. A row only has entries inside of the windows that
+    contain its pixel, which lie inside of the strip 2 * radius rows around the block, such that the rows of the block
+    are taken from the Laplacian of its strip. Pymatting pads every row with zeros in column 0 for the neighbours
+    outside of the image, which stay in column 0.
+
+    :param image: normalized rgb image of shape (h, w, 3)
+    :param epsilon: regularization of the covariance matrices
+    :param radius: radius of the windows
+    :param progress: called with the finished fraction after each block, may raise to cancel the construction
+    :param blockSize: pixels per block
+    :return: scipy.sparse.csr_matrix
+    """
+    h, w, _ = image.shape
+    data, indices, indptr = [], [], [np.zeros(1, dtype=np.int64)]
+    for y0, y1, s0, s1 in row_blocks(h, w, 2 * radius, blockSize):
+        strip = cf_laplacian(image[s0:s1], epsilon, radius).tocsr()
+        start, end = strip.indptr[(y0 - s0) * w], strip.indptr[(y1 - s0) * w]
+        rowIndices = strip.indices[start:end].astype(np.int64)
+        rowData = strip.data[start:end]
+        rowIndices[(rowIndices > 0) | (rowData != 0)] += s0 * w
+        data.append(rowData)
+        indices.append(rowIndices)
+        indptr.append(
+            strip.indptr[(y0 - s0) * w + 1 : (y1 - s0) * w + 1].astype(np.int64)
+            - start
+            + indptr[-1][-1]
+        )
+        if progress is not None:
+            progress(y1 / h)
+    return scipy.sparse.csr_matrix(
+        (
+            np.concatenate(data) if data else np.zeros(0),
+            np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64),
+            np.concatenate(indptr),
+        ),
+        shape=(h * w, h * w),
+    )
+
+
+def make_stencil_laplacian(image, epsilon, radius, progress=None, blockSize=2**16):
+    """Builds the closed-form Laplacian as StencilMatrix in blocks of rows, the same way as cf_laplacian_rows
+
+    :param image: normalized rgb image of shape (h, w, 3)
+    :param epsilon: regularization of the covariance matrices
+    :param radius: radius of the windows
+    :param progress: called with the finished fraction after each block, may raise to cancel the construction
+    :param blockSize: pixels per block
+    :return: StencilMatrix with radius 2 * radius
+    """
+    h, w, _ = image.shape
+    size = 4 * radius + 1
+    data = np.zeros((size * size, h * w))
+    for y0, y1, s0, s1 in row_blocks(h, w, 2 * radius, blockSize):
+        strip = CfLaplacianOperator(image[s0:s1], epsilon, radius).toStencil()
+        data[:, y0 * w : y1 * w] = strip.data[:, (y0 - s0) * w : (y1 - s0) * w]
+        if progress is not None:
+            progress(y1 / h)
+    return StencilMatrix(data, w, 2 * radius)
+
+
+def symmetrized(L):
+    """The KNN and the random walk Laplacian are normalized as L = D^-1 (D - W), which is not symmetric as the
+    cg-Method requires. D^(1/2) L D^(-1/2) = D^(-1/2) (D - W) D^(-1/2) has the same eigenvalues and is symmetric. It
+    keeps the diagonal of L and its entries (i, j) are -sqrt(L_ij * L_ji), so D is not needed.
+
+    :param L: sparse matrix with nonpositive entries outside of the diagonal
+    :return: scipy.sparse.csr_matrix
+    """
+    S = L.tocsr().multiply(L.T.tocsr()).sqrt().tocsr()
+    return (2 * scipy.sparse.diags(S.diagonal()) - S).tocsr()
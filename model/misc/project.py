@@ -3,7 +3,7 @@
 from PyQt5 import QtCore as qtc
 from PyQt5 import QtGui as qtg
 from model.util import trimapToRgba, matchScale, imageToTrimap, cutout, ndarrayToImage
-from model.misc import CutoutRect, Image
+from model.misc import CutoutRect, Image, SharedImage
 from model.enum import Color
 from pymatting import estimate_foreground_ml
 
@@ -334,6 +334,29 @@ class Project(qtc.QObject):
         self.setAlphaMatte(matchScale(self.alphaMatte(), self.canvas()))
         self.setTrimapPreview(matchScale(self.trimapPreview(), self.canvas()))
 
+    def shareImages(self, alphaLock):
+        """Moves the canvas, the alpha matte and the trimap preview into shared memory without emitting a signal. The
+        views read the images from the project whenever they draw, such that they draw the shared images from then on.
+
+        :param alphaLock: lock of the alpha matte shared with the solver process
+        :return: None
+        """
+        for key in ["canvas", "alphaMatte", "trimapPreview"]:
+            image = self.images[key]
+            if image is not None and not isinstance(image, SharedImage):
+                self.images[key] = SharedImage.share(
+                    image, alphaLock if key == "alphaMatte" else None
+                )
+
+    def releaseImages(self):
+        """Removes the shared memory blocks of the images once the solver process has finished
+
+        :return: None
+        """
+        for image in self.images.values():
+            if isinstance(image, SharedImage):
+                image.release()
+
     def close(self):
         self.edited.disconnect()
         self.pathChanged.disconnect()
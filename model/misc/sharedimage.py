@@ -0,0 +1,110 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+from model.misc.image import Image
+from multiprocessing.shared_memory import SharedMemory
+from PyQt5 import QtGui as qtg
+from PyQt5 import sip
+import ctypes
+
+
+class SharedImage(Image):
+    """Image whose pixels live in a shared memory block, such that another process that attaches to the block reads
+    and writes the same pixels without copying them. Copies of the image detach from the block once they are written.
+    The process that created the block removes it when the image is deleted.
+    """
+
+    def __init__(
+        self, memory, width, height, bytesPerLine, format, lock=None, owner=False
+    ):
+        """
+        :param memory: SharedMemory of at least bytesPerLine * height bytes
+        :param width: width of the image
+        :param height: height of the image
+        :param bytesPerLine: bytes of a scan line
+        :param format: QImage.Format
+        :param lock: lock shared with the other process, a lock of this process if None
+        :param owner: whether the block is removed when the image is deleted
+        """
+        buffer = (ctypes.c_char * max(bytesPerLine * height, 1)).from_buffer(memory.buf)
+        super(SharedImage, self).__init__(
+            sip.voidptr(ctypes.addressof(buffer)), width, height, bytesPerLine, format
+        )
+        self.__buffer = buffer
+        self.__memory = memory
+        self.__sharedLock = lock
+        self.__owner = owner
+
+    @classmethod
+    def share(cls, image: Image, lock=None):
+        """Copies the image into a new shared memory block
+
+        :param image: image
+        :param lock: lock shared with the other process, a lock of this process if None
+        :return: SharedImage
+        """
+        size = image.sizeInBytes()
+        memory = SharedMemory(create=True, size=max(size, 1))
+        if size > 0:
+            bits = image.constBits()
+            bits.setsize(size)
+            memory.buf[:size] = bits
+        return cls(
+            memory,
+            image.width(),
+            image.height(),
+            image.bytesPerLine(),
+            image.format(),
+            lock,
+            True,
+        )
+
+    @classmethod
+    def attach(cls, descriptor, lock=None):
+        """Attaches to the block of a SharedImage of another process
+
+        :param descriptor: descriptor of the other SharedImage
+        :param lock: lock shared with the other process, a lock of this process if None
+        :return: SharedImage
+        """
+        name, width, height, bytesPerLine, format = descriptor
+        return cls(
+            SharedMemory(name=name),
+            width,
+            height,
+            bytesPerLine,
+            qtg.QImage.Format(format),
+            lock,
+        )
+
+    def descriptor(self):
+        """
+        :return: picklable (name of the block, width, height, bytes per line, format)
+        """
+        return (
+            self.__memory.name,
+            self.width(),
+            self.height(),
+            self.bytesPerLine(),
+            int(self.format()),
+        )
+
+    def lock(self):
+        return (
+            super(SharedImage, self).lock()
+            if self.__sharedLock is None
+            else self.__sharedLock
+        )
+
+    def release(self):
+        """Removes the block once no other process attaches to it anymore, the image stays usable
+
+        :return: None
+        """
+        if self.__owner:
+            self.__owner = False
+            self.__memory.unlink()
+
+    def __del__(self):
+        self.release()
+        self.__buffer = None
+        self.__memory.close()
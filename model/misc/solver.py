@@ -1,13 +1,28 @@
 # Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
 
 from model.misc import AdjustingRect, Image
-from model.enum import Method, Preconditioner, Reason, Kernel
+from model.misc.cflaplacian import CfLaplacianOperator, cf_dot_
+from model.misc.laplacian import (
+    LkmLaplacianOperator,
+    make_laplacian,
+    make_stencil_laplacian,
+)
+from model.misc.guidedfilter import guided_filter_
+from model.misc.stencilmatrix import StencilMatrix, st_dot_
+from model.misc.diskcache import DiskCache
+from model.misc.telemetry import Telemetry, nbytes, memory
+from model.enum import Method, Preconditioner, Reason, Kernel, Storage, Laplacian
+from strings import telemetryFileName
 from model.events import UpdateEvent, QuitEvent, StopEvent, PauseEvent, ContinueEvent
-from pymatting import cf_laplacian  # ADDED NOGIL=TRUE
-from threading import Thread, Event
+from threading import Thread, Event, local
+from functools import partial
 from queue import Queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent import futures
+import multiprocessing
+import os
 from numba import njit, prange
-from numba.core.types import f8, i8, i4, u1, b1, UniTuple, Tuple, void
+from numba.core.types import f4, f8, i8, i4, u1, b1, UniTuple, Tuple, void
 from time import perf_counter as time
 from datetime import timedelta
 import scipy.sparse, scipy.sparse.linalg
@@ -16,23 +31,51 @@ import config.config
 from PyQt5 import QtCore as qtc
 
 
+class ConstructionCancelled(Exception):
+    """Raised between two blocks of the construction of an operator that is no longer needed"""
+
+
 class Solver(qtc.QObject, Thread):
     # Signal(Error, Tolerance)
     calculated = qtc.pyqtSignal(object, object)
     # Signal(New Tolerance)
     toleranceChanged = qtc.pyqtSignal(object)
     toleranceReached = qtc.pyqtSignal()
+    # Signal(Estimated Bytes)
+    memoryEstimated = qtc.pyqtSignal(object)
+    # Signal(Laplacian, Seconds, Nonzeros)
+    laplacianBuilt = qtc.pyqtSignal(object, object, object)
+    # Signal(Telemetry Record)
+    iterated = qtc.pyqtSignal(object)
+    # Signal(Stage, Fraction)
+    constructionProgressed = qtc.pyqtSignal(object, object)
+    # reasons of update events that replace one of the images
+    imageReasons = (
+        Reason.canvasChanged,
+        Reason.alphaMatteChanged,
+        Reason.trimapPreviewChanged,
+    )
 
     def __init__(
         self, canvas, trimapPreview, alphaMatte, eventQueue: Queue, continueEvent: Event
     ):
         super(Solver, self).__init__()
         self.setName("Thread: Solver")
+        self.pool = None
+        self.rebuildPool = None
+        self.rebuild = None
+        self.rebuildRequested = False
+        self.rebuildCancelled = Event()
+        self.construction = local()
+        self.diskCache = None
+        self.projectPath = None
+        self.telemetry = Telemetry()
+        self.initTweakableVariables()
         self.changeImages(canvas, alphaMatte, trimapPreview)
         self.eventQueue = eventQueue
         self.continueEvent = continueEvent
         self.adjustingRect = None
-        self.initTweakableVariables()
+        self.calculationStart = time()
         self.initCalculationVariables()
 
     def run(self) -> None:
@@ -42,89 +85,195 @@ class Solver(qtc.QObject, Thread):
         """
         while self.processEvents(self.eventQueue):
             self.solve()
+        self.store_hierarchy()
+        self.store_state()
+        self.reset_pool()
+        self.reset_rebuild()
+        self.reset_rebuild_pool()
+        self.telemetry.close()
 
     def processEvents(self, queue):
-        """Processes the events inside the queue
+        """Processes the events inside the queue. The queued events are drained and coalesced first, such that dragging
+        a spin box applies only its final value.
 
         :param queue: Queue
         :return:
         """
         while not queue.empty():
-            event = queue.get_nowait()
-            if isinstance(event, UpdateEvent):
-                if event.reason == Reason.trimapChanged:
-                    if not self.adjustingRect:
-                        self.adjustingRect = AdjustingRect(
-                            (0, 0), *self.alphaView.shape
-                        )
-                    self.adjustingRect.addRect(event.value)
-                else:
+            events = []
+            while not queue.empty():
+                events.append(queue.get_nowait())
+            for event in self.coalesceEvents(events):
+                if isinstance(event, list):
                     self.adjustSystem()
-                    if event.reason == Reason.canvasChanged:
-                        self.changeCanvas(event.value)
-                        self.calculationStart = time()
-                    elif event.reason == Reason.trimapPreviewChanged:
-                        self.changeTrimapPreview(event.value)
-                    elif event.reason == Reason.alphaMatteChanged:
-                        self.changeAlphaMatte(event.value)
-                    elif event.reason == Reason.methodChanged:
-                        self.setMethod(event.value)
-                    elif event.reason == Reason.lambdaChanged:
-                        self.setLambda(event.value)
-                    elif event.reason == Reason.preconditionerChanged:
-                        self.setPreconditioner(event.value)
-                    elif event.reason == Reason.epsilonChanged:
-                        self.setEpsilon(event.value)
-                    elif event.reason == Reason.radiusChanged:
-                        self.setRadius(event.value)
-                    elif event.reason == Reason.kernelChanged:
-                        self.setKernel(event.value)
-                    elif event.reason == Reason.postIterChanged:
-                        self.setPostIter(event.value)
-                    elif event.reason == Reason.preIterChanged:
-                        self.setPreIter(event.value)
-                    elif event.reason == Reason.rtolChanged:
-                        self.setRtol(event.value)
-                    elif event.reason == Reason.printErrorChanged:
-                        self.setPrintError(event.value)
-            elif isinstance(event, QuitEvent):
-                return False
-            elif isinstance(event, StopEvent):
-                event.wait()
-                self.calculationStart = time()
-            elif isinstance(event, PauseEvent):
-                event.wait()
-            else:
-                event.wait()
+                    self.replaceImages(event)
+                elif isinstance(event, UpdateEvent):
+                    if event.reason == Reason.trimapChanged:
+                        if not self.adjustingRect:
+                            self.adjustingRect = AdjustingRect(
+                                (0, 0), *self.alphaView.shape
+                            )
+                        self.adjustingRect.addRect(event.value)
+                    else:
+                        self.adjustSystem()
+                        if event.reason == Reason.methodChanged:
+                            self.setMethod(event.value)
+                        elif event.reason == Reason.lambdaChanged:
+                            self.setLambda(event.value)
+                        elif event.reason == Reason.preconditionerChanged:
+                            self.setPreconditioner(event.value)
+                        elif event.reason == Reason.epsilonChanged:
+                            self.setEpsilon(event.value)
+                        elif event.reason == Reason.radiusChanged:
+                            self.setRadius(event.value)
+                        elif event.reason == Reason.kernelChanged:
+                            self.setKernel(event.value)
+                        elif event.reason == Reason.postIterChanged:
+                            self.setPostIter(event.value)
+                        elif event.reason == Reason.preIterChanged:
+                            self.setPreIter(event.value)
+                        elif event.reason == Reason.rtolChanged:
+                            self.setRtol(event.value)
+                        elif event.reason == Reason.printErrorChanged:
+                            self.setPrintError(event.value)
+                        elif event.reason == Reason.fusedChanged:
+                            self.setFused(event.value)
+                        elif event.reason == Reason.chunkedChanged:
+                            self.setChunked(event.value)
+                        elif event.reason == Reason.timeBudgetChanged:
+                            self.setTimeBudget(event.value)
+                        elif event.reason == Reason.reducedChanged:
+                            self.setReduced(event.value)
+                        elif event.reason == Reason.storageChanged:
+                            self.setStorage(event.value)
+                        elif event.reason == Reason.singlePrecisionChanged:
+                            self.setSinglePrecision(event.value)
+                        elif event.reason == Reason.refinementChanged:
+                            self.setRefinement(event.value)
+                        elif event.reason == Reason.progressiveChanged:
+                            self.setProgressive(event.value)
+                        elif event.reason == Reason.schwarzTileSizeChanged:
+                            self.setSchwarzTileSize(event.value)
+                        elif event.reason == Reason.schwarzWorkersChanged:
+                            self.setSchwarzWorkers(event.value)
+                        elif event.reason == Reason.projectPathChanged:
+                            self.setProjectPath(event.value)
+                        elif event.reason == Reason.projectSaved:
+                            self.store_hierarchy()
+                        elif event.reason == Reason.laplacianChanged:
+                            self.setLaplacian(event.value)
+                        elif event.reason == Reason.previewChanged:
+                            self.setPreview(event.value)
+                        elif event.reason == Reason.localSolveChanged:
+                            self.setLocalSolve(event.value)
+                        elif event.reason == Reason.telemetryLogChanged:
+                            self.setTelemetryLog(event.value)
+                        elif event.reason == Reason.backgroundRebuildChanged:
+                            self.setBackgroundRebuild(event.value)
+                elif isinstance(event, QuitEvent):
+                    return False
+                elif isinstance(event, StopEvent):
+                    event.wait()
+                    self.calculationStart = time()
+                elif isinstance(event, PauseEvent):
+                    self.publish(force=True)
+                    event.wait()
+                else:
+                    event.wait()
         self.adjustSystem()
         return True
 
-    def changeImages(self, canvas, alphaMatte, trimapPreview):
-        self.changeCanvas(canvas)
-        self.changeAlphaMatte(alphaMatte)
-        self.changeTrimapPreview(trimapPreview)
+    def coalesceEvents(self, events):
+        """Coalesces each run of consecutive update events. Only the last event of each reason takes effect, except
+        for trimapChanged, whose rectangles are all needed. The replacements of the canvas, the alpha matte and the
+        trimap preview of a run are grouped into a list at the position of the first of them, such that they cause a
+        single rebuild of the system. Other events separate the runs and keep their position.
+
+        :param events: list of events in the order they have been queued
+        :return: list of events and lists of image replacements
+        """
+        result = []
+        run = []
+        for event in events + [None]:
+            if isinstance(event, UpdateEvent):
+                run.append(event)
+                continue
+            seen = set()
+            kept = []
+            for update in reversed(run):
+                if update.reason == Reason.trimapChanged or update.reason not in seen:
+                    seen.add(update.reason)
+                    kept.append(update)
+            images = []
+            for update in reversed(kept):
+                if update.reason in self.imageReasons:
+                    if not images:
+                        result.append(images)
+                    images.append(update)
+                else:
+                    result.append(update)
+            run = []
+            if event is not None:
+                result.append(event)
+        return result
+
+    def replaceImages(self, events):
+        """Replaces the images of the given update events at once
+
+        :param events: list of update events with reasons of imageReasons
+        :return: None
+        """
+        images = {event.reason: event.value for event in events}
+        self.changeImages(
+            images.get(Reason.canvasChanged),
+            images.get(Reason.alphaMatteChanged),
+            images.get(Reason.trimapPreviewChanged),
+        )
+        if Reason.canvasChanged in images:
+            self.calculationStart = time()
+
+    def changeImages(self, canvas=None, alphaMatte=None, trimapPreview=None):
+        if canvas is not None:
+            self.changeCanvas(canvas)
+        if alphaMatte is not None:
+            self.changeAlphaMatte(alphaMatte)
+        if trimapPreview is not None:
+            self.changeTrimapPreview(trimapPreview)
 
     def changeCanvas(self, canvas: Image):
         self.canvas = canvas.rgbView(True)
         self.h = canvas.height()
         self.w = canvas.width()
+        self.progressivePending = True
+        self.transfer = {}
+        self.reset_chunk_size()
         self.reset_L()
         self.reset_c()
         self.reset_b()
 
     def changeTrimapPreview(self, trimapPreview: Image):
+        # the views don't keep the image and the memory it may share with another process alive
+        self.trimapPreview = trimapPreview
         self.trimapPreviewView = trimapPreview.byteView()
         self.initCalculationVariables()
         self.reset_c()
         self.reset_b()
 
     def changeAlphaMatte(self, alphaMatte: Image):
+        self.alphaMatte = alphaMatte
         self.alphaView = alphaMatte.rawView()
-        self.alpha = self.flatten2D(self.alphaView / 255.0)
-        self.reset_c()
+        self.alphaViewLock = alphaMatte.lock()
+        self.alphaBackBuffer = self.alphaView.copy()
+        self.lastPublish = 0
+        self.alpha = self.flatten2D(self.alphaView / 255.0, self.get_dtype())
+        # a loaded alpha matte is a better initial iterate than the coarse levels
+        self.alphaLoaded = bool(self.alphaView.any())
+        if self.alphaLoaded:
+            self.progressivePending = False
         self.reset_b()
 
     def initCalculationVariables(self):
+        self.reset_rebuild()
         self.L = None
         self.L_diag = None
         self.A = None
@@ -137,7 +286,20 @@ class Solver(qtc.QObject, Thread):
         self.p = None
         self.A_diag = None
         self.m_diag = None
-        self.cache = {}
+        self.norm_r = None
+        self.A_diag_inv = None
+        self.A_diag_ptr = None
+        self.unknown = None
+        self.unknown_ind = None
+        self.fixed = None
+        self.refined = False
+        self.previewAlpha = None
+        self.previewError = None
+        self.localRects = []
+        self.cache = None
+        self.L_key = None
+        self.workspace = {}
+        self.chunkSize = 1
         self.error = 1
 
     def initTweakableVariables(self):
@@ -146,6 +308,7 @@ class Solver(qtc.QObject, Thread):
         self.epsilon = 1e-7
         self.radius = 1
         self.preconditioner = Preconditioner.vcycle
+        self.laplacian = Laplacian.closedForm
         self.method = Method.cgd
         self.kernel = (
             Kernel.gaussian,
@@ -154,6 +317,32 @@ class Solver(qtc.QObject, Thread):
         self.preiter = 1
         self.postiter = 1
         self.printError = False
+        self.fused = True
+        self.chunked = True
+        self.timeBudget = 16
+        self.maxChunkSize = 1000
+        self.publishRate = 60
+        self.blockSize = 2**16
+        self.tileSize = 64
+        self.reduced = False
+        self.storage = Storage.csr
+        self.singlePrecision = False
+        self.refinement = True
+        self.progressive = True
+        self.progressiveLevels = 2
+        self.progressiveRtol = 1e-3
+        self.schwarzTileSize = 512
+        self.schwarzOverlap = 16
+        self.schwarzWorkers = os.cpu_count()
+        self.preview = True
+        self.previewRadius = 8
+        self.previewEpsilon = 1e-3
+        self.localSolve = True
+        self.localMargin = 32
+        self.localFraction = 1 / 16
+        self.localIterations = 100
+        self.backgroundRebuild = True
+        self.telemetryLog = False
 
     def adjustSystem(self):
         if self.adjustingRect:
@@ -164,11 +353,198 @@ class Solver(qtc.QObject, Thread):
         rect = rect.boundingCoordinates()
         isForeground = get_updated_foreground_area_(rect, self.trimapPreviewView)
         isKnown = get_updated_known_area_(rect, self.trimapPreviewView, isForeground)
-        self.update_b(rect, isForeground)
-        self.update_c(rect, isKnown)
-        self.reset_M()
+        if self.get_method().isSchwarz():
+            self.reset_b()
+        elif self.reduced:
+            self.update_reduced_system(rect, isForeground, isKnown)
+        else:
+            self.update_b(rect, isForeground)
+            self.update_c(rect, isKnown)
+            self.update_M(rect)
         self.reset_z()
         self.reset_p()
+        if self.preview:
+            self.showPreview(rect)
+        if self.localSolve:
+            self.localRects.append(rect)
+
+    def showPreview(self, rect):
+        """Publishes a guided filter of the alpha matte around the changed area of the trimap right away. The known
+        pixels are set to the trimap and the guided filter with the canvas as guide spreads them along its edges into
+        the unknown pixels. A change affects the result up to 2 * previewRadius pixels away, which in turn depends on
+        the pixels up to 2 * previewRadius pixels further away.
+
+        :param rect: (x0, y0, xn, yn) of the changed area
+        :return: None
+        """
+        x0, y0, xn, yn = rect
+        h, w = self.get_shape()
+        near = 2 * self.previewRadius
+        x1, y1, xm, ym = (
+            max(0, x0 - near),
+            max(0, y0 - near),
+            min(w, xn + near),
+            min(h, yn + near),
+        )
+        x2, y2, xo, yo = (
+            max(0, x1 - near),
+            max(0, y1 - near),
+            min(w, xm + near),
+            min(h, ym + near),
+        )
+        if x1 >= xm or y1 >= ym:
+            return
+        preview = (
+            self.get_alpha().copy() if self.previewAlpha is None else self.previewAlpha
+        )
+        trimapPreview = self.trimapPreviewView[y2:yo, x2:xo]
+        isForeground = get_foreground_area_(trimapPreview)
+        isKnown = get_known_area_(trimapPreview)
+        alpha = preview.reshape(h, w)[y2:yo, x2:xo].clip(0, 1).astype(np.float64)
+        alpha[isKnown] = isForeground[isKnown]
+        filtered = guided_filter_(
+            np.ascontiguousarray(self.canvas[y2:yo, x2:xo]),
+            alpha,
+            self.previewRadius,
+            self.previewEpsilon,
+        )
+        alpha = np.where(isKnown, alpha, filtered.clip(0, 1))
+        preview.reshape(h, w)[y1:ym, x1:xm] = alpha[
+            y1 - y2 : ym - y2, x1 - x2 : xm - x2
+        ]
+        self.previewAlpha = preview
+        self.previewError = None
+        self.publish(force=True, alpha=preview)
+
+    def adoptPreview(self):
+        """Continues from the preview if its error is below the one of the current alpha matte. Otherwise the
+        current alpha matte is only published again, once its error dropped below the one of the preview. The Schwarz
+        method has no global residual and always continues from the preview.
+
+        :return: None
+        """
+        preview = self.previewAlpha
+        self.previewAlpha = None
+        if not self.get_method().isSchwarz():
+            norm_r = self.vecNorm2(self.get_b() - self.spDot(self.get_A(), preview))
+            if norm_r >= self.get_norm_r():
+                norm_b = self.get_norm_b()
+                self.previewError = norm_r / norm_b if norm_b != 0 else 0
+                return
+        self.alpha[:] = preview
+        if self.reduced:
+            self.fix_alpha()
+        self.reset_r()
+
+    def solveLocal(self):
+        """Solves the system of windows around the changed areas of the trimap before the global iterations resume,
+        such that the correction is visible around the strokes right away instead of spreading slowly from them. Each
+        window extends a changed area by localMargin pixels. Windows are merged as long as the merged window covers at
+        most localFraction of the canvas, larger windows are skipped.
+
+        :return: None
+        """
+        rects = self.localRects
+        self.localRects = []
+        h, w = self.get_shape()
+        m = self.localMargin
+        limit = self.localFraction * h * w
+        windows = []
+        for x0, y0, xn, yn in rects:
+            window = (max(0, x0 - m), max(0, y0 - m), min(w, xn + m), min(h, yn + m))
+            for i, other in enumerate(windows):
+                merged = (
+                    min(window[0], other[0]),
+                    min(window[1], other[1]),
+                    max(window[2], other[2]),
+                    max(window[3], other[3]),
+                )
+                if (merged[2] - merged[0]) * (merged[3] - merged[1]) <= limit:
+                    windows[i] = merged
+                    break
+            else:
+                windows.append(window)
+        for x0, y0, xn, yn in windows:
+            if x0 >= xn or y0 >= yn or (xn - x0) * (yn - y0) > limit:
+                continue
+            if self.get_method().isSchwarz():
+                self.solveLocalTile((x0, y0, xn, yn))
+            else:
+                self.solveLocalRows((x0, y0, xn, yn))
+        if self.reduced:
+            self.fix_alpha()
+        self.reset_r()
+
+    def solveLocalRows(self, window):
+        """Solves the rows of A inside of the window with at most localIterations iterations, while the alpha values
+        outside of the window are fixed. Only the unknown pixels are solved in the reduced system.
+
+        :param window: (x0, y0, xn, yn)
+        :return: None
+        """
+        rows = get_rect_indices_(window, self.get_shape()[1])
+        if self.reduced:
+            rows = rows[self.get_unknown()[rows]]
+        if len(rows) == 0:
+            return
+        A = self.spRows(self.get_A(), rows)
+        alpha = self.get_alpha()
+        b = self.get_b()[rows]
+        r = b - A.dot(alpha)
+        A = self.spFitIndices(A[:, rows])
+        A_diag_inv = 1 / self.spDiag(A)
+        x = np.zeros_like(r)
+        self.cgd_jacobi_fused_chunk(
+            A,
+            x,
+            r,
+            A_diag_inv * r,
+            A_diag_inv,
+            np.empty_like(r),
+            np.empty_like(r),
+            self.vecNorm2(r),
+            self.get_rtol() * self.vecNorm2(b),
+            self.localIterations,
+            np.empty((0,), dtype=np.int64),
+        )
+        alpha[rows] += x
+
+    def solveLocalTile(self, window):
+        """Solves the window like a tile of the Schwarz method, which has no global A, with at most localIterations
+        iterations. The window is surrounded by a ring of 2 * radius pixels, whose alpha values are the boundary
+        condition.
+
+        :param window: (x0, y0, xn, yn)
+        :return: None
+        """
+        h, w = self.get_shape()
+        d = 2 * self.get_radius()
+        x0, y0, xn, yn = window
+        x0, y0, xn, yn = max(0, x0 - d), max(0, y0 - d), min(w, xn + d), min(h, yn + d)
+        ring = (
+            d if x0 > 0 else 0,
+            d if y0 > 0 else 0,
+            d if xn < w else 0,
+            d if yn < h else 0,
+        )
+        core = (ring[0], ring[1], xn - x0 - ring[2], yn - y0 - ring[3])
+        alpha = self.get_alpha().reshape(h, w)
+        values, _ = solve_schwarz_tile(
+            self.canvas[y0:yn, x0:xn].copy(),
+            self.trimapPreviewView[y0:yn, x0:xn].copy(),
+            alpha[y0:yn, x0:xn].astype(np.float64),
+            ring,
+            core,
+            self.get_laplacian(),
+            self.get_epsilon(),
+            self.get_radius(),
+            self.get_lambda(),
+            self.get_rtol(),
+            self.localIterations,
+            partial(self.constructionStep, "laplacian"),
+            self.blockSize,
+        )
+        alpha[y0 + core[1] : y0 + core[3], x0 + core[0] : x0 + core[2]] = values
 
     def calculate_error(self):
         """Calculates the normalized residual |r|/ |b|
@@ -178,7 +554,7 @@ class Solver(qtc.QObject, Thread):
         rtol = self.get_rtol()
         norm_b = self.get_norm_b()
         if rtol and norm_b != 0:
-            norm_r = self.vecNorm2(self.get_r())
+            norm_r = self.get_norm_r()
             relativeError = norm_r / norm_b
             if self.printError:
                 print(f"Error: {relativeError}")
@@ -187,34 +563,281 @@ class Solver(qtc.QObject, Thread):
             return relativeError, False
         return None, None
 
+    def refine(self):
+        """Recalculates the residual b - A@alpha of a single precision solution in double precision once the tolerance
+        has been reached. The float32 residual of the cg-Method drifts away from the true residual, so the iterations
+        continue from the refined residual if it is still above the tolerance. Each residual is refined at most once.
+
+        :return: True if the residual was refined
+        """
+        if not self.refinement or self.refined or self.get_dtype() == np.float64:
+            return False
+        dtype = self.get_dtype()
+        r = self.get_b().astype(np.float64) - self.spDot(
+            self.get_A(), self.get_alpha().astype(np.float64)
+        )
+        self.r = r.astype(dtype)
+        self.reset_norm_r()
+        self.reset_z()
+        self.refined = True
+        return True
+
+    def solveProgressive(self):
+        """Solves the system on 1/2^progressiveLevels of the resolution first and upsamples the alpha matte of each
+        level as initial guess of the next finer one. Each level is published right away, such that a coarse alpha
+        matte is visible long before the full resolution solve, which then starts close to its solution. New events
+        interrupt the coarse levels, the full resolution solve then starts from the level reached so far.
+
+        :return: None
+        """
+        kernel = self.kernel[1]
+        shape = self.get_shape()
+        images = (
+            self.canvas.reshape(-1, 3),
+            self.flatten2D(get_foreground_area_(self.trimapPreviewView)),
+            self.flatten2D(get_known_area_(self.trimapPreviewView)),
+        )
+        levels = []
+        for level in range(self.progressiveLevels):
+            h, w = shape
+            if min(h, w) // 2 <= 4 * self.get_radius():
+                break
+            P = self.make_P(shape, kernel)[0]
+            P = scipy.sparse.diags(1 / np.asarray(P.sum(axis=1)).ravel()) @ P
+            images = tuple(P @ image for image in images)
+            levels.append((shape, P, images))
+            shape = (h // 2, w // 2)
+        alpha = None
+        for level in reversed(range(len(levels))):
+            shape, P, (canvas, isForeground, isKnown) = levels[level]
+            alpha, finished = self.solveCoarse(
+                (shape[0] // 2, shape[1] // 2), canvas, isForeground, isKnown, alpha
+            )
+            alpha = self.upsample(alpha, shape, P)
+            preview = alpha
+            for finerShape, finerP, _ in reversed(levels[:level]):
+                preview = self.upsample(preview, finerShape, finerP)
+            self.alpha = preview.astype(self.get_dtype())
+            if self.reduced:
+                self.fix_alpha()
+            self.reset_r()
+            self.publish(force=True)
+            if not finished:
+                return
+
+    def solveCoarse(self, shape, canvas, isForeground, isKnown, alpha):
+        """Solves the system of a downsampled image with the jacobi preconditioned cg-Method up to progressiveRtol in
+        chunks that fit into the time budget. The solve stops early as soon as new events arrive. Pixels that are only
+        partially covered by the known area of the trimap are unknown.
+
+        :param shape: shape of the downsampled image
+        :param canvas: downsampled canvas of shape (h * w, 3)
+        :param isForeground: fraction of the foreground area covered by each pixel
+        :param isKnown: fraction of the known area covered by each pixel
+        :param alpha: initial guess or None
+        :return: (alpha matte of the downsampled image, whether it has been solved without interruption)
+        """
+        h, w = shape
+        lmd = self.get_lambda()
+        b = lmd * (isForeground >= 1 - 1e-9)
+        c = lmd * (isKnown >= 1 - 1e-9)
+        L = make_laplacian(
+            self.get_laplacian(),
+            canvas.reshape(h, w, 3),
+            self.get_epsilon(),
+            self.get_radius(),
+            partial(self.constructionStep, "laplacian"),
+            self.blockSize,
+        )
+        A = self.spFitIndices(L + scipy.sparse.diags(c))
+        alpha = np.zeros_like(b) if alpha is None else alpha
+        A_diag_inv = 1 / self.spDiag(A)
+        r = b - self.spDot(A, alpha)
+        z = A_diag_inv * r
+        Az = np.empty_like(b)
+        s = np.empty_like(b)
+        norm_r = self.vecNorm2(r)
+        norm_target = self.progressiveRtol * self.vecNorm2(b)
+        budget = self.get_time_budget() / 1000.0
+        chunkSize = 1
+        remaining = self.maxChunkSize
+        while remaining > 0 and norm_r > norm_target:
+            if not self.eventQueue.empty():
+                return alpha, False
+            start = time()
+            iterations, norm_r = self.cgd_jacobi_fused_chunk(
+                A,
+                alpha,
+                r,
+                z,
+                A_diag_inv,
+                Az,
+                s,
+                norm_r,
+                norm_target,
+                min(chunkSize, remaining),
+                np.empty((0,), dtype=np.int64),
+            )
+            if iterations == 0:
+                break
+            remaining -= iterations
+            elapsed = time() - start
+            if elapsed > 0:
+                chunkSize = max(1, int(budget * iterations / elapsed))
+        return alpha, True
+
+    def upsample(self, x, shape, P):
+        """Upsamples a vector with the transposed downsampling matrix, whose rows are normalized. The last row and
+        column of an image with odd height or width are not covered by P and repeat their neighbours.
+
+        :param x: vector of the downsampled image
+        :param shape: shape of the upsampled image
+        :param P: downsampling matrix of make_P with normalized rows
+        :return: upsampled vector
+        """
+        h, w = shape
+        weights = P.T @ np.ones_like(x)
+        result = (P.T @ x) / np.maximum(weights, 1e-12)
+        result = result.reshape(h, w)
+        if h % 2:
+            result[-1] = result[-2]
+        if w % 2:
+            result[:, -1] = result[:, -2]
+        return result.reshape(-1)
+
     def solve(self):
-        """Performs an iteration of the specified method if the tolerance has not been reached yet
+        """Performs an iteration, or a chunk of iterations if chunked is set, of the specified method if the tolerance
+        has not been reached yet
 
         :return: Error
         """
         try:
+            self.construction.cancelled = self.is_superseded
+            self.update_rebuild()
+            if self.previewAlpha is not None:
+                self.adoptPreview()
+            if self.localRects:
+                self.solveLocal()
+            if self.progressivePending:
+                self.progressivePending = False
+                if self.progressive:
+                    self.solveProgressive()
             self.error, toleranceReached = self.calculate_error()
-            method = self.get_method()
-            if toleranceReached is True:
+            if toleranceReached is True and self.refine():
+                self.error, toleranceReached = self.calculate_error()
+            iterations = 0
+            if toleranceReached is True and self.rebuild is not None:
+                # the system is about to be swapped, don't wait for new events
+                futures.wait([self.rebuild], self.get_time_budget() / 1000.0)
+            elif toleranceReached is True:
+                self.store_cache()
+                self.store_state()
+                self.publish(force=True)
                 self.calculationEnd = time()
                 print(
                     f"Time: {timedelta(seconds=self.calculationEnd - self.calculationStart)}"
                 )
+                self.calculated.emit(self.error, self.rtol)
                 self.toleranceReached.emit()
                 self.continueEvent.clear()
-                self.continueEvent.wait()
-            elif method.isCgd():
-                M = self.get_M()
-                if M:
-                    self.alpha, self.r, self.z = self.cgd_preconditioned(
-                        self.get_A(), self.get_alpha(), self.get_r(), self.get_z(), M
-                    )
+                # the controller only restarts a solver that waits, an event queued before the clear would be missed
+                if self.eventQueue.empty():
+                    self.continueEvent.wait()
+                # waking up, e.g. to store the cache once the project is saved, doesn't change the alpha matte
+                return self.error
+            else:
+                self.telemetry.reset()
+                if self.chunked:
+                    iterations = self.iterateChunk()
                 else:
-                    self.alpha, self.r, self.p = self.cgd(
-                        self.get_A(), self.get_alpha(), self.get_r(), self.get_p()
+                    self.iterate()
+                    iterations = 1
+            self.publish()
+            self.calculated.emit(self.error, self.rtol)
+            if iterations:
+                norm_b = self.get_norm_b()
+                residual = self.get_norm_r() / norm_b if norm_b != 0 else None
+                self.iterated.emit(
+                    self.telemetry.record(iterations, residual, self.get_memory())
+                )
+            return self.error
+        except:
+            pass
+        finally:
+            self.construction.cancelled = None
+
+    def publish(self, force=False, alpha=None):
+        """Writes the alpha matte into the alpha view at most 'publishRate' times per second. The quantized alpha matte
+        is first written into a back buffer and only the tiles that changed are copied into the alpha view while holding
+        its lock, such that the view never draws a half written alpha matte. A preview stays visible until the error of
+        the alpha matte is below its own.
+
+        :param force: publish regardless of when the alpha matte has been published the last time
+        :param alpha: alpha matte to publish instead of the current one
+        :return: None
+        """
+        if alpha is None:
+            if self.previewAlpha is not None:
+                return
+            if self.previewError is not None:
+                if self.error > self.previewError and not force:
+                    return
+                self.previewError = None
+        now = time()
+        if force or now - self.lastPublish >= 1 / self.publishRate:
+            self.lastPublish = now
+            with self.telemetry.measure("publish"):
+                dirty = quantize_tiles_(
+                    self.get_alpha() if alpha is None else alpha,
+                    self.alphaBackBuffer,
+                    self.tileSize,
+                )
+                with self.alphaViewLock:
+                    copy_tiles_(
+                        self.alphaBackBuffer, self.alphaView, dirty, self.tileSize
                     )
-            elif method.isVcycle():
-                self.r = self.get_b() - self.spDot(self.get_A(), self.get_alpha())
+
+    def iterate(self):
+        """Performs a single iteration of the specified method
+
+        :return: None
+        """
+        method = self.get_method()
+        if method.isCgd():
+            M = self.get_M()
+            if M and self.fused:
+                self.norm_r = self.cgd_preconditioned_fused(
+                    self.get_A(),
+                    self.get_alpha(),
+                    self.get_r(),
+                    self.get_z(),
+                    M,
+                    self.get_workspace("Az"),
+                    self.get_rows(),
+                )
+            elif M:
+                self.alpha, self.r, self.z = self.cgd_preconditioned(
+                    self.get_A(), self.get_alpha(), self.get_r(), self.get_z(), M
+                )
+                self.reset_norm_r()
+            elif self.fused:
+                self.norm_r = self.cgd_fused(
+                    self.get_A(),
+                    self.get_alpha(),
+                    self.get_r(),
+                    self.get_p(),
+                    self.get_workspace("Ap"),
+                    self.get_rows(),
+                )
+            else:
+                self.alpha, self.r, self.p = self.cgd(
+                    self.get_A(), self.get_alpha(), self.get_r(), self.get_p()
+                )
+                self.reset_norm_r()
+        elif method.isVcycle():
+            self.r = self.get_b() - self.spDot(self.get_A(), self.get_alpha())
+            self.reset_norm_r()
+            with self.telemetry.measure("preconditioner"):
                 self.alpha += self.vcycle(
                     self.get_A(),
                     self.get_r(),
@@ -223,31 +846,348 @@ class Solver(qtc.QObject, Thread):
                     self.get_cache(),
                     self.get_pre_iter(),
                     self.get_post_iter(),
+                    rows=self.get_vcycle_rows(),
                 )
-            self.alphaView[...] = np.clip(
-                self.get_alpha().reshape(self.alphaView.shape) * 255.0, 0, 255
+        elif method.isSchwarz():
+            self.norm_r = self.schwarzSweep()
+
+    def schwarzSweep(self):
+        """Performs a sweep of the restricted additive Schwarz method. The canvas is split into tiles, which are
+        extended by schwarzOverlap pixels plus a ring of 2 * radius pixels whose alpha values are fixed. Only the rows of
+        the pixels inside the ring are complete in the Laplacian of an extended tile, such that each worker solves the
+        exact local system of its tile with the current alpha matte as boundary values. The solutions of the tiles
+        without their overlap are written back once all tiles have been solved.
+
+        :return: |r| of the alpha matte before the sweep
+        """
+        h, w = self.get_shape()
+        d = 2 * self.get_radius()
+        alpha = self.get_alpha().reshape(h, w)
+        tiles = self.get_schwarz_tiles()
+        futures = []
+        for core, extended in tiles:
+            x0, y0, xn, yn = extended
+            ring = (
+                d if x0 > 0 else 0,
+                d if y0 > 0 else 0,
+                d if xn < w else 0,
+                d if yn < h else 0,
             )
-            self.calculated.emit(self.error, self.rtol)
-            return self.error
-        except:
-            pass
+            futures.append(
+                self.get_pool().submit(
+                    solve_schwarz_tile,
+                    self.canvas[y0:yn, x0:xn].copy(),
+                    self.trimapPreviewView[y0:yn, x0:xn].copy(),
+                    alpha[y0:yn, x0:xn].astype(np.float64),
+                    ring,
+                    (core[0] - x0, core[1] - y0, core[2] - x0, core[3] - y0),
+                    self.get_laplacian(),
+                    self.get_epsilon(),
+                    self.get_radius(),
+                    self.get_lambda(),
+                    self.get_rtol(),
+                    self.maxChunkSize,
+                )
+            )
+        results = [future.result() for future in futures]
+        squaredNorm = 0.0
+        for ((x0, y0, xn, yn), _), (values, squaredResidual) in zip(tiles, results):
+            alpha[y0:yn, x0:xn] = values
+            squaredNorm += squaredResidual
+        return np.sqrt(squaredNorm)
+
+    def iterateChunk(self):
+        """Performs as many iterations as fit into the time budget before the events are checked again.
+        Unpreconditioned and jacobi preconditioned cgd run the whole chunk inside a single numba call, whose number of
+        iterations is adapted to the measured cost of an iteration. All other methods iterate until the time budget is
+        exhausted or new events arrive.
+
+        :return: number of performed iterations
+        """
+        start = time()
+        norm_target = self.get_norm_target()
+        method = self.get_method()
+        preconditioner = self.get_preconditioner()
+        if method.isCgd() and self.fused and preconditioner.isNone():
+            iterations, self.norm_r = self.cgd_fused_chunk(
+                self.get_A(),
+                self.get_alpha(),
+                self.get_r(),
+                self.get_p(),
+                self.get_workspace("Ap"),
+                self.get_norm_r(),
+                norm_target,
+                self.get_chunk_size(),
+                self.get_rows(),
+            )
+        elif method.isCgd() and self.fused and preconditioner.isJacobi():
+            iterations, self.norm_r = self.cgd_jacobi_fused_chunk(
+                self.get_A(),
+                self.get_alpha(),
+                self.get_r(),
+                self.get_z(),
+                self.get_A_diag_inv(),
+                self.get_workspace("Az"),
+                self.get_workspace("s"),
+                self.get_norm_r(),
+                norm_target,
+                self.get_chunk_size(),
+                self.get_rows(),
+            )
+        else:
+            budget = self.get_time_budget() / 1000.0
+            iterations = 0
+            while True:
+                self.iterate()
+                iterations += 1
+                if (
+                    time() - start >= budget
+                    or not self.eventQueue.empty()
+                    or self.get_norm_r() <= norm_target
+                ):
+                    break
+        self.adaptChunkSize(iterations, time() - start)
+        return iterations
+
+    def update_rebuild(self):
+        """Submits the requested rebuild of the system to the worker, or swaps in the rebuilt system once the worker is
+        done. L, A and the V-Cycle hierarchy are replaced together, while the alpha matte is kept as initial guess. A is
+        rebuilt from the new L if the trimap or lambda changed in the meantime and L as well if other settings of it
+        changed.
+
+        :return: None
+        """
+        if self.rebuildRequested:
+            self.rebuildRequested = False
+            self.memoryEstimated.emit(self.get_memory_estimate())
+            self.rebuildCancelled = Event()
+            self.rebuild = self.get_rebuild_pool().submit(
+                self.rebuild_system,
+                self.get_system_settings(),
+                self.canvas,
+                self.get_kernel()[1],
+                self.get_c().copy(),
+                self.get_unknown().copy() if self.reduced else None,
+                self.rebuildCancelled,
+            )
+        elif self.rebuild is not None and self.rebuild.done():
+            future, self.rebuild = self.rebuild, None
+            try:
+                settings, key, seconds, L, A, c, unknown, cache = future.result()
+            except Exception:
+                settings = None
+            self.reset_L()
+            if settings != self.get_system_settings():
+                return
+            self.L = L
+            self.L_key = key
+            if np.array_equal(c, self.get_c()) and (
+                unknown is None or np.array_equal(unknown, self.get_unknown())
+            ):
+                self.A = A
+                self.cache = cache
+            self.laplacianBuilt.emit(settings["laplacian"], seconds, self.get_L_nnz())
+
+    def rebuild_system(self, settings, canvas, kernel, c, unknown, cancelled):
+        """Builds L, A and the V-Cycle hierarchy on the worker of update_rebuild. The hierarchy is filled by a
+        V-Cycle of a zero right hand side. The construction stops with ConstructionCancelled once the rebuild has been
+        discarded.
+
+        :param settings: settings of get_system_settings
+        :param canvas: normalized rgb image
+        :param kernel: flattened 3x3 matrix
+        :param c: data term
+        :param unknown: mask of the unknown pixels for the reduced system, None otherwise
+        :param cancelled: Event that is set when the rebuild is discarded
+        :return: (settings, key of L, seconds spent on L, L, A, c, unknown, hierarchy)
+        """
+        self.construction.cancelled = cancelled.is_set
+        try:
+            start = time()
+            key = self.make_L_key(
+                canvas, settings["laplacian"], settings["epsilon"], settings["radius"]
+            )
+            L = self.make_L(
+                canvas,
+                settings["laplacian"],
+                settings["epsilon"],
+                settings["radius"],
+                settings["storage"],
+                settings["dtype"],
+                key,
+            )
+            seconds = time() - start
+            A = self.make_A(L, c, unknown)
+            cache = None
+            if settings["hierarchy"]:
+                cache = {}
+                self.vcycle(
+                    A,
+                    np.zeros(A.shape[0], dtype=A.dtype),
+                    self.get_shape(),
+                    kernel,
+                    cache,
+                    self.get_pre_iter(),
+                    self.get_post_iter(),
+                )
+            return settings, key, seconds, L, A, c, unknown, cache
+        finally:
+            self.construction.cancelled = None
+
+    def constructionStep(self, stage, fraction):
+        """Reports the progress of the construction of an operator after each of its blocks and cuts the construction
+        short if the operator is no longer needed. Inside solve the pending events are checked, on the worker of
+        update_rebuild whether the rebuild has been discarded. Elsewhere, like while processing events, the
+        construction always finishes.
+
+        :param stage: "laplacian", "interpolation" or "galerkin"
+        :param fraction: finished fraction of the stage
+        :return: None
+        """
+        self.constructionProgressed.emit(stage, fraction)
+        cancelled = getattr(self.construction, "cancelled", None)
+        if cancelled is not None and cancelled():
+            raise ConstructionCancelled(stage)
+
+    def adaptChunkSize(self, iterations, elapsed):
+        """Chooses the number of iterations of the next chunk such that it fits into the time budget
+
+        :param iterations: number of iterations of the last chunk
+        :param elapsed: duration of the last chunk in seconds
+        :return: None
+        """
+        if iterations > 0 and elapsed > 0:
+            costPerIteration = elapsed / iterations
+            chunkSize = int(self.get_time_budget() / 1000.0 / costPerIteration)
+            self.chunkSize = max(1, min(chunkSize, self.maxChunkSize))
 
     # ================================================= GETTERS =======================================================#
     def get_b(self):
         if self.b is None:
-            self.b = make_b_(self.trimapPreviewView, self.get_lambda())
+            if self.reduced:
+                L = self.get_L()
+                self.b = make_reduced_b_(
+                    (L.data, L.indices, L.indptr, L.shape),
+                    self.get_unknown(),
+                    self.get_fixed(),
+                )
+                self.fix_alpha()
+            else:
+                self.b = make_b_(self.trimapPreviewView, self.get_lambda()).astype(
+                    self.get_dtype(), copy=False
+                )
         return self.b
 
     def get_c(self):
         if self.c is None:
-            self.c = make_c_(self.trimapPreviewView, self.get_lambda())
+            self.c = make_c_(self.trimapPreviewView, self.get_lambda()).astype(
+                self.get_dtype(), copy=False
+            )
         return self.c
 
     def get_L(self):
         if self.L is None:
-            self.L = cf_laplacian(self.canvas, self.get_epsilon(), self.get_radius())
+            self.memoryEstimated.emit(self.get_memory_estimate())
+            start = time()
+            self.L = self.make_L(
+                self.canvas,
+                self.get_laplacian(),
+                self.get_epsilon(),
+                self.get_radius(),
+                self.get_storage(),
+                self.get_dtype(),
+                self.get_L_key(),
+            )
+            self.laplacianBuilt.emit(
+                self.get_laplacian(), time() - start, self.get_L_nnz()
+            )
         return self.L
 
+    def make_L(self, canvas, laplacian, epsilon, radius, storage, dtype, key):
+        """Builds the Laplacian in the given storage, or loads the csr Laplacian from the disk cache. It only reads
+        the disk cache of the solver, such that it can run on the worker of update_rebuild.
+
+        :param canvas: normalized rgb image
+        :param laplacian: Laplacian
+        :param epsilon: regularization
+        :param radius: radius of the windows
+        :param storage: Storage
+        :param dtype: float type of the matrix
+        :param key: key of the Laplacian inside the disk cache
+        :return: Laplacian
+        """
+        progress = partial(self.constructionStep, "laplacian")
+        progress(0.0)
+        if storage.isMatrixFree():
+            kind = (
+                LkmLaplacianOperator
+                if laplacian.isLargeKernel()
+                else CfLaplacianOperator
+            )
+            L = kind(canvas, epsilon, radius)
+            progress(1.0)
+            return L
+        if storage.isStencil():
+            return make_stencil_laplacian(
+                canvas, epsilon, radius, progress, self.blockSize
+            ).astype(dtype)
+        L = self.diskCache.loadLaplacian(key) if self.diskCache is not None else None
+        if L is None:
+            L = make_laplacian(
+                laplacian, canvas, epsilon, radius, progress, self.blockSize
+            )
+            if self.diskCache is not None:
+                self.diskCache.saveLaplacian(key, L)
+        return self.spFitIndices(L.astype(dtype, copy=False))
+
+    def get_L_nnz(self):
+        """
+        :return: number of stored entries of L, None if it is matrix free
+        """
+        if isinstance(self.L, CfLaplacianOperator):
+            return None
+        if isinstance(self.L, StencilMatrix):
+            return int(np.count_nonzero(self.L.data))
+        return self.L.nnz
+
+    def get_L_key(self):
+        """Returns the key of the Laplacian inside the disk cache
+
+        :return: hash of the canvas, the Laplacian, epsilon and radius
+        """
+        if self.L_key is None:
+            self.L_key = self.make_L_key(
+                self.canvas, self.get_laplacian(), self.get_epsilon(), self.get_radius()
+            )
+        return self.L_key
+
+    def make_L_key(self, canvas, laplacian, epsilon, radius):
+        return DiskCache.key(canvas, laplacian, epsilon, radius)
+
+    def get_transfer_key(self):
+        """Returns the key of the transfer operators of the V-Cycle hierarchy inside the disk cache
+
+        :return: hash of the shape, the kernel and the precision
+        """
+        return DiskCache.key(
+            self.get_shape(), self.get_kernel()[1], np.dtype(self.get_dtype())
+        )
+
+    def get_hierarchy_key(self):
+        """Returns the key of the V-Cycle hierarchy inside the disk cache. Besides the Laplacian, the coarse matrices
+        depend on the trimap through the data term, or the unknown pixels of the reduced system.
+
+        :return: hash of everything A and the kernel depend on
+        """
+        return DiskCache.key(
+            self.get_L_key(),
+            self.get_kernel()[0],
+            self.get_storage(),
+            self.get_dtype(),
+            self.reduced,
+            self.get_unknown() if self.reduced else self.get_c(),
+        )
+
     def get_L_diag(self):
         if self.L_diag is None:
             self.L_diag = self.spDiag(self.get_L())
@@ -255,9 +1195,96 @@ class Solver(qtc.QObject, Thread):
 
     def get_A(self):
         if self.A is None:
-            self.A = self.get_L() + scipy.sparse.diags(self.get_c())
+            self.A = self.make_A(
+                self.get_L(), self.get_c(), self.get_unknown() if self.reduced else None
+            )
         return self.A
 
+    def make_A(self, L, c, unknown=None):
+        """Builds the matrix of the system from the Laplacian
+
+        :param L: Laplacian
+        :param c: data term
+        :param unknown: mask of the unknown pixels for the reduced system, None otherwise
+        :return: A
+        """
+        if unknown is not None:
+            return self.make_reduced_A(L, unknown)
+        if not scipy.sparse.issparse(L):
+            return L.shifted(c)
+        return self.spFitIndices(L + scipy.sparse.diags(c))
+
+    def get_storage(self):
+        """Returns the storage of L and A for the current settings. The reduced system rewrites the entries of A inside
+        the csr structure of L and the matrix free Laplacian has no entries for the coarse matrices of the V-Cycle, so
+        both fall back to csr. Only the closed-form Laplacian has a matrix free and a stencil form.
+
+        :return: Storage
+        """
+        if self.reduced or not self.get_laplacian().hasWindows():
+            return Storage.csr
+        if self.storage.isMatrixFree() and (
+            not self.get_method().isCgd() or self.get_preconditioner().isVcycle()
+        ):
+            return Storage.csr
+        return self.storage
+
+    def get_dtype(self):
+        """Returns the precision of L, A, alpha and the vectors of the cg-Method. The Laplacian is always assembled from
+        the double precision canvas, because epsilon is below the resolution of float32. The matrix free Laplacian
+        evaluates the windows of the canvas on the fly and therefore stays in double precision, as do the tiles of the
+        Schwarz method.
+
+        :return: np.float32 if single precision is used, np.float64 otherwise
+        """
+        if (
+            self.singlePrecision
+            and not self.get_storage().isMatrixFree()
+            and not self.get_method().isSchwarz()
+        ):
+            return np.float32
+        return np.float64
+
+    def get_memory_estimate(self):
+        """Estimates the peak memory of L, A and the vectors of the cg-Method for the current settings, before L is
+        built. The csr Laplacian is assembled by pymatting with float64 values and int64 indices for all
+        (4 * radius + 1)^2 neighbours of a pixel, before it is converted to the index type of spFitIndices. The random
+        walk Laplacian only connects the (2 * radius + 1)^2 neighbours and the KNN Laplacian the at most 60 nearest
+        neighbours of both of its feature spaces.
+
+        :return: estimated number of bytes
+        """
+        n = self.get_height() * self.get_width()
+        laplacian = self.get_laplacian()
+        if laplacian.isKnn():
+            size = 60
+        elif laplacian.isRandomWalk():
+            size = (2 * self.get_radius() + 1) ** 2
+        else:
+            size = (4 * self.get_radius() + 1) ** 2
+        itemsize = np.dtype(self.get_dtype()).itemsize
+        storage = self.get_storage()
+        if self.get_method().isSchwarz():
+            # L, A and the reduced A of an extended tile in each worker
+            tile = (
+                self.schwarzTileSize + 2 * self.schwarzOverlap + 4 * self.get_radius()
+            ) ** 2
+            return 3 * 12 * size * tile * self.schwarzWorkers + 2 * itemsize * n
+        # mean colors, inverse covariances and coefficients of the windows
+        windows = 16 * 8 * n
+        if storage.isMatrixFree():
+            matrices = windows
+        elif storage.isStencil():
+            matrices = windows + 2 * size * n * itemsize
+        else:
+            nnz = size * n
+            index = 8 if max(nnz, n) > np.iinfo(np.int32).max else 4
+            matrices = 16 * nnz + 2 * ((itemsize + index) * nnz + index * (n + 1))
+            if self.get_method().isVcycle() or self.get_preconditioner().isVcycle():
+                # the coarse levels add about a third of the entries of A
+                matrices += ((itemsize + index) * nnz) // 3
+        return matrices + 10 * itemsize * n
+
     def get_alpha(self):
         return self.alpha
 
@@ -266,11 +1293,59 @@ class Solver(qtc.QObject, Thread):
             self.r = self.get_b() - self.spDot(self.get_A(), self.get_alpha())
         return self.r
 
+    def get_norm_r(self):
+        if self.norm_r is None:
+            if self.get_method().isSchwarz():
+                # the residual of the Schwarz method is only known after a sweep
+                return self.get_norm_b()
+            self.norm_r = self.vecNorm2(self.get_r())
+        return self.norm_r
+
     def get_norm_b(self):
         if self.norm_b is None:
-            self.norm_b = self.vecNorm2(self.get_b())
+            if self.get_method().isSchwarz():
+                self.norm_b = self.vecNorm2(
+                    make_b_(self.trimapPreviewView, self.get_lambda())
+                )
+            elif self.reduced:
+                self.norm_b = self.vecNorm2(self.get_b()[self.get_unknown_ind()])
+            else:
+                self.norm_b = self.vecNorm2(self.get_b())
         return self.norm_b
 
+    def get_unknown(self):
+        if self.unknown is None:
+            self.unknown = np.logical_not(
+                get_known_area_(self.trimapPreviewView)
+            ).reshape(-1)
+        return self.unknown
+
+    def get_unknown_ind(self):
+        if self.unknown_ind is None:
+            self.unknown_ind = np.flatnonzero(self.get_unknown())
+        return self.unknown_ind
+
+    def get_fixed(self):
+        if self.fixed is None:
+            self.fixed = self.flatten2D(
+                get_foreground_area_(self.trimapPreviewView), self.get_dtype()
+            )
+        return self.fixed
+
+    def get_rows(self):
+        """Returns the rows the iterations of cgd work on
+
+        :return: the indices of the unknown pixels in the reduced system, an empty array meaning all rows otherwise
+        """
+        if self.reduced:
+            return self.get_unknown_ind()
+        return np.empty((0,), dtype=np.int64)
+
+    def get_vcycle_rows(self):
+        if self.reduced:
+            return self.get_unknown_ind()
+        return None
+
     def get_M(self):
         if self.M is None:
             preconditioner = self.get_preconditioner()
@@ -285,12 +1360,89 @@ class Solver(qtc.QObject, Thread):
                     self.get_cache(),
                     self.get_pre_iter(),
                     self.get_post_iter(),
+                    rows=self.get_vcycle_rows(),
                 )
             elif preconditioner.isJacobi():
-                A_diag_inv = scipy.sparse.diags(1 / self.spDiag(self.get_A()))
-                self.M = lambda r: A_diag_inv.dot(r)
+                self.M = lambda r: self.get_A_diag_inv() * r
         return self.M
 
+    def get_memory(self):
+        """Bytes currently held by L, A and the V-Cycle hierarchy, arrays shared with L are only counted for L
+
+        :return: dictionary
+        """
+        return memory(L=self.L, A=self.A, cache=self.cache)
+
+    def get_telemetry_path(self):
+        return os.path.join(self.projectPath or os.getcwd(), telemetryFileName)
+
+    def get_system_settings(self):
+        """Settings that L, A and the V-Cycle hierarchy depend on, besides the images and lambda
+
+        :return: dictionary
+        """
+        return {
+            "laplacian": self.get_laplacian(),
+            "epsilon": self.get_epsilon(),
+            "radius": self.get_radius(),
+            "storage": self.get_storage(),
+            "dtype": self.get_dtype(),
+            "reduced": self.reduced,
+            "kernel": self.get_kernel()[0],
+            "hierarchy": self.get_method().isVcycle()
+            or self.get_method().isCgd()
+            and self.get_preconditioner().isVcycle(),
+        }
+
+    def is_superseded(self):
+        """
+        :return: whether a QuitEvent or a new canvas is pending, which make the operators under construction useless
+        """
+        with self.eventQueue.mutex:
+            events = list(self.eventQueue.queue)
+        return any(
+            isinstance(event, QuitEvent)
+            or isinstance(event, UpdateEvent)
+            and event.reason == Reason.canvasChanged
+            for event in events
+        )
+
+    def is_rebuilding(self):
+        return self.rebuildRequested or self.rebuild is not None
+
+    def get_rebuild_pool(self):
+        if self.rebuildPool is None:
+            self.rebuildPool = ThreadPoolExecutor(1, "Thread: Rebuild")
+        return self.rebuildPool
+
+    def get_schwarz_tiles(self):
+        """Splits the canvas into tiles of schwarzTileSize pixels
+
+        :return: list of ((x0, y0, xn, yn) of the tile, (x0, y0, xn, yn) of the extended tile)
+        """
+        h, w = self.get_shape()
+        size = self.schwarzTileSize
+        d = self.schwarzOverlap + 2 * self.get_radius()
+        tiles = []
+        for y0 in range(0, h, size):
+            for x0 in range(0, w, size):
+                xn, yn = min(w, x0 + size), min(h, y0 + size)
+                extended = (
+                    max(0, x0 - d),
+                    max(0, y0 - d),
+                    min(w, xn + d),
+                    min(h, yn + d),
+                )
+                tiles.append(((x0, y0, xn, yn), extended))
+        return tiles
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                self.schwarzWorkers, multiprocessing.get_context("spawn")
+            )
+        return self.pool
+
     def get_height(self):
         return self.h
 
@@ -313,16 +1465,118 @@ class Solver(qtc.QObject, Thread):
         return self.lmd
 
     def get_method(self):
+        """Returns the method for the current settings. The tiles of the Schwarz method are only pieces of the global
+        system for local Laplacians, so it falls back to cgd for the KNN Laplacian.
+
+        :return: Method
+        """
+        if self.method.isSchwarz() and not self.get_laplacian().isLocal():
+            return Method.cgd
         return self.method
 
     def get_preconditioner(self):
         return self.preconditioner
 
+    def get_laplacian(self):
+        return self.laplacian
+
     def get_cache(self):
         if self.cache is None:
-            self.cache = {}
+            # while rebuilding, the key belongs to the new system instead of the current one
+            if self.diskCache is not None and not self.is_rebuilding():
+                self.cache = self.load_hierarchy()
+            if self.cache is None:
+                self.cache = {}
         return self.cache
 
+    def load_hierarchy(self):
+        """Loads the V-Cycle hierarchy from the disk cache of the project. The transfer operators are loaded even if
+        the coarse matrices have been stored for another trimap, make_P takes them from there.
+
+        :return: V-Cycle cache {shape: (P, PT, A_diag, A_small, m_diag)} or None
+        """
+        kernel, dtype = self.get_kernel()[1], self.get_dtype()
+        transfer = self.diskCache.loadTransfer(self.get_transfer_key())
+        if transfer is not None:
+            for shape, operators in transfer.items():
+                self.transfer[DiskCache.key(shape, kernel, np.dtype(dtype))] = operators
+        levels = self.diskCache.loadHierarchy(self.get_hierarchy_key())
+        if levels is None:
+            return None
+        return {
+            shape: self.make_P(shape, kernel, dtype) + level
+            for shape, level in levels.items()
+        }
+
+    def store_cache(self):
+        """Writes the csr Laplacian and the transfer operators of the V-Cycle hierarchy into the disk cache of the
+        project, unless they are already stored there. Neither depends on the trimap, so they are written only once.
+
+        :return: None
+        """
+        if self.diskCache is None or self.is_rebuilding():
+            return
+        if isinstance(self.L, scipy.sparse.csr_matrix) and not self.diskCache.has(
+            "laplacian", self.get_L_key()
+        ):
+            self.diskCache.saveLaplacian(
+                self.get_L_key(), self.L.astype(np.float64, copy=False)
+            )
+        if self.cache:
+            key = self.get_transfer_key()
+            if not self.diskCache.has("transfer", key):
+                self.diskCache.saveTransfer(key, self.cache)
+
+    def store_hierarchy(self):
+        """Writes the coarse matrices of the V-Cycle hierarchy into the disk cache of the project, such that reopening
+        the project finds them. They depend on the trimap and are therefore only written when the project is saved or
+        the solver quits.
+
+        :return: None
+        """
+        if self.diskCache is None or self.is_rebuilding() or not self.cache:
+            return
+        key = self.get_hierarchy_key()
+        if not self.diskCache.has("hierarchy", key):
+            self.diskCache.saveHierarchy(key, self.cache)
+
+    def get_state_key(self):
+        """Returns the key of the solver state inside the disk cache
+
+        :return: hash of everything the solution of the system depends on
+        """
+        return DiskCache.key(
+            self.get_L_key(), self.trimapPreviewView, self.get_lambda()
+        )
+
+    def load_state(self):
+        """Replaces a loaded alpha matte by the unquantized alpha matte of the disk cache, if it has been stored for
+        the same system, such that reopening an unfinished project resumes where it left off
+
+        :return: True if the state has been loaded
+        """
+        if self.diskCache is None or not self.alphaLoaded:
+            return False
+        self.alphaLoaded = False
+        arrays = self.diskCache.load("state", self.get_state_key())
+        if arrays is None or arrays["alpha"].shape != self.alpha.shape:
+            return False
+        self.alpha = np.array(arrays["alpha"], dtype=self.get_dtype())
+        self.progressivePending = False
+        self.reset_r()
+        return True
+
+    def store_state(self):
+        """Writes the unquantized alpha matte into the disk cache of the project. The residual and the directions
+        are recalculated from it.
+
+        :return: None
+        """
+        if self.diskCache is not None and self.alpha.any() and not self.is_rebuilding():
+            self.diskCache.save(
+                "state", self.get_state_key(), {"alpha": self.get_alpha()}
+            )
+
     def get_pre_iter(self):
         return self.preiter
 
@@ -352,36 +1606,89 @@ class Solver(qtc.QObject, Thread):
             self.A_diag = self.spDiag(self.get_A())
         return self.A_diag
 
+    def get_A_diag_ptr(self):
+        """Returns the positions of the diagonal entries of A inside A.data, such that the data term c can be
+        written onto the diagonal without scipy's fancy indexing, which may change the sparsity structure
+
+        :return: positions of the diagonal entries
+        """
+        if self.A_diag_ptr is None:
+            A = self.get_A()
+            self.A_diag_ptr = sp_diag_ptr_((A.data, A.indices, A.indptr, A.shape))
+        return self.A_diag_ptr
+
+    def get_A_diag_inv(self):
+        if self.A_diag_inv is None:
+            self.A_diag_inv = 1 / self.get_A_diag()
+        return self.A_diag_inv
+
     def get_m_diag(self):
         if self.m_diag is None:
             A = self.get_A()
-            self.m_diag = self.flatten2D(self.get_A_diag() / A.multiply(A).sum(axis=0))
+            if not scipy.sparse.issparse(A):
+                self.m_diag = self.get_A_diag() / A.squaredSum()
+            else:
+                self.m_diag = self.flatten2D(
+                    self.get_A_diag() / A.multiply(A).sum(axis=0), A.dtype
+                )
         return self.m_diag
 
     def get_rtol(self):
         return self.rtol
 
+    def get_norm_target(self):
+        """Returns the norm of the residual at which the tolerance is reached
+
+        :return: rtol * |b| or 0 if the tolerance is disabled
+        """
+        rtol = self.get_rtol()
+        return rtol * self.get_norm_b() if rtol else 0.0
+
+    def get_time_budget(self):
+        return self.timeBudget
+
+    def get_chunk_size(self):
+        return self.chunkSize
+
+    def get_workspace(self, key):
+        """Returns a preallocated buffer of the size of alpha, which is reused between iterations
+
+        :param key: name of the buffer
+        :return: buffer
+        """
+        buffer = self.workspace.get(key, None)
+        alpha = self.get_alpha()
+        if buffer is None or buffer.shape != alpha.shape or buffer.dtype != alpha.dtype:
+            buffer = np.empty_like(self.get_alpha())
+            self.workspace[key] = buffer
+        return buffer
+
     # ================================================== SETTERS ======================================================#
 
     def setMethod(self, method: Method):
         self.method = method
+        self.reset_chunk_size()
+        self.reset_norm_b()
+        self.update_L_kind()
 
     def setLambda(self, lmd: int):
         self.lmd = float(lmd)
         self.reset_b()
-        self.reset_c()
+        self.update_lambda()
 
     def setPreconditioner(self, preconditioner: Preconditioner):
         self.preconditioner = preconditioner
         self.reset_M()
+        self.reset_chunk_size()
+        self.update_L_kind()
 
     def setRadius(self, radius: int):
         self.radius = radius
-        self.reset_L()
+        self.update_L()
 
     def setEpsilon(self, epsilon: float):
         self.epsilon = epsilon
-        self.reset_L()
+        self.update_L()
 
     def setKernel(self, kernel: Kernel):
         if kernel == Kernel.gaussian:
@@ -407,7 +1714,86 @@ class Solver(qtc.QObject, Thread):
     def setPrintError(self, printError):
         self.printError = printError
 
+    def setFused(self, fused: bool):
+        self.fused = fused
+
+    def setChunked(self, chunked: bool):
+        self.chunked = chunked
+
+    def setTimeBudget(self, timeBudget: int):
+        self.timeBudget = timeBudget
+        self.reset_chunk_size()
+
+    def setReduced(self, reduced: bool):
+        self.reduced = reduced
+        self.reset_unknown()
+        self.reset_b()
+        self.reset_c()
+        self.reset_chunk_size()
+        self.update_L_kind()
+
+    def setStorage(self, storage: Storage):
+        self.storage = storage
+        self.reset_chunk_size()
+        self.update_L_kind()
+
+    def setSinglePrecision(self, singlePrecision: bool):
+        self.singlePrecision = singlePrecision
+        self.reset_chunk_size()
+        self.update_L_kind()
+
+    def setRefinement(self, refinement: bool):
+        self.refinement = refinement
+
+    def setProgressive(self, progressive: bool):
+        self.progressive = progressive
+
+    def setSchwarzTileSize(self, tileSize: int):
+        self.schwarzTileSize = tileSize
+
+    def setSchwarzWorkers(self, workers: int):
+        self.schwarzWorkers = workers
+        self.reset_pool()
+
+    def setLaplacian(self, laplacian: Laplacian):
+        method = self.get_method()
+        self.laplacian = laplacian
+        if self.get_method() != method:
+            self.reset_chunk_size()
+            self.reset_norm_b()
+            self.update_L_kind()
+        self.update_L()
+
+    def setBackgroundRebuild(self, backgroundRebuild: bool):
+        self.backgroundRebuild = backgroundRebuild
+
+    def setPreview(self, preview: bool):
+        self.preview = preview
+
+    def setLocalSolve(self, localSolve: bool):
+        self.localSolve = localSolve
+        self.localRects = []
+
+    def setTelemetryLog(self, telemetryLog: bool):
+        self.telemetryLog = telemetryLog
+        self.update_telemetry_log()
+
+    def setProjectPath(self, path: str):
+        self.projectPath = path
+        self.diskCache = DiskCache(path) if path else None
+        self.update_telemetry_log()
+        self.load_state()
+        self.store_cache()
+        self.store_hierarchy()
+        self.store_state()
+
     # ================================================= UPDATERS ===========================================================#
+    def update_telemetry_log(self):
+        if self.telemetryLog:
+            self.telemetry.open(self.get_telemetry_path())
+        else:
+            self.telemetry.close()
+
     def update_b(self, rect, isForeground):
         update_flattend_2D_array_(
             rect, self.get_lambda(), isForeground, self.get_b(), self.get_shape()
@@ -420,35 +1806,220 @@ class Solver(qtc.QObject, Thread):
         )
         self.update_A(rect, self.get_width(), self.get_L_diag(), self.get_c())
 
-    def update_A(self, rect, w, L_diag, c):
-        ind, A_diag = getUpdatedADiag_(rect, w, L_diag, c)
-        self.get_A()[ind, ind] = A_diag
-        self.update_r(ind)
-        self.reset_A_Diag()
-
-    def update_m_diag(self, ind, A_diag):
-        A = self.get_A()[:, ind]
-        self.get_m_diag()[ind] = self.flatten2D(A_diag / A.multiply(A).sum(axis=0))
+    def update_reduced_system(self, rect, isForeground, isKnown):
+        """Re-indexes the reduced system after the trimap changed inside rect. The alpha values of pixels that became
+        known are fixed and the list of unknown pixels is spliced. Since a pixel is coupled to all pixels up to two
+        radii away, the rows of A, b and r are recalculated inside rect dilated by that distance.
 
-    def update_r(self, ind):
-        update_vec_(
-            ind,
-            self.get_b()[ind]
-            - (
-                self.spDot(
-                    self.get_A()[ind, 0 : self.get_A().shape[1]], self.get_alpha()
+        :param rect: (x0, y0, xn, yn) of the changed area
+        :param isForeground: foreground pixels inside rect
+        :param isKnown: known pixels inside rect
+        :return: None
+        """
+        h, w = self.get_shape()
+        x0, y0, xn, yn = rect
+        unknown = self.get_unknown()
+        fixed = self.get_fixed()
+        unknown.reshape(h, w)[y0:yn, x0:xn] = np.logical_not(isKnown)
+        fixed.reshape(h, w)[y0:yn, x0:xn] = isForeground
+        alpha = self.get_alpha().reshape(h, w)[y0:yn, x0:xn]
+        alpha[isKnown] = isForeground[isKnown]
+        self.update_unknown_ind(rect)
+        d = 2 * self.get_radius()
+        rect = (max(0, x0 - d), max(0, y0 - d), min(w, xn + d), min(h, yn + d))
+        ind = get_rect_indices_(rect, w)
+        L = self.get_L()
+        L = (L.data, L.indices, L.indptr, L.shape)
+        A = self.get_A()
+        update_reduced_data_(L, unknown, ind, A.data)
+        update_reduced_b_(L, unknown, fixed, ind, self.get_b())
+        self.reset_norm_b()
+        self.update_r(ind)
+        self.update_A_diag(ind, self.spDiagRows(A, ind))
+        self.update_M(rect)
+
+    def update_unknown_ind(self, rect):
+        if self.unknown_ind is not None:
+            w = self.get_width()
+            x0, y0, xn, yn = rect
+            start, end = y0 * w + x0, (yn - 1) * w + xn
+            lo, hi = np.searchsorted(self.unknown_ind, (start, end))
+            self.unknown_ind = np.concatenate(
+                (
+                    self.unknown_ind[:lo],
+                    start + np.flatnonzero(self.get_unknown()[start:end]),
+                    self.unknown_ind[hi:],
                 )
-            ),
-            self.get_r(),
+            )
+
+    def update_L(self):
+        """Requests a rebuild of L on the worker of update_rebuild after a setting of it changed, such that the solver
+        keeps iterating on the current system until the new one is ready. L is reset instead if it has not been built
+        yet, if the global system is not used by the method or if backgroundRebuild is disabled.
+
+        :return: None
+        """
+        if (
+            self.L is None
+            or not self.backgroundRebuild
+            or self.get_method().isSchwarz()
+        ):
+            self.reset_L()
+        else:
+            self.reset_rebuild()
+            self.rebuildRequested = True
+
+    def update_L_kind(self):
+        """Rebuilds L if it is not of the kind required by the current settings. If the precision changed, alpha is
+        converted and everything derived from the trimap is rebuilt as well.
+
+        :return: None
+        """
+        dtype = self.get_dtype()
+        if self.alpha.dtype != dtype:
+            self.alpha = self.alpha.astype(dtype)
+            self.reset_L()
+            self.reset_b()
+            self.reset_c()
+            self.reset_unknown()
+        if self.get_method().isSchwarz():
+            # the tiles build their own systems and the global one is not kept up to date with the trimap
+            self.reset_L()
+            self.reset_b()
+            self.reset_c()
+            self.reset_unknown()
+            return
+        if self.L is None:
+            return
+        storage = self.get_storage()
+        if storage.isMatrixFree():
+            kind = CfLaplacianOperator
+        elif storage.isStencil():
+            kind = StencilMatrix
+        else:
+            kind = scipy.sparse.csr_matrix
+        if not isinstance(self.L, kind):
+            self.reset_L()
+
+    def update_lambda(self):
+        """Recalculates c after lambda changed. Instead of rebuilding A, the new diagonal L_diag + c is written into
+        the diagonal entries of A. Only the preconditioner, which depends on all entries of A, is rebuilt.
+
+        :return: None
+        """
+        self.c = None
+        if isinstance(self.A, CfLaplacianOperator):
+            self.A.c = self.get_c()
+            self.reset_r()
+            self.reset_A_Diag()
+            self.reset_M()
+        elif isinstance(self.A, StencilMatrix):
+            self.A.data[self.A.center] = self.get_L_diag() + self.get_c()
+            self.reset_r()
+            self.reset_A_Diag()
+            self.reset_M()
+        elif self.A is not None and not self.reduced:
+            A_diag = self.get_L_diag() + self.get_c()
+            update_vec_(self.get_A_diag_ptr(), A_diag, self.A.data)
+            self.reset_r()
+            self.reset_A_Diag()
+            self.reset_M()
+
+    def update_A(self, rect, w, L_diag, c):
+        ind, A_diag = getUpdatedADiag_(rect, w, L_diag, c)
+        A = self.get_A()
+        if isinstance(A, CfLaplacianOperator):
+            update_vec_(ind, c[ind], A.c)
+        elif isinstance(A, StencilMatrix):
+            update_vec_(ind, A_diag, A.data[A.center])
+        else:
+            update_vec_(self.get_A_diag_ptr()[ind], A_diag, A.data)
+        self.update_r(ind)
+        self.update_A_diag(ind, A_diag)
+
+    def update_A_diag(self, ind, A_diag):
+        if self.A_diag is not None:
+            self.A_diag[ind] = A_diag
+        if self.A_diag_inv is not None:
+            self.A_diag_inv[ind] = 1 / A_diag
+        if self.m_diag is not None:
+            self.update_m_diag(ind, A_diag)
+
+    def update_m_diag(self, ind, A_diag):
+        self.get_m_diag()[ind] = A_diag / self.spColsSquaredSum(self.get_A(), ind)
+
+    def update_M(self, rect):
+        """Keeps the preconditioner after the diagonal of A changed inside rect. The jacobi preconditioner reads the
+        already updated diagonal of A, the V-Cycle hierarchy is patched by update_cache.
+
+        :param rect: (x0, y0, xn, yn) of the changed area
+        :return: None
+        """
+        self.update_cache(rect)
+
+    def update_cache(self, rect):
+        """Patches the V-Cycle hierarchy after the diagonal of A changed inside rect. On each level only the
+        diagonal and m_diag entries of the changed rows and the rows of the coarse operator whose stencil touches them
+        are recalculated. A coarse row affected by the fine rows x0 to xn - 1 lies between x0 // 2 and xn // 2.
+        If a recalculated row does not fit into the sparsity structure of the cached coarse operator, this level and all
+        coarser levels are dropped from the cache and rebuilt by the next V-Cycle.
+
+        :param rect: (x0, y0, xn, yn) of the changed area
+        :return: None
+        """
+        cache = self.get_cache()
+        A = self.get_A()
+        shape = self.get_shape()
+        while shape in cache:
+            P, PT, A_diag, A_small, m_diag = cache[shape]
+            h, w = shape
+            ind = get_rect_indices_(rect, w)
+            A_diag[ind] = self.spDiagRows(A, ind)
+            m_diag[ind] = A_diag[ind] / self.spColsSquaredSum(A, ind)
+            x0, y0, xn, yn = rect
+            rect = (
+                x0 // 2,
+                y0 // 2,
+                min(w // 2, xn // 2 + 1),
+                min(h // 2, yn // 2 + 1),
+            )
+            rows = get_rect_indices_(rect, w // 2)
+            rowsSmall = self.spLeftDot(P[rows], A).dot(PT)
+            if not self.spSetRows(A_small, rows, rowsSmall):
+                while shape in cache:
+                    del cache[shape]
+                    shape = (shape[0] // 2, shape[1] // 2)
+                break
+            A = A_small
+            shape = (h // 2, w // 2)
+
+    def update_r(self, ind):
+        self.reset_norm_r()
+        self.spUpdateResidualRows(
+            self.get_A(), self.get_b(), self.get_alpha(), ind, self.get_r()
         )
 
     # ================================================= RESETERS ======================================================#
 
     def reset_L(self):
+        self.reset_rebuild()
         self.L = None
+        self.L_key = None
         self.reset_L_diag()
         self.reset_A()
 
+    def reset_rebuild(self):
+        if self.rebuild is not None:
+            self.rebuild.cancel()
+            self.rebuildCancelled.set()
+        self.rebuild = None
+        self.rebuildRequested = False
+
+    def reset_rebuild_pool(self):
+        if self.rebuildPool is not None:
+            self.rebuildPool.shutdown(wait=False, cancel_futures=True)
+            self.rebuildPool = None
+
     def reset_norm_b(self):
         self.norm_b = None
 
@@ -457,6 +2028,7 @@ class Solver(qtc.QObject, Thread):
 
     def reset_A(self):
         self.A = None
+        self.A_diag_ptr = None
         self.reset_r()
         self.reset_A_Diag()
         self.reset_M()
@@ -464,9 +2036,14 @@ class Solver(qtc.QObject, Thread):
 
     def reset_r(self):
         self.r = None
+        self.reset_norm_r()
         self.reset_p()
         self.reset_z()
 
+    def reset_norm_r(self):
+        self.norm_r = None
+        self.refined = False
+
     def reset_p(self):
         self.p = None
 
@@ -484,11 +2061,18 @@ class Solver(qtc.QObject, Thread):
 
     def reset_A_Diag(self):
         self.A_diag = None
+        self.reset_A_diag_inv()
         self.reset_m_diag()
 
+    def reset_A_diag_inv(self):
+        self.A_diag_inv = None
+
     def reset_m_diag(self):
         self.m_diag = None
 
+    def reset_chunk_size(self):
+        self.chunkSize = 1
+
     def reset_b(self):
         self.b = None
         self.reset_norm_b()
@@ -498,6 +2082,17 @@ class Solver(qtc.QObject, Thread):
         self.c = None
         self.reset_A()
 
+    def reset_unknown(self):
+        self.unknown = None
+        self.unknown_ind = None
+        self.fixed = None
+        self.reset_A()
+
+    def reset_pool(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
     # ============================================= NUMBA WRAPPERS =========================================================#
 
     def addTile(self, dest: np.ndarray, a: np.ndarray, reps: int):
@@ -524,7 +2119,148 @@ class Solver(qtc.QObject, Thread):
         :param p: Direction
         :return: (alpha_new, r_new, p_new)
         """
-        return cgd_((A.data, A.indices, A.indptr, A.shape), alpha, r, p)
+        self.telemetry.transferred(nbytes(A, alpha, r, p) + p.nbytes)
+        with self.telemetry.measure("spmv"):
+            if not scipy.sparse.issparse(A):
+                return cgd_step_(alpha, r, p, A.dot(p))
+            return cgd_((A.data, A.indices, A.indptr, A.shape), alpha, r, p)
+
+    def cgd_fused(self, A, alpha, r, p, Ap, rows):
+        """Performs an iteration of the cg-Method like cgd, but updates alpha, r and p in place. The matrix vector
+        product is written into the preallocated buffer Ap and the inner products are accumulated in the same pass.
+
+        :param A: Matrix A
+        :param alpha: Current Alpha-Matte, updated in place
+        :param r: Residuum, updated in place
+        :param p: Direction, updated in place
+        :param Ap: Buffer of the same size as alpha
+        :param rows: rows to iterate on, all rows if empty. r and p have to be zero outside of them
+        :return: |r_new|
+        """
+        self.telemetry.transferred(nbytes(A, alpha, r, p, Ap))
+        with self.telemetry.measure("spmv"):
+            if isinstance(A, LkmLaplacianOperator):
+                return dot_cgd_fused(A, alpha, r, p, Ap)
+            if isinstance(A, CfLaplacianOperator):
+                return cf_cgd_fused_(A.tuple(), alpha, r, p, Ap)
+            if isinstance(A, StencilMatrix):
+                return st_cgd_fused_(A.tuple(), alpha, r, p, Ap)
+            return cgd_fused_(
+                (A.data, A.indices, A.indptr, A.shape), alpha, r, p, Ap, rows
+            )
+
+    def cgd_fused_chunk(
+        self, A, alpha, r, p, Ap, norm_r, norm_target, iterations, rows
+    ):
+        """Performs up to 'iterations' iterations of cgd_fused inside a single numba call
+
+        :param A: Matrix A
+        :param alpha: Current Alpha-Matte, updated in place
+        :param r: Residuum, updated in place
+        :param p: Direction, updated in place
+        :param Ap: Buffer of the same size as alpha
+        :param norm_r: |r|
+        :param norm_target: stop as soon as |r| falls below this value
+        :param iterations: maximum number of iterations
+        :param rows: rows to iterate on, all rows if empty
+        :return: (number of performed iterations, |r_new|)
+        """
+        with self.telemetry.measure("spmv"):
+            if isinstance(A, LkmLaplacianOperator):
+                result = dot_cgd_fused_chunk(
+                    A, alpha, r, p, Ap, norm_r, norm_target, iterations
+                )
+            elif isinstance(A, CfLaplacianOperator):
+                result = cf_cgd_fused_chunk_(
+                    A.tuple(), alpha, r, p, Ap, norm_r, norm_target, iterations
+                )
+            elif isinstance(A, StencilMatrix):
+                result = st_cgd_fused_chunk_(
+                    A.tuple(), alpha, r, p, Ap, norm_r, norm_target, iterations
+                )
+            else:
+                result = cgd_fused_chunk_(
+                    (A.data, A.indices, A.indptr, A.shape),
+                    alpha,
+                    r,
+                    p,
+                    Ap,
+                    norm_r,
+                    norm_target,
+                    iterations,
+                    rows,
+                )
+        self.telemetry.transferred(result[0] * nbytes(A, alpha, r, p, Ap))
+        return result
+
+    def cgd_jacobi_fused_chunk(
+        self, A, alpha, r, z, A_diag_inv, Az, s, norm_r, norm_target, iterations, rows
+    ):
+        """Performs up to 'iterations' iterations of cgd_preconditioned_fused with the jacobi preconditioner inside a
+        single numba call
+
+        :param A: Matrix A
+        :param alpha: Current Alpha-Matte, updated in place
+        :param r: Residuum, updated in place
+        :param z: Direction, updated in place
+        :param A_diag_inv: 1 / diag(A)
+        :param Az: Buffer of the same size as alpha
+        :param s: Buffer of the same size as alpha
+        :param norm_r: |r|
+        :param norm_target: stop as soon as |r| falls below this value
+        :param iterations: maximum number of iterations
+        :param rows: rows to iterate on, all rows if empty
+        :return: (number of performed iterations, |r_new|)
+        """
+        with self.telemetry.measure("spmv"):
+            if isinstance(A, LkmLaplacianOperator):
+                result = dot_pcgd_jacobi_fused_chunk(
+                    A, alpha, r, z, A_diag_inv, Az, s, norm_r, norm_target, iterations
+                )
+            elif isinstance(A, CfLaplacianOperator):
+                result = cf_pcgd_jacobi_fused_chunk_(
+                    A.tuple(),
+                    alpha,
+                    r,
+                    z,
+                    A_diag_inv,
+                    Az,
+                    s,
+                    norm_r,
+                    norm_target,
+                    iterations,
+                )
+            elif isinstance(A, StencilMatrix):
+                result = st_pcgd_jacobi_fused_chunk_(
+                    A.tuple(),
+                    alpha,
+                    r,
+                    z,
+                    A_diag_inv,
+                    Az,
+                    s,
+                    norm_r,
+                    norm_target,
+                    iterations,
+                )
+            else:
+                result = pcgd_jacobi_fused_chunk_(
+                    (A.data, A.indices, A.indptr, A.shape),
+                    alpha,
+                    r,
+                    z,
+                    A_diag_inv,
+                    Az,
+                    s,
+                    norm_r,
+                    norm_target,
+                    iterations,
+                    rows,
+                )
+        self.telemetry.transferred(
+            result[0] * nbytes(A, alpha, r, z, A_diag_inv, Az, s)
+        )
+        return result
 
     def spDot(self, A, b):
         """Performs the dot-product of a sparse Matrix A and a dense vector b
@@ -533,7 +2269,50 @@ class Solver(qtc.QObject, Thread):
         :param b: Dense Vector
         :return: A@b
         """
-        return sp_dot_((A.data, A.indices, A.indptr, A.shape), b)
+        self.telemetry.transferred(nbytes(A, b) + A.shape[0] * b.itemsize)
+        with self.telemetry.measure("spmv"):
+            if not scipy.sparse.issparse(A):
+                return A.dot(b)
+            return sp_dot_((A.data, A.indices, A.indptr, A.shape), b)
+
+    def spRows(self, mat, rows):
+        """Returns the given rows of a sparse matrix
+
+        :param mat: Sparse matrix
+        :param rows: row indices
+        :return: mat[rows] as scipy.sparse.csr_matrix
+        """
+        if scipy.sparse.issparse(mat):
+            return mat[rows]
+        return mat.rows(rows)
+
+    def spLeftDot(self, B, A):
+        """Calculates B@A for a sparse matrix B
+
+        :param B: Sparse matrix
+        :param A: Matrix A
+        :return: B@A as scipy.sparse.csr_matrix
+        """
+        if isinstance(A, StencilMatrix):
+            return A.leftDot(B)
+        return B.dot(A)
+
+    def spUpdateResidualRows(self, A, b, x, rows, r):
+        """Recalculates r = b - A@x in place for the given rows directly from the CSR arrays of A
+
+        :param A: Sparse matrix
+        :param b: Dense vector
+        :param x: Dense vector
+        :param rows: row indices
+        :param r: residual, updated in place
+        :return: None
+        """
+        if not scipy.sparse.issparse(A):
+            A.updateResidualRows(b, x, rows, r)
+        else:
+            sp_update_residual_rows_(
+                (A.data, A.indices, A.indptr, A.shape), b, x, rows, r
+            )
 
     def spDiag(self, mat):
         """Returns the Diagonal of a sparse matrix
@@ -541,18 +2320,115 @@ class Solver(qtc.QObject, Thread):
         :param mat: Sparse Matrix
         :return: diag(mat)
         """
+        if not scipy.sparse.issparse(mat):
+            return mat.diagonal()
         return sp_diag_((mat.data, mat.indices, mat.indptr, mat.shape))
 
-    def flatten2D(self, arr):
+    def spDiagRows(self, mat, rows):
+        """Returns the diagonal entries of the given rows of a sparse matrix
+
+        :param mat: Sparse Matrix
+        :param rows: row indices
+        :return: diag(mat)[rows]
+        """
+        if isinstance(mat, StencilMatrix):
+            return mat.data[mat.center, rows]
+        return sp_diag_rows_((mat.data, mat.indices, mat.indptr, mat.shape), rows)
+
+    def spColsSquaredSum(self, mat, cols):
+        """Returns the sum of the squared entries of the given columns of a sparse matrix with a symmetric sparsity
+        structure, such as the matrices of the solver. The entries of a column are summed in the same order as by
+        mat.multiply(mat).sum(axis=0), because the matrices are only symmetric up to rounding errors.
+
+        :param mat: Sparse Matrix
+        :param cols: column indices
+        :return: mat.multiply(mat).sum(axis=0)[cols]
+        """
+        if not scipy.sparse.issparse(mat):
+            return mat.squaredSum(cols)
+        return sp_cols_squared_sum_(
+            (mat.data, mat.indices, mat.indptr, mat.shape), cols
+        )
+
+    def spSetRows(self, mat, rows, values):
+        """Overwrites the given rows of a sparse matrix in place with the rows of another sparse matrix without changing
+        its sparsity structure
+
+        :param mat: Sparse matrix that is changed in place
+        :param rows: row indices of mat
+        :param values: Sparse matrix with len(rows) rows
+        :return: False if an entry of values does not exist in the sparsity structure of mat
+        """
+        return sp_set_rows_(
+            (mat.data, mat.indices, mat.indptr, mat.shape),
+            rows,
+            (
+                values.data,
+                values.indices.astype(mat.indices.dtype),
+                values.indptr.astype(mat.indices.dtype),
+                values.shape,
+            ),
+        )
+
+    def spFitIndices(self, mat):
+        """Stores the indices and indptr of a csr matrix as int32 if its number of nonzeros and rows fit, and as int64
+        otherwise. Above roughly 85 megapixels the nonzeros of the Laplacian overflow int32, the kernels are compiled
+        for both index types.
+
+        :param mat: scipy.sparse.csr_matrix, changed in place
+        :return: mat
+        """
+        if max(mat.nnz, mat.shape[0]) > np.iinfo(np.int32).max:
+            dtype = np.int64
+        else:
+            dtype = np.int32
+        mat.indices = mat.indices.astype(dtype, copy=False)
+        mat.indptr = mat.indptr.astype(dtype, copy=False)
+        return mat
+
+    def make_reduced_A(self, L, unknown):
+        """Constructs the matrix of the reduced system. The rows and columns of the unknown pixels are those of L,
+        the rows of the known pixels are those of the identity matrix. It shares the sparsity structure with L, such
+        that its rows can be updated in place once the trimap changes.
+
+        :param L: Laplacian
+        :param unknown: mask of the unknown pixels
+        :return: reduced matrix A
+        """
+        L.sum_duplicates()
+        data = make_reduced_data_((L.data, L.indices, L.indptr, L.shape), unknown)
+        return scipy.sparse.csr_matrix((data, L.indices, L.indptr), shape=L.shape)
+
+    def fix_alpha(self):
+        """Sets the alpha values of the known pixels to their fixed values, such that the residual of the reduced
+        system is zero there
+
+        :return: None
+        """
+        np.copyto(
+            self.get_alpha(), self.get_fixed(), where=np.logical_not(self.get_unknown())
+        )
+
+    def flatten2D(self, arr, dtype=np.float64):
         """Flattens a 2D array
 
         :param arr: 2D array
+        :param dtype: float type of the result
         :return: flattened array
         """
-        return flatten_2D_(arr.astype(np.float64))
+        return flatten_2D_(arr.astype(dtype))
 
     def vcycle(
-        self, A, b, shape, kernel, cache, preiter=1, postiter=1, instantSolveSize=64
+        self,
+        A,
+        b,
+        shape,
+        kernel,
+        cache,
+        preiter=1,
+        postiter=1,
+        instantSolveSize=64,
+        rows=None,
     ):
         """Performs the V-Cycle Algorithm as suggested by:
 
@@ -567,6 +2443,7 @@ class Solver(qtc.QObject, Thread):
         :param preiter: how many smoothing iterations at the beginning
         :param postiter: how many smoothing iterations at the end
         :param instantSolveSize: at which size should the system be solved immediately
+        :param rows: if given, only these rows are smoothed and corrected on the finest level and x is zero elsewhere
         :return: A approximation of x in Ax = b
         """
 
@@ -577,14 +2454,22 @@ class Solver(qtc.QObject, Thread):
         if shape in cache:
             P, PT, A_diag, A_small, m_diag = cache[shape]
         else:
-            P, PT = self.make_P(shape, kernel)
-            A_small = P.dot(A).dot(PT)
+            P, PT = self.make_P(shape, kernel, A.dtype)
+            A_small = self.make_A_small(P, A, PT)
             A_diag = self.spDiag(A)
-            m_diag = A_diag / A.multiply(A).sum(axis=0)  # sparse approx inv0
-            m_diag = self.flatten2D(np.array(m_diag))
+            if scipy.sparse.issparse(A):
+                m_diag = A_diag / A.multiply(A).sum(axis=0)  # sparse approx inv0
+                m_diag = self.flatten2D(np.array(m_diag), A.dtype)
+            else:
+                m_diag = A_diag / A.squaredSum()
             cache[shape] = (P, PT, A_diag, A_small, m_diag)
-        x = self.spai0_step(A, b, None, m_diag, preiter)
-        r = b - self.spDot(A, x)
+        if rows is None:
+            x = self.spai0_step(A, b, None, m_diag, preiter)
+            r = b - self.spDot(A, x)
+        else:
+            x = self.spai0_step_rows(A, b, np.zeros_like(b), m_diag, preiter, rows)
+            r = np.zeros_like(b)
+            self.spUpdateResidualRows(A, b, x, rows, r)
         r_small = self.spDot(P, r)
         x_small = self.vcycle(
             A_small,
@@ -596,10 +2481,47 @@ class Solver(qtc.QObject, Thread):
             postiter,
             instantSolveSize,
         )
-        x += PT.dot(x_small)
-        x = self.spai0_step(A, b, x, m_diag, postiter)
+        if rows is None:
+            x += PT.dot(x_small)
+            x = self.spai0_step(A, b, x, m_diag, postiter)
+        else:
+            x[rows] += PT.dot(x_small)[rows]
+            x = self.spai0_step_rows(A, b, x, m_diag, postiter, rows)
         return x
 
+    def make_A_small(self, P, A, PT):
+        """Calculates the coarse matrix P@A@PT. Scipy drops the zeros of the product, which would make the sparsity
+        structure of the coarse matrices of the reduced system depend on the trimap. In that case the structure is
+        taken from the product of the sparsity patterns, such that update_cache can patch the rows of pixels that become
+        unknown.
+
+        :param P: downsampling matrix
+        :param A: Sparse matrix A
+        :param PT: upsampling matrix
+        :return: P@A@PT
+        """
+        if self.reduced:
+            pattern = scipy.sparse.csr_matrix(
+                (np.ones_like(A.data), A.indices, A.indptr), shape=A.shape
+            )
+        # each row of P averages the pixels of a 2x2 block
+        step = max(1, self.blockSize // 4)
+        blocks = []
+        for start in range(0, max(P.shape[0], 1), step):
+            rows = P[start : start + step]
+            block = self.spLeftDot(rows, A).dot(PT)
+            if self.reduced:
+                structure = rows.dot(pattern).dot(PT)
+                self.spSetRows(
+                    structure, np.arange(structure.shape[0], dtype=np.int64), block
+                )
+                block = structure
+            blocks.append(block)
+            self.constructionStep(
+                "galerkin", min(start + step, P.shape[0]) / max(P.shape[0], 1)
+            )
+        return scipy.sparse.vstack(blocks, format="csr")
+
     def spai0_step(self, A, b, x, m_diag, num_iter):
         """Uses the SPAI-0-Algorithm as described by:
 
@@ -626,8 +2548,25 @@ class Solver(qtc.QObject, Thread):
         :return: smoothed x
         """
 
+        if not scipy.sparse.issparse(A):
+            return A.spai0Step(b, x, m_diag, num_iter)
         return spai0_step_(A.data, A.indices, A.indptr, A.shape, b, x, m_diag, num_iter)
 
+    def spai0_step_rows(self, A, b, x, m_diag, num_iter, rows):
+        """Performs spai0_step, but only smooths the given rows of x in place
+
+        :param A: Sparse Matrix A
+        :param b: Dense Vector b
+        :param x: current solution for Ax=b, updated in place
+        :param m_diag: as described in the paper
+        :param num_iter: how often x should be smoothed
+        :param rows: row indices
+        :return: smoothed x
+        """
+        return spai0_step_rows_(
+            (A.data, A.indices, A.indptr, A.shape), b, x, m_diag, num_iter, rows
+        )
+
     def cgd_preconditioned(self, A, alpha, r, z, M):
         """Performs an iteration of the preconditioned Method of Conjugate Gradients. I adopted the
         implementation for this from:
@@ -655,57 +2594,125 @@ class Solver(qtc.QObject, Thread):
         :param M: Preconditioner
         :return: (alpha_new, r_new, z_new)
         """
-        Az = A.dot(z)
-        rz = np.inner(r, z)
-        zAz = np.inner(z, Az)
+        self.telemetry.transferred(nbytes(A, z) + z.nbytes)
+        with self.telemetry.measure("spmv"):
+            Az = A.dot(z)
+        with self.telemetry.measure("reductions"):
+            rz = np.inner(r, z)
+            zAz = np.inner(z, Az)
         if rz != 0 and zAz != 0:
             a = rz / zAz
             r_new = r - a * Az
-            s = M(r_new)
-            return alpha + a * z, r_new, s + (np.inner(r_new, s) / rz) * z
+            with self.telemetry.measure("preconditioner"):
+                s = M(r_new)
+            with self.telemetry.measure("reductions"):
+                beta = np.inner(r_new, s) / rz
+            return alpha + a * z, r_new, s + beta * z
         return alpha, r, z
 
-    def make_P(self, shape, kernel):
-        """Constructs a down- and upsampling matrices P and P.T based on the given Kernel
+    def cgd_preconditioned_fused(self, A, alpha, r, z, M, Az, rows):
+        """Performs an iteration of cgd_preconditioned, but updates alpha, r and z in place. Az is written into a
+        preallocated buffer and the inner products are calculated inside the numba kernels instead of np.inner.
+        Only the preconditioner M itself may still allocate its result.
+
+        :param A: Matrix A
+        :param alpha: Current Alpha-Matte, updated in place
+        :param r: Residuum, updated in place
+        :param z: Direction, updated in place
+        :param M: Preconditioner
+        :param Az: Buffer of the same size as alpha
+        :param rows: rows to iterate on, all rows if empty. r, z and M(r) have to be zero outside of them
+        :return: |r_new|
+        """
+        self.telemetry.transferred(nbytes(A, alpha, r, z, Az))
+        with self.telemetry.measure("spmv"):
+            if isinstance(A, LkmLaplacianOperator):
+                rz, norm_r = dot_pcgd_fused_update(A, alpha, r, z, Az)
+            elif isinstance(A, CfLaplacianOperator):
+                rz, norm_r = cf_pcgd_fused_update_(A.tuple(), alpha, r, z, Az)
+            elif isinstance(A, StencilMatrix):
+                rz, norm_r = st_pcgd_fused_update_(A.tuple(), alpha, r, z, Az)
+            else:
+                rz, norm_r = pcgd_fused_update_(
+                    (A.data, A.indices, A.indptr, A.shape), alpha, r, z, Az, rows
+                )
+        if rz != 0:
+            with self.telemetry.measure("preconditioner"):
+                s = M(r)
+            with self.telemetry.measure("reductions"):
+                pcgd_fused_direction_(r, s, z, rz, rows)
+        return norm_r
+
+    def make_P(self, shape, kernel, dtype=np.float64):
+        """Constructs a down- and upsampling matrices P and P.T based on the given Kernel. They only depend on the
+        arguments, so they are kept until the canvas changes.
 
         :param shape: shape of the original images
         :param kernel: flattened 3x3 matrix
+        :param dtype: float type of the matrices
         :return: P, P.T
         """
+        key = DiskCache.key(shape, kernel, np.dtype(dtype))
+        if key in self.transfer:
+            return self.transfer[key]
         h, w = shape
         n = h * w
         h2 = h // 2
         w2 = w // 2
         n2 = w2 * h2
-        x2 = np.repeat(np.tile(np.arange(w2), h2), 9).astype(np.int64)
-        y2 = np.repeat(np.repeat(np.arange(h2), w2), 9).astype(np.int64)
-        x = self.addTile(
-            x2 * 2, np.array([-1, 0, 1, -1, 0, 1, -1, 0, 1], dtype=np.int64), n2
-        )
-        y = self.addTile(
-            y2 * 2, np.array([-1, -1, -1, 0, 0, 0, 1, 1, 1], dtype=np.int64), n2
+        values = [np.zeros(0, dtype=dtype)]
+        j_inds = [np.zeros(0, dtype=np.int64)]
+        counts = [np.zeros(1, dtype=np.int64)]
+        # the rows of a block of coarse rows cover about blockSize fine pixels
+        step = max(1, self.blockSize // max(2 * w, 1))
+        for start in range(0, h2, step):
+            rows = min(h2, start + step) - start
+            x2 = np.repeat(np.tile(np.arange(w2), rows), 9).astype(np.int64)
+            y2 = np.repeat(np.repeat(np.arange(start, start + rows), w2), 9).astype(
+                np.int64
+            )
+            x = self.addTile(
+                x2 * 2,
+                np.array([-1, 0, 1, -1, 0, 1, -1, 0, 1], dtype=np.int64),
+                rows * w2,
+            )
+            y = self.addTile(
+                y2 * 2,
+                np.array([-1, -1, -1, 0, 0, 0, 1, 1, 1], dtype=np.int64),
+                rows * w2,
+            )
+            mask = (0 <= x) & (x < w) & (0 <= y) & (y <= h)
+            # the entries of a row are ordered by their column
+            j_inds.append((x + y * w)[mask])
+            values.append(np.tile(kernel, rows * w2)[mask].astype(dtype))
+            counts.append(mask.reshape(-1, 9).sum(axis=1))
+            self.constructionStep("interpolation", (start + rows) / h2)
+        downsample = scipy.sparse.csr_matrix(
+            (
+                np.concatenate(values),
+                np.concatenate(j_inds),
+                np.cumsum(np.concatenate(counts)),
+            ),
+            (n2, n),
         )
-        mask = (0 <= x) & (x < w) & (0 <= y) & (y <= h)
-        i_inds = (x2 + y2 * w2)[mask]
-        j_inds = (x + y * w)[mask]
-        values = np.tile(kernel, n2)[mask]
-        downsample = scipy.sparse.csr_matrix((values, (i_inds, j_inds)), (n2, n))
-        upsample = downsample.T
+        upsample = downsample.T.tocsr()
+        self.transfer[key] = (downsample, upsample)
         return downsample, upsample
 
     def vecNorm2(self, a: np.ndarray):
-        return vecNorm2_(a.astype(np.float64))
+        with self.telemetry.measure("reductions"):
+            return vecNorm2_(a if a.dtype == np.float32 else a.astype(np.float64))
 
 
 @njit(
-    f8[:](f8[:, :]),
+    [f8[:](f8[:, :]), f4[:](f4[:, :])],
     nogil=config.config.nogil,
     parallel=config.config.parallel,
     cache=config.config.cache,
 )
 def flatten_2D_(arr):
     h, w = arr.shape
-    result = np.empty((h * w,))
+    result = np.empty((h * w,), dtype=arr.dtype)
     for y in prange(h):
         for x in prange(w):
             result[y * w + x] = arr[y, x]
@@ -713,7 +2720,7 @@ def flatten_2D_(arr):
 
 
 @njit(
-    f8(f8[:]),
+    [f8(f8[:]), f8(f4[:])],
     nogil=config.config.nogil,
     parallel=config.config.parallel,
     cache=config.config.cache,
@@ -732,13 +2739,22 @@ def update_flattend_2D_array_(rect, lmd, values, vec, shape):
     vec.reshape(shape)[y0:ym, x0:xn] = lmd * values
 
 
-@njit(void(i8[:], f8[:], f8[:]), nogil=config.config.nogil, cache=config.config.cache)
+@njit(
+    [void(i8[:], f8[:], f8[:]), void(i8[:], f4[:], f4[:])],
+    nogil=config.config.nogil,
+    cache=config.config.cache,
+)
 def update_vec_(ind, values, vec):
     vec[ind] = values
 
 
 @njit(
-    f8[:](Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2)))),
+    [
+        f8[:](Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2)))),
+        f4[:](Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2)))),
+        f8[:](Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2)))),
+        f4[:](Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2)))),
+    ],
     nogil=config.config.nogil,
     parallel=config.config.parallel,
     cache=config.config.cache,
@@ -844,7 +2860,10 @@ def addTile_(dest, a, reps):
 
 
 @njit(
-    Tuple((i8[:], f8[:]))(UniTuple(i8, 4), i8, f8[:], f8[:]),
+    [
+        Tuple((i8[:], f8[:]))(UniTuple(i8, 4), i8, f8[:], f8[:]),
+        Tuple((i8[:], f4[:]))(UniTuple(i8, 4), i8, f4[:], f4[:]),
+    ],
     nogil=config.config.nogil,
     cache=config.config.cache,
 )
@@ -858,7 +2877,14 @@ def getUpdatedADiag_(rect, w, L_diag, c):
 
 
 @njit(
-    f8[:](Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))), f8[:]),
+    [
+        f8[:](Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))), f8[:]),
+        f4[:](Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))), f4[:]),
+        f8[:](Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))), f8[:]),
+        f8[:](Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))), f8[:]),
+        f4[:](Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))), f4[:]),
+        f8[:](Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))), f8[:]),
+    ],
     nogil=config.config.nogil,
     parallel=config.config.parallel,
     cache=config.config.cache,
@@ -873,7 +2899,7 @@ def sp_dot_(mat, b):
     returns the dot product between mat and b (mat@b or mat.dot(b) if mat was of type scipy.sprase.csr_matrix)
     """
     data, indices, indptr, height = mat[0], mat[1], mat[2], mat[3][0]
-    result = np.zeros((height,), dtype=np.float64)
+    result = np.zeros((height,), dtype=b.dtype)
     for row in prange(height):
         start = indptr[row]
         end = indptr[row + 1]
@@ -885,15 +2911,16 @@ def sp_dot_(mat, b):
 
 
 @njit(
-    UniTuple(f8[:], 3)(
-        Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))), f8[:], f8[:], f8[:]
-    ),
+    [
+        UniTuple(f8[:], 3)(f8[:], f8[:], f8[:], f8[:]),
+        UniTuple(f4[:], 3)(f4[:], f4[:], f4[:], f4[:]),
+    ],
     nogil=config.config.nogil,
     parallel=config.config.parallel,
     cache=config.config.cache,
 )
-def cgd_(A, alpha, r, p):
-    Ap = sp_dot_(A, p)
+def cgd_step_(alpha, r, p, Ap):
+    """Iteration of cgd_ for the given product Ap = A@p"""
     length = alpha.shape[0]
     rr = 0
     pAp = 0
@@ -902,9 +2929,9 @@ def cgd_(A, alpha, r, p):
         pAp += p[i] * Ap[i]
     if rr != 0 and pAp != 0:
         a = rr / pAp
-        alpha_new = np.empty(length)
-        r_new = np.empty(length)
-        p_new = np.empty(length)
+        alpha_new = np.empty_like(alpha)
+        r_new = np.empty_like(r)
+        p_new = np.empty_like(p)
         beta = 0
         for j in prange(length):
             alpha_new[j] = alpha[j] + a * p[j]
@@ -918,6 +2945,29 @@ def cgd_(A, alpha, r, p):
     return alpha, r, p
 
 
+@njit(
+    [
+        UniTuple(f8[:], 3)(
+            Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))), f8[:], f8[:], f8[:]
+        ),
+        UniTuple(f4[:], 3)(
+            Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))), f4[:], f4[:], f4[:]
+        ),
+        UniTuple(f8[:], 3)(
+            Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))), f8[:], f8[:], f8[:]
+        ),
+        UniTuple(f4[:], 3)(
+            Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))), f4[:], f4[:], f4[:]
+        ),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cgd_(A, alpha, r, p):
+    return cgd_step_(alpha, r, p, sp_dot_(A, p))
+
+
 @njit(cache=config.config.cache)
 def spai0_step_(A_data, A_indices, A_indptr, A_shape, b, x, m_diag, iterations):
     if x is None:
@@ -929,3 +2979,1103 @@ def spai0_step_(A_data, A_indices, A_indptr, A_shape, b, x, m_diag, iterations):
     for iteration in range(iterations):
         x = x - m_diag * (sp_dot_((A_data, A_indices, A_indptr, A_shape), x) - b)
     return x
+
+
+@njit(i8(i8[:], i8), nogil=config.config.nogil, cache=config.config.cache)
+def row_(rows, k):
+    """Returns the k-th row to iterate on. An empty array of rows stands for all rows"""
+    return rows[k] if rows.shape[0] > 0 else k
+
+
+@njit(i8(i8[:], i8), nogil=config.config.nogil, cache=config.config.cache)
+def rows_length_(rows, height):
+    return rows.shape[0] if rows.shape[0] > 0 else height
+
+
+@njit(
+    [
+        f8(f8[:], f8[:], f8[:], f8[:], f8, f8, i8[:]),
+        f8(f4[:], f4[:], f4[:], f4[:], f8, f8, i8[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cgd_fused_finish_(alpha, r, p, Ap, rr, pAp, rows):
+    """Second half of cgd_fused_ once Ap, r*r and p*Ap are known
+
+    :return: norm of the new residual
+    """
+    length = rows_length_(rows, alpha.shape[0])
+    if rr == 0 or pAp == 0:
+        return np.sqrt(rr)
+    a = rr / pAp
+    rr_new = 0.0
+    for k in prange(length):
+        j = row_(rows, k)
+        alpha[j] += a * p[j]
+        r[j] -= a * Ap[j]
+        rr_new += r[j] * r[j]
+    beta = rr_new / rr
+    for k in prange(length):
+        j = row_(rows, k)
+        p[j] = r[j] + beta * p[j]
+    return np.sqrt(rr_new)
+
+
+@njit(
+    [
+        f8(
+            Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))),
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            i8[:],
+        ),
+        f8(
+            Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))),
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            i8[:],
+        ),
+        f8(
+            Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))),
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            i8[:],
+        ),
+        f8(
+            Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))),
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            i8[:],
+        ),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cgd_fused_(A, alpha, r, p, Ap, rows):
+    """Same iteration as cgd_, but alpha, r and p are updated in place and Ap is written into a preallocated buffer.
+    The inner products r*r and p*Ap are accumulated while calculating A@p. Only the given rows are touched, which
+    requires r and p to be zero outside of them.
+
+    :return: norm of the new residual
+    """
+    data, indices, indptr = A[0], A[1], A[2]
+    length = rows_length_(rows, A[3][0])
+    rr = 0.0
+    pAp = 0.0
+    for k in prange(length):
+        row = row_(rows, k)
+        res = 0.0
+        for i in range(indptr[row], indptr[row + 1]):
+            res += data[i] * p[indices[i]]
+        Ap[row] = res
+        rr += r[row] * r[row]
+        pAp += p[row] * res
+    return cgd_fused_finish_(alpha, r, p, Ap, rr, pAp, rows)
+
+
+@njit(
+    [
+        UniTuple(f8, 2)(f8[:], f8[:], f8[:], f8[:], f8, f8, i8[:]),
+        UniTuple(f8, 2)(f4[:], f4[:], f4[:], f4[:], f8, f8, i8[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def pcgd_fused_finish_(alpha, r, z, Az, rz, zAz, rows):
+    """Updates alpha and r once Az, r*z and z*Az are known
+
+    :return: (r*z, norm of the new residual). r*z is zero if nothing has been updated
+    """
+    length = rows_length_(rows, alpha.shape[0])
+    if rz == 0 or zAz == 0:
+        return 0.0, vecNorm2_(r)
+    a = rz / zAz
+    rr_new = 0.0
+    for k in prange(length):
+        j = row_(rows, k)
+        alpha[j] += a * z[j]
+        r[j] -= a * Az[j]
+        rr_new += r[j] * r[j]
+    return rz, np.sqrt(rr_new)
+
+
+@njit(
+    [
+        UniTuple(f8, 2)(
+            Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))),
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            i8[:],
+        ),
+        UniTuple(f8, 2)(
+            Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))),
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            i8[:],
+        ),
+        UniTuple(f8, 2)(
+            Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))),
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            i8[:],
+        ),
+        UniTuple(f8, 2)(
+            Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))),
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            i8[:],
+        ),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def pcgd_fused_update_(A, alpha, r, z, Az, rows):
+    """First half of an in place iteration of the preconditioned cg-Method. Calculates Az, r*z and z*Az in one pass
+    and updates alpha and r.
+
+    :return: (r*z, norm of the new residual). r*z is zero if nothing has been updated
+    """
+    data, indices, indptr = A[0], A[1], A[2]
+    length = rows_length_(rows, A[3][0])
+    rz = 0.0
+    zAz = 0.0
+    for k in prange(length):
+        row = row_(rows, k)
+        res = 0.0
+        for i in range(indptr[row], indptr[row + 1]):
+            res += data[i] * z[indices[i]]
+        Az[row] = res
+        rz += r[row] * z[row]
+        zAz += z[row] * res
+    return pcgd_fused_finish_(alpha, r, z, Az, rz, zAz, rows)
+
+
+@njit(
+    [void(f8[:], f8[:], f8[:], f8, i8[:]), void(f4[:], f4[:], f4[:], f8, i8[:])],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def pcgd_fused_direction_(r, s, z, rz, rows):
+    """Second half of an in place iteration of the preconditioned cg-Method: z = s + (r*s / rz) * z with s = M(r)"""
+    length = rows_length_(rows, r.shape[0])
+    rs = 0.0
+    for k in prange(length):
+        i = row_(rows, k)
+        rs += r[i] * s[i]
+    beta = rs / rz
+    for k in prange(length):
+        j = row_(rows, k)
+        z[j] = s[j] + beta * z[j]
+
+
+@njit(
+    [
+        Tuple((i8, f8))(
+            Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))),
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            f8,
+            f8,
+            i8,
+            i8[:],
+        ),
+        Tuple((i8, f8))(
+            Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))),
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            f8,
+            f8,
+            i8,
+            i8[:],
+        ),
+        Tuple((i8, f8))(
+            Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))),
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            f8,
+            f8,
+            i8,
+            i8[:],
+        ),
+        Tuple((i8, f8))(
+            Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))),
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            f8,
+            f8,
+            i8,
+            i8[:],
+        ),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cgd_fused_chunk_(A, alpha, r, p, Ap, norm_r, norm_target, iterations, rows):
+    done = 0
+    while done < iterations and norm_r > norm_target:
+        norm_r_new = cgd_fused_(A, alpha, r, p, Ap, rows)
+        done += 1
+        if norm_r_new == norm_r:
+            break
+        norm_r = norm_r_new
+    return done, norm_r
+
+
+@njit(
+    [
+        Tuple((i8, f8))(
+            Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))),
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            f8,
+            f8,
+            i8,
+            i8[:],
+        ),
+        Tuple((i8, f8))(
+            Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))),
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            f8,
+            f8,
+            i8,
+            i8[:],
+        ),
+        Tuple((i8, f8))(
+            Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))),
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            f8,
+            f8,
+            i8,
+            i8[:],
+        ),
+        Tuple((i8, f8))(
+            Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))),
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            f8,
+            f8,
+            i8,
+            i8[:],
+        ),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def pcgd_jacobi_fused_chunk_(
+    A, alpha, r, z, A_diag_inv, Az, s, norm_r, norm_target, iterations, rows
+):
+    length = rows_length_(rows, alpha.shape[0])
+    done = 0
+    while done < iterations and norm_r > norm_target:
+        rz, norm_r = pcgd_fused_update_(A, alpha, r, z, Az, rows)
+        done += 1
+        if rz == 0:
+            break
+        for k in prange(length):
+            i = row_(rows, k)
+            s[i] = A_diag_inv[i] * r[i]
+        pcgd_fused_direction_(r, s, z, rz, rows)
+    return done, norm_r
+
+
+@njit(
+    [b1[:, :](f8[:], u1[:, ::1], i8), b1[:, :](f4[:], u1[:, ::1], i8)],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def quantize_tiles_(alpha, back, tileSize):
+    """Quantizes the flattened alpha matte into the back buffer tile by tile
+
+    :return: boolean array marking the tiles whose quantized values changed
+    """
+    h, w = back.shape
+    tilesY = (h + tileSize - 1) // tileSize
+    tilesX = (w + tileSize - 1) // tileSize
+    dirty = np.zeros((tilesY, tilesX), dtype=np.bool_)
+    for tile in prange(tilesY * tilesX):
+        ty = tile // tilesX
+        tx = tile % tilesX
+        changed = False
+        for y in range(ty * tileSize, min(h, (ty + 1) * tileSize)):
+            for x in range(tx * tileSize, min(w, (tx + 1) * tileSize)):
+                value = alpha[y * w + x] * 255.0
+                if value < 0:
+                    value = 0.0
+                elif value > 255:
+                    value = 255.0
+                quantized = np.uint8(value)
+                if back[y, x] != quantized:
+                    back[y, x] = quantized
+                    changed = True
+        dirty[ty, tx] = changed
+    return dirty
+
+
+@njit(
+    void(u1[:, ::1], u1[:, :], b1[:, :], i8),
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def copy_tiles_(back, front, dirty, tileSize):
+    h, w = back.shape
+    tilesY, tilesX = dirty.shape
+    for tile in prange(tilesY * tilesX):
+        ty = tile // tilesX
+        tx = tile % tilesX
+        if dirty[ty, tx]:
+            for y in range(ty * tileSize, min(h, (ty + 1) * tileSize)):
+                for x in range(tx * tileSize, min(w, (tx + 1) * tileSize)):
+                    front[y, x] = back[y, x]
+
+
+@njit(i8[:](UniTuple(i8, 4), i8), nogil=config.config.nogil, cache=config.config.cache)
+def get_rect_indices_(rect, w):
+    """Returns the flattened indices of all pixels inside rect row by row"""
+    x0, y0, xn, yn = rect
+    width = max(0, xn - x0)
+    height = max(0, yn - y0)
+    ind = np.empty((width * height,), dtype=np.int64)
+    for y in range(height):
+        for x in range(width):
+            ind[y * width + x] = (y0 + y) * w + x0 + x
+    return ind
+
+
+@njit(
+    [
+        i8[:](Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2)))),
+        i8[:](Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2)))),
+        i8[:](Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2)))),
+        i8[:](Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2)))),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def sp_diag_ptr_(mat):
+    """Returns the position of the diagonal entry of each row inside data, -1 if the row has none"""
+    indices, indptr, height = mat[1], mat[2], mat[3][0]
+    result = np.full((height,), -1, dtype=np.int64)
+    for row in prange(height):
+        for i in range(indptr[row], indptr[row + 1]):
+            if indices[i] == row:
+                result[row] = i
+                break
+    return result
+
+
+@njit(
+    [
+        f8[:](Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))), i8[:]),
+        f4[:](Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))), i8[:]),
+        f8[:](Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))), i8[:]),
+        f4[:](Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))), i8[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def sp_diag_rows_(mat, rows):
+    data, indices, indptr = mat[0], mat[1], mat[2]
+    result = np.zeros((rows.shape[0],), dtype=data.dtype)
+    for k in prange(rows.shape[0]):
+        row = rows[k]
+        for i in range(indptr[row], indptr[row + 1]):
+            if indices[i] == row:
+                result[k] += data[i]
+    return result
+
+
+@njit(
+    [
+        f8[:](Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))), i8[:]),
+        f4[:](Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))), i8[:]),
+        f8[:](Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))), i8[:]),
+        f4[:](Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))), i8[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def sp_cols_squared_sum_(mat, cols):
+    """The rows with an entry in column col are the columns of the row col. They are visited in ascending order."""
+    data, indices, indptr = mat[0], mat[1], mat[2]
+    result = np.zeros((cols.shape[0],), dtype=data.dtype)
+    for k in prange(cols.shape[0]):
+        col = cols[k]
+        res = 0.0
+        for row in np.sort(indices[indptr[col] : indptr[col + 1]]):
+            for i in range(indptr[row], indptr[row + 1]):
+                if indices[i] == col:
+                    res += data[i] ** 2
+        result[k] = res
+    return result
+
+
+@njit(
+    [
+        b1(
+            Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))),
+            i8[:],
+            Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))),
+        ),
+        b1(
+            Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))),
+            i8[:],
+            Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))),
+        ),
+        b1(
+            Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))),
+            i8[:],
+            Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))),
+        ),
+        b1(
+            Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))),
+            i8[:],
+            Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))),
+        ),
+    ],
+    nogil=config.config.nogil,
+    cache=config.config.cache,
+)
+def sp_set_rows_(mat, rows, values):
+    data, indices, indptr = mat[0], mat[1], mat[2]
+    v_data, v_indices, v_indptr = values[0], values[1], values[2]
+    for k in range(rows.shape[0]):
+        row = rows[k]
+        for j in range(v_indptr[k], v_indptr[k + 1]):
+            found = False
+            for i in range(indptr[row], indptr[row + 1]):
+                if indices[i] == v_indices[j]:
+                    found = True
+                    break
+            if not found and v_data[j] != 0:
+                return False
+    for k in range(rows.shape[0]):
+        row = rows[k]
+        for i in range(indptr[row], indptr[row + 1]):
+            data[i] = 0.0
+        for j in range(v_indptr[k], v_indptr[k + 1]):
+            for i in range(indptr[row], indptr[row + 1]):
+                if indices[i] == v_indices[j]:
+                    data[i] += v_data[j]
+                    break
+    return True
+
+
+@njit(
+    [
+        f8[:](Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))), f8[:], f8[:], i8[:]),
+        f4[:](Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))), f4[:], f4[:], i8[:]),
+        f8[:](Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))), f8[:], f8[:], i8[:]),
+        f4[:](Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))), f4[:], f4[:], i8[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def sp_residual_rows_(mat, b, x, rows):
+    data, indices, indptr = mat[0], mat[1], mat[2]
+    result = np.empty((rows.shape[0],), dtype=x.dtype)
+    for k in prange(rows.shape[0]):
+        row = rows[k]
+        res = 0.0
+        for i in range(indptr[row], indptr[row + 1]):
+            res += data[i] * x[indices[i]]
+        result[k] = b[row] - res
+    return result
+
+
+@njit(
+    [
+        void(Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))), f8[:], f8[:], i8[:], f8[:]),
+        void(Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))), f4[:], f4[:], i8[:], f4[:]),
+        void(Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))), f8[:], f8[:], i8[:], f8[:]),
+        void(Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))), f4[:], f4[:], i8[:], f4[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def sp_update_residual_rows_(mat, b, x, rows, r):
+    """Writes b - mat@x into r for the given rows. The row is summed like in sp_dot_, such that the result equals
+    b - sp_dot_(mat, x) exactly."""
+    data, indices, indptr = mat[0], mat[1], mat[2]
+    for k in prange(rows.shape[0]):
+        row = rows[k]
+        res = 0.0
+        for i in range(indptr[row], indptr[row + 1]):
+            res += data[i] * x[indices[i]]
+        r[row] = b[row] - res
+
+
+@njit(
+    [
+        f8[:](
+            Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))),
+            f8[:],
+            f8[:],
+            f8[:],
+            i8,
+            i8[:],
+        ),
+        f4[:](
+            Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))),
+            f4[:],
+            f4[:],
+            f4[:],
+            i8,
+            i8[:],
+        ),
+        f8[:](
+            Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))),
+            f8[:],
+            f8[:],
+            f8[:],
+            i8,
+            i8[:],
+        ),
+        f4[:](
+            Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))),
+            f4[:],
+            f4[:],
+            f4[:],
+            i8,
+            i8[:],
+        ),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def spai0_step_rows_(A, b, x, m_diag, iterations, rows):
+    for iteration in range(iterations):
+        r = sp_residual_rows_(A, b, x, rows)
+        for k in prange(rows.shape[0]):
+            row = rows[k]
+            x[row] += m_diag[row] * r[k]
+    return x
+
+
+@njit(nogil=config.config.nogil, cache=config.config.cache)
+def reduced_row_(data, indices, indptr, unknown, row, result):
+    """Writes the row of the reduced matrix into result. Unknown rows keep the entries of the unknown columns, known
+    rows become rows of the identity matrix."""
+    diagonal = False
+    for i in range(indptr[row], indptr[row + 1]):
+        col = indices[i]
+        if unknown[row]:
+            result[i] = data[i] if unknown[col] else 0.0
+        elif col == row and not diagonal:
+            result[i] = 1.0
+            diagonal = True
+        else:
+            result[i] = 0.0
+
+
+@njit(
+    [
+        f8[:](Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))), b1[:]),
+        f4[:](Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))), b1[:]),
+        f8[:](Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))), b1[:]),
+        f4[:](Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))), b1[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def make_reduced_data_(mat, unknown):
+    data, indices, indptr, height = mat[0], mat[1], mat[2], mat[3][0]
+    result = np.empty_like(data)
+    for row in prange(height):
+        reduced_row_(data, indices, indptr, unknown, row, result)
+    return result
+
+
+@njit(
+    [
+        void(Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))), b1[:], i8[:], f8[:]),
+        void(Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))), b1[:], i8[:], f4[:]),
+        void(Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))), b1[:], i8[:], f8[:]),
+        void(Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))), b1[:], i8[:], f4[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def update_reduced_data_(mat, unknown, rows, result):
+    data, indices, indptr = mat[0], mat[1], mat[2]
+    for k in prange(rows.shape[0]):
+        reduced_row_(data, indices, indptr, unknown, rows[k], result)
+
+
+@njit(nogil=config.config.nogil, cache=config.config.cache)
+def reduced_b_row_(data, indices, indptr, unknown, fixed, row):
+    """Returns the entry of the right hand side of the reduced system. The known neighbours of an unknown pixel are
+    moved to the right hand side, known pixels keep their fixed value."""
+    if not unknown[row]:
+        return fixed[row]
+    res = 0.0
+    for i in range(indptr[row], indptr[row + 1]):
+        col = indices[i]
+        if not unknown[col]:
+            res -= data[i] * fixed[col]
+    return res
+
+
+@njit(
+    [
+        f8[:](Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))), b1[:], f8[:]),
+        f4[:](Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))), b1[:], f4[:]),
+        f8[:](Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))), b1[:], f8[:]),
+        f4[:](Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))), b1[:], f4[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def make_reduced_b_(mat, unknown, fixed):
+    data, indices, indptr, height = mat[0], mat[1], mat[2], mat[3][0]
+    result = np.empty((height,), dtype=fixed.dtype)
+    for row in prange(height):
+        result[row] = reduced_b_row_(data, indices, indptr, unknown, fixed, row)
+    return result
+
+
+@njit(
+    [
+        void(Tuple((f8[:], i4[:], i4[:], UniTuple(i8, 2))), b1[:], f8[:], i8[:], f8[:]),
+        void(Tuple((f4[:], i4[:], i4[:], UniTuple(i8, 2))), b1[:], f4[:], i8[:], f4[:]),
+        void(Tuple((f8[:], i8[:], i8[:], UniTuple(i8, 2))), b1[:], f8[:], i8[:], f8[:]),
+        void(Tuple((f4[:], i8[:], i8[:], UniTuple(i8, 2))), b1[:], f4[:], i8[:], f4[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def update_reduced_b_(mat, unknown, fixed, rows, b):
+    data, indices, indptr = mat[0], mat[1], mat[2]
+    for k in prange(rows.shape[0]):
+        b[rows[k]] = reduced_b_row_(data, indices, indptr, unknown, fixed, rows[k])
+
+
+@njit(
+    f8(
+        Tuple((f8[:, :, :], f8[:, :, :], f8[:, :, :], f8[:], f8[:, :, :], i8)),
+        f8[:],
+        f8[:],
+        f8[:],
+        f8[:],
+    ),
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cf_cgd_fused_(op, alpha, r, p, Ap):
+    """cgd_fused_ for the matrix free closed-form Laplacian"""
+    cf_dot_(op, p, Ap)
+    rr = 0.0
+    pAp = 0.0
+    for i in prange(alpha.shape[0]):
+        rr += r[i] * r[i]
+        pAp += p[i] * Ap[i]
+    return cgd_fused_finish_(alpha, r, p, Ap, rr, pAp, np.empty((0,), dtype=np.int64))
+
+
+@njit(
+    UniTuple(f8, 2)(
+        Tuple((f8[:, :, :], f8[:, :, :], f8[:, :, :], f8[:], f8[:, :, :], i8)),
+        f8[:],
+        f8[:],
+        f8[:],
+        f8[:],
+    ),
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cf_pcgd_fused_update_(op, alpha, r, z, Az):
+    """pcgd_fused_update_ for the matrix free closed-form Laplacian"""
+    cf_dot_(op, z, Az)
+    rz = 0.0
+    zAz = 0.0
+    for i in prange(alpha.shape[0]):
+        rz += r[i] * z[i]
+        zAz += z[i] * Az[i]
+    return pcgd_fused_finish_(alpha, r, z, Az, rz, zAz, np.empty((0,), dtype=np.int64))
+
+
+@njit(
+    Tuple((i8, f8))(
+        Tuple((f8[:, :, :], f8[:, :, :], f8[:, :, :], f8[:], f8[:, :, :], i8)),
+        f8[:],
+        f8[:],
+        f8[:],
+        f8[:],
+        f8,
+        f8,
+        i8,
+    ),
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cf_cgd_fused_chunk_(op, alpha, r, p, Ap, norm_r, norm_target, iterations):
+    done = 0
+    while done < iterations and norm_r > norm_target:
+        norm_r_new = cf_cgd_fused_(op, alpha, r, p, Ap)
+        done += 1
+        if norm_r_new == norm_r:
+            break
+        norm_r = norm_r_new
+    return done, norm_r
+
+
+@njit(
+    Tuple((i8, f8))(
+        Tuple((f8[:, :, :], f8[:, :, :], f8[:, :, :], f8[:], f8[:, :, :], i8)),
+        f8[:],
+        f8[:],
+        f8[:],
+        f8[:],
+        f8[:],
+        f8[:],
+        f8,
+        f8,
+        i8,
+    ),
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def cf_pcgd_jacobi_fused_chunk_(
+    op, alpha, r, z, A_diag_inv, Az, s, norm_r, norm_target, iterations
+):
+    length = alpha.shape[0]
+    rows = np.empty((0,), dtype=np.int64)
+    done = 0
+    while done < iterations and norm_r > norm_target:
+        rz, norm_r = cf_pcgd_fused_update_(op, alpha, r, z, Az)
+        done += 1
+        if rz == 0:
+            break
+        for i in prange(length):
+            s[i] = A_diag_inv[i] * r[i]
+        pcgd_fused_direction_(r, s, z, rz, rows)
+    return done, norm_r
+
+
+def dot_cgd_fused(op, alpha, r, p, Ap):
+    """cgd_fused_ for operators whose product is only available as op.dot, like the box filters of the large kernel
+    Laplacian, which are evaluated outside of numba"""
+    Ap[:] = op.dot(p)
+    return cgd_fused_finish_(
+        alpha, r, p, Ap, float(r @ r), float(p @ Ap), np.empty((0,), dtype=np.int64)
+    )
+
+
+def dot_pcgd_fused_update(op, alpha, r, z, Az):
+    """pcgd_fused_update_ for operators whose product is only available as op.dot"""
+    Az[:] = op.dot(z)
+    return pcgd_fused_finish_(
+        alpha, r, z, Az, float(r @ z), float(z @ Az), np.empty((0,), dtype=np.int64)
+    )
+
+
+def dot_cgd_fused_chunk(op, alpha, r, p, Ap, norm_r, norm_target, iterations):
+    done = 0
+    while done < iterations and norm_r > norm_target:
+        norm_r_new = dot_cgd_fused(op, alpha, r, p, Ap)
+        done += 1
+        if norm_r_new == norm_r:
+            break
+        norm_r = norm_r_new
+    return done, norm_r
+
+
+def dot_pcgd_jacobi_fused_chunk(
+    op, alpha, r, z, A_diag_inv, Az, s, norm_r, norm_target, iterations
+):
+    rows = np.empty((0,), dtype=np.int64)
+    done = 0
+    while done < iterations and norm_r > norm_target:
+        rz, norm_r = dot_pcgd_fused_update(op, alpha, r, z, Az)
+        done += 1
+        if rz == 0:
+            break
+        np.multiply(A_diag_inv, r, out=s)
+        pcgd_fused_direction_(r, s, z, rz, rows)
+    return done, norm_r
+
+
+@njit(
+    [
+        f8(
+            Tuple((f8[:, :], i8[:], i8)),
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+        ),
+        f8(
+            Tuple((f4[:, :], i8[:], i8)),
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+        ),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def st_cgd_fused_(mat, alpha, r, p, Ap):
+    """cgd_fused_ for a StencilMatrix"""
+    st_dot_(mat, p, Ap)
+    rr = 0.0
+    pAp = 0.0
+    for i in prange(alpha.shape[0]):
+        rr += r[i] * r[i]
+        pAp += p[i] * Ap[i]
+    return cgd_fused_finish_(alpha, r, p, Ap, rr, pAp, np.empty((0,), dtype=np.int64))
+
+
+@njit(
+    [
+        UniTuple(f8, 2)(
+            Tuple((f8[:, :], i8[:], i8)),
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+        ),
+        UniTuple(f8, 2)(
+            Tuple((f4[:, :], i8[:], i8)),
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+        ),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def st_pcgd_fused_update_(mat, alpha, r, z, Az):
+    """pcgd_fused_update_ for a StencilMatrix"""
+    st_dot_(mat, z, Az)
+    rz = 0.0
+    zAz = 0.0
+    for i in prange(alpha.shape[0]):
+        rz += r[i] * z[i]
+        zAz += z[i] * Az[i]
+    return pcgd_fused_finish_(alpha, r, z, Az, rz, zAz, np.empty((0,), dtype=np.int64))
+
+
+@njit(
+    [
+        Tuple((i8, f8))(
+            Tuple((f8[:, :], i8[:], i8)),
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            f8,
+            f8,
+            i8,
+        ),
+        Tuple((i8, f8))(
+            Tuple((f4[:, :], i8[:], i8)),
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            f8,
+            f8,
+            i8,
+        ),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def st_cgd_fused_chunk_(mat, alpha, r, p, Ap, norm_r, norm_target, iterations):
+    done = 0
+    while done < iterations and norm_r > norm_target:
+        norm_r_new = st_cgd_fused_(mat, alpha, r, p, Ap)
+        done += 1
+        if norm_r_new == norm_r:
+            break
+        norm_r = norm_r_new
+    return done, norm_r
+
+
+@njit(
+    [
+        Tuple((i8, f8))(
+            Tuple((f8[:, :], i8[:], i8)),
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            f8[:],
+            f8,
+            f8,
+            i8,
+        ),
+        Tuple((i8, f8))(
+            Tuple((f4[:, :], i8[:], i8)),
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            f4[:],
+            f8,
+            f8,
+            i8,
+        ),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def st_pcgd_jacobi_fused_chunk_(
+    mat, alpha, r, z, A_diag_inv, Az, s, norm_r, norm_target, iterations
+):
+    length = alpha.shape[0]
+    rows = np.empty((0,), dtype=np.int64)
+    done = 0
+    while done < iterations and norm_r > norm_target:
+        rz, norm_r = st_pcgd_fused_update_(mat, alpha, r, z, Az)
+        done += 1
+        if rz == 0:
+            break
+        for i in prange(length):
+            s[i] = A_diag_inv[i] * r[i]
+        pcgd_fused_direction_(r, s, z, rz, rows)
+    return done, norm_r
+
+
+def solve_schwarz_tile(
+    canvas,
+    trimapPreview,
+    alpha,
+    ring,
+    core,
+    laplacian,
+    epsilon,
+    radius,
+    lmd,
+    rtol,
+    iterations,
+    progress=None,
+    blockSize=2**16,
+):
+    """Solves the system of an extended tile of the Schwarz method inside a worker process. The alpha values of the
+    ring are fixed, which moves them to the right hand side of the reduced system of the remaining pixels.
+
+    :param canvas: canvas of the extended tile
+    :param trimapPreview: trimap preview of the extended tile
+    :param alpha: current alpha matte of the extended tile
+    :param ring: width of the fixed ring at the (left, top, right, bottom) side
+    :param core: (x0, y0, xn, yn) of the tile inside the extended tile
+    :param laplacian: Laplacian of the tile
+    :param epsilon: regularization of the Laplacian
+    :param radius: radius of the Laplacian
+    :param lmd: weight of the trimap
+    :param rtol: relative tolerance of the local system
+    :param iterations: maximum number of iterations
+    :param progress: called with the finished fraction of the Laplacian, may raise to cancel the solve
+    :param blockSize: pixels per block of the Laplacian
+    :return: (alpha matte of the tile, squared norm of the residual of the tile before solving)
+    """
+    h, w = alpha.shape
+    left, top, right, bottom = ring
+    x0, y0, xn, yn = core
+    A = make_laplacian(
+        laplacian, canvas, epsilon, radius, progress, blockSize
+    ) + scipy.sparse.diags(make_c_(trimapPreview, lmd))
+    A.sum_duplicates()
+    A = (A.data, A.indices, A.indptr.astype(A.indices.dtype), A.shape)
+    b = make_b_(trimapPreview, lmd)
+    x = alpha.reshape(-1).copy()
+    r = b - sp_dot_(A, x)
+    squaredResidual = np.sum(r.reshape(h, w)[y0:yn, x0:xn] ** 2)
+
+    free = np.zeros((h, w), dtype=np.bool_)
+    free[top : h - bottom, left : w - right] = True
+    free = free.reshape(-1)
+    rows = np.flatnonzero(free).astype(np.int64)
+    reduced = (make_reduced_data_(A, free), A[1], A[2], A[3])
+    b_reduced = make_reduced_b_(A, free, x)
+    b_reduced[rows] += b[rows]
+    r = b_reduced - sp_dot_(reduced, x)
+    A_diag_inv = 1 / sp_diag_(reduced)
+    pcgd_jacobi_fused_chunk_(
+        reduced,
+        x,
+        r,
+        A_diag_inv * r,
+        A_diag_inv,
+        np.empty_like(x),
+        np.empty_like(x),
+        vecNorm2_(r),
+        rtol * vecNorm2_(b_reduced[rows]),
+        iterations,
+        rows,
+    )
+    return x.reshape(h, w)[y0:yn, x0:xn], squaredResidual
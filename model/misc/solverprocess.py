@@ -0,0 +1,230 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+from model.misc.sharedimage import SharedImage
+from model.misc.solver import Solver
+from model.enum import Reason
+from model.events import UpdateEvent, QuitEvent
+from threading import Thread
+from functools import partial
+from queue import Queue, Empty
+import multiprocessing
+from PyQt5 import QtCore as qtc
+
+# a forked process would inherit the threads and the state of Qt
+context = multiprocessing.get_context("spawn")
+
+
+class SolverProcess(qtc.QObject):
+    """Runs the solver in a separate process, such that it does not compete with the GUI thread for the GIL. It has the
+    signals of the solver and is controlled through the same event queue and continue event, which has to be an event
+    of the context of this module.
+
+    The canvas, the trimap preview and the alpha matte should be SharedImages, which the solver process attaches to.
+    It writes the alpha matte that the view draws and reads the trimap that the user paints without copying them, the
+    alpha matte is guarded by a lock of the context of this module. A forwarding thread sends the events of the queue
+    to the process, images are sent as the descriptors of their blocks. Events the solver waits for are waited for by
+    the forwarding thread instead, which releases the solver once they are set. A receiving thread emits the signals
+    the solver emitted inside of the process.
+    """
+
+    # Signal(Error, Tolerance)
+    calculated = qtc.pyqtSignal(object, object)
+    # Signal(New Tolerance)
+    toleranceChanged = qtc.pyqtSignal(object)
+    toleranceReached = qtc.pyqtSignal()
+    # Signal(Estimated Bytes)
+    memoryEstimated = qtc.pyqtSignal(object)
+    # Signal(Laplacian, Seconds, Nonzeros)
+    laplacianBuilt = qtc.pyqtSignal(object, object, object)
+    # Signal(Telemetry Record)
+    iterated = qtc.pyqtSignal(object)
+    # Signal(Stage, Fraction)
+    constructionProgressed = qtc.pyqtSignal(object, object)
+    # signals forwarded from the solver process
+    signals = (
+        "calculated",
+        "toleranceChanged",
+        "toleranceReached",
+        "memoryEstimated",
+        "laplacianBuilt",
+        "iterated",
+        "constructionProgressed",
+    )
+
+    def __init__(
+        self,
+        canvas: SharedImage,
+        trimapPreview: SharedImage,
+        alphaMatte: SharedImage,
+        eventQueue: Queue,
+        continueEvent,
+    ):
+        super(SolverProcess, self).__init__()
+        self.eventQueue = eventQueue
+        self.alphaLock = alphaMatte.lock()
+        self.commands = context.Queue()
+        self.replies = context.Queue()
+        self.resumed = context.Semaphore(0)
+        # the last image of each reason stays alive until the process has attached to it
+        self.images = {
+            Reason.canvasChanged: canvas,
+            Reason.trimapPreviewChanged: trimapPreview,
+            Reason.alphaMatteChanged: alphaMatte,
+        }
+        self.process = context.Process(
+            target=serve,
+            args=(
+                canvas.descriptor(),
+                trimapPreview.descriptor(),
+                alphaMatte.descriptor(),
+                self.alphaLock,
+                self.commands,
+                self.replies,
+                self.resumed,
+                continueEvent,
+            ),
+            name="Process: Solver",
+            daemon=True,
+        )
+        self.forwarder = Thread(target=self.forward, name="Thread: Solver Forwarder")
+        self.receiver = Thread(target=self.receive, name="Thread: Solver Receiver")
+
+    def start(self):
+        self.process.start()
+        self.forwarder.start()
+        self.receiver.start()
+
+    def join(self):
+        self.forwarder.join()
+        self.process.join()
+        self.receiver.join()
+
+    def forward(self):
+        """Sends the events of the event queue to the solver process until a QuitEvent has been sent
+
+        :return: None
+        """
+        while True:
+            event = self.eventQueue.get()
+            if isinstance(event, QuitEvent):
+                self.commands.put(("quit",))
+                return
+            if isinstance(event, UpdateEvent):
+                value = event.value
+                if event.reason in Solver.imageReasons:
+                    if not isinstance(value, SharedImage):
+                        # the process works on a copy, which doesn't see later changes of the image
+                        value = SharedImage.share(
+                            value,
+                            (
+                                self.alphaLock
+                                if event.reason == Reason.alphaMatteChanged
+                                else None
+                            ),
+                        )
+                    previous = self.images[event.reason]
+                    if previous is not value:
+                        # the process attaches to the new image instead
+                        previous.release()
+                    self.images[event.reason] = value
+                    value = value.descriptor()
+                self.commands.put(("update", event.reason, value))
+            else:
+                self.commands.put(("wait", type(event)))
+                event.wait()
+                self.resumed.release()
+
+    def receive(self):
+        """Emits the signals of the solver process until it has finished
+
+        :return: None
+        """
+        while True:
+            try:
+                reply = self.replies.get(timeout=0.5)
+            except Empty:
+                if self.process.is_alive():
+                    continue
+                return
+            if reply is None:
+                return
+            name, args = reply
+            getattr(self, name).emit(*args)
+
+
+def sharedContinueEvent():
+    """
+    :return: set event that can be passed to SolverProcess
+    """
+    event = context.Event()
+    event.set()
+    return event
+
+
+def remoteEvent(kind, resumed):
+    """Event of the given class whose wait blocks until the forwarding thread has seen the original event being set
+
+    :param kind: class of the original event
+    :param resumed: semaphore that is released once for every original event that has been set
+    :return: event
+    """
+    event = kind()
+    event.wait = lambda timeout=None: resumed.acquire(timeout=timeout)
+    return event
+
+
+def reply(replies, name, *args):
+    replies.put((name, args))
+
+
+def serve(
+    canvas,
+    trimapPreview,
+    alphaMatte,
+    alphaLock,
+    commands,
+    replies,
+    resumed,
+    continueEvent,
+):
+    """Entry point of the solver process. It runs the solver on the images of the given descriptors and turns the
+    commands of SolverProcess.forward back into events.
+
+    :return: None
+    """
+    eventQueue = Queue()
+    solver = Solver(
+        SharedImage.attach(canvas),
+        SharedImage.attach(trimapPreview),
+        SharedImage.attach(alphaMatte, alphaLock),
+        eventQueue,
+        continueEvent,
+    )
+    # the process has no event loop that could deliver queued signals
+    for name in SolverProcess.signals:
+        getattr(solver, name).connect(
+            partial(reply, replies, name), qtc.Qt.DirectConnection
+        )
+    solver.start()
+    while True:
+        command = commands.get()
+        if command[0] == "quit":
+            eventQueue.put_nowait(QuitEvent())
+            break
+        if command[0] == "wait":
+            eventQueue.put_nowait(remoteEvent(command[1], resumed))
+            continue
+        _, reason, value = command
+        if reason in Solver.imageReasons:
+            try:
+                value = SharedImage.attach(
+                    value, alphaLock if reason == Reason.alphaMatteChanged else None
+                )
+            except FileNotFoundError:
+                # the block has already been replaced by the one of a later event of the same reason
+                continue
+        eventQueue.put_nowait(UpdateEvent(reason, value))
+        # the controller may have checked whether the solver waits before the event arrived
+        continueEvent.set()
+    solver.join()
+    replies.put(None)
@@ -0,0 +1,255 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+from numba import njit, prange
+from numba.core.types import f4, f8, i4, i8, Tuple, void
+import numpy as np
+import scipy.sparse
+import config.config
+
+
+class StencilMatrix:
+    """Banded storage of a matrix over the pixels of an image, whose entry (i, j) can only be nonzero if the pixel j
+    lies in the (2 * radius + 1) x (2 * radius + 1) neighbourhood of the pixel i. The entry of the k-th neighbour of
+    pixel i is stored in data[k, i], such that the indices of a csr matrix are replaced by one offset per neighbour.
+    Entries of neighbours outside of the image are zero.
+    """
+
+    def __init__(self, data, width, radius):
+        """
+        :param data: entries of shape ((2 * radius + 1)^2, h * w)
+        :param width: width of the image
+        :param radius: radius of the stencil
+        """
+        size = 2 * radius + 1
+        dy, dx = np.divmod(np.arange(size * size, dtype=np.int64), size)
+        self.data = data
+        self.width = width
+        self.radius = radius
+        self.offsets = (dy - radius) * width + dx - radius
+        self.center = size * size // 2
+        self.shape = (data.shape[1], data.shape[1])
+
+    @staticmethod
+    def fromCsr(mat, width, radius):
+        """Converts a csr matrix of an image of the given width. Zero entries may lie outside of the stencil, nonzero
+        entries raise a ValueError.
+
+        :param mat: scipy.sparse.csr_matrix
+        :param width: width of the image
+        :param radius: radius of the stencil
+        :return: StencilMatrix
+        """
+        data, outside = st_from_csr_(
+            mat.data.astype(np.float64),
+            mat.indices.astype(mat.indptr.dtype),
+            mat.indptr,
+            width,
+            radius,
+        )
+        if outside > 0:
+            raise ValueError(f"{outside} entries lie outside of the stencil")
+        return StencilMatrix(data, width, radius)
+
+    def shifted(self, c):
+        """Returns the matrix A + diag(c)
+
+        :param c: vector added to the diagonal
+        :return: StencilMatrix
+        """
+        data = self.data.copy()
+        data[self.center] += c
+        return StencilMatrix(data, self.width, self.radius)
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    def astype(self, dtype):
+        return StencilMatrix(
+            self.data.astype(dtype, copy=False), self.width, self.radius
+        )
+
+    def tuple(self):
+        return self.data, self.offsets, self.width
+
+    def dot(self, x):
+        result = np.empty_like(x)
+        st_dot_(self.tuple(), x, result)
+        return result
+
+    def diagonal(self):
+        return self.data[self.center].copy()
+
+    def squaredSum(self, cols=None):
+        """Returns the sum of the squared entries of the given columns
+
+        :param cols: columns or None for all columns
+        :return: (A.multiply(A)).sum(axis=0)[cols]
+        """
+        if cols is None:
+            cols = np.arange(self.shape[1], dtype=np.int64)
+        return st_cols_squared_sum_(self.tuple(), cols)
+
+    def updateResidualRows(self, b, x, rows, r):
+        st_update_residual_rows_(self.tuple(), b, x, rows, r)
+
+    def spai0Step(self, b, x, m_diag, iterations):
+        """Same as spai0_step_ of the solver
+
+        :param b: Dense Vector b
+        :param x: current solution for Ax=b or None
+        :param m_diag: sparse approximate inverse
+        :param iterations: how often x should be smoothed
+        :return: smoothed x
+        """
+        if x is None:
+            if iterations > 0:
+                x = m_diag * b
+                iterations -= 1
+            else:
+                x = np.zeros_like(b)
+        return st_spai0_step_(self.tuple(), b, x, m_diag, iterations)
+
+    def rows(self, rows):
+        """Returns the given rows as csr matrix, without the zero entries
+
+        :param rows: rows of the matrix
+        :return: scipy.sparse.csr_matrix of shape (len(rows), n)
+        """
+        data = self.data[:, rows]
+        cols = rows[np.newaxis, :] + self.offsets[:, np.newaxis]
+        mask = data != 0
+        ind = np.broadcast_to(np.arange(len(rows)), data.shape)
+        return scipy.sparse.csr_matrix(
+            (data[mask], (ind[mask], cols[mask])), shape=(len(rows), self.shape[1])
+        )
+
+    def leftDot(self, mat):
+        """Calculates mat@A from the rows of A that are needed by mat
+
+        :param mat: scipy.sparse.csr_matrix
+        :return: mat@A as scipy.sparse.csr_matrix
+        """
+        rows = np.unique(mat.indices).astype(np.int64)
+        return mat[:, rows].dot(self.rows(rows))
+
+
+@njit(
+    [
+        Tuple((f8[:, :], i8))(f8[:], i4[:], i4[:], i8, i8),
+        Tuple((f8[:, :], i8))(f8[:], i8[:], i8[:], i8, i8),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def st_from_csr_(data, indices, indptr, w, r):
+    size = 2 * r + 1
+    n = indptr.shape[0] - 1
+    result = np.zeros((size * size, n))
+    outside = 0
+    for yi in prange(n // w):
+        for xi in range(w):
+            i = yi * w + xi
+            for k in range(indptr[i], indptr[i + 1]):
+                if data[k] == 0:
+                    continue
+                dy = indices[k] // w - yi
+                dx = indices[k] % w - xi
+                if abs(dy) > r or abs(dx) > r:
+                    outside += 1
+                else:
+                    result[(dy + r) * size + dx + r, i] += data[k]
+    return result, outside
+
+
+@njit(
+    [
+        void(Tuple((f8[:, :], i8[:], i8)), f8[:], f8[:]),
+        void(Tuple((f4[:, :], i8[:], i8)), f4[:], f4[:]),
+        void(Tuple((f4[:, :], i8[:], i8)), f8[:], f8[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def st_dot_(mat, x, result):
+    """Calculates result = mat@x. Each image row is processed one offset at a time, which reads data and x
+    contiguously."""
+    data, offsets, w = mat
+    n = x.shape[0]
+    for y in prange(n // w):
+        start = y * w
+        end = start + w
+        for i in range(start, end):
+            result[i] = 0.0
+        for k in range(offsets.shape[0]):
+            offset = offsets[k]
+            for i in range(max(start, -offset), min(end, n - offset)):
+                result[i] += data[k, i] * x[i + offset]
+
+
+@njit(
+    [
+        f8[:](Tuple((f8[:, :], i8[:], i8)), i8[:]),
+        f4[:](Tuple((f4[:, :], i8[:], i8)), i8[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def st_cols_squared_sum_(mat, cols):
+    """Column j holds the entry of pixel j - offset for each offset"""
+    data, offsets, w = mat
+    n = data.shape[1]
+    result = np.zeros((cols.shape[0],), dtype=data.dtype)
+    for k in prange(cols.shape[0]):
+        col = cols[k]
+        res = 0.0
+        for o in range(offsets.shape[0]):
+            row = col - offsets[o]
+            if 0 <= row < n:
+                res += data[o, row] ** 2
+        result[k] = res
+    return result
+
+
+@njit(
+    [
+        void(Tuple((f8[:, :], i8[:], i8)), f8[:], f8[:], i8[:], f8[:]),
+        void(Tuple((f4[:, :], i8[:], i8)), f4[:], f4[:], i8[:], f4[:]),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def st_update_residual_rows_(mat, b, x, rows, r):
+    data, offsets, w = mat
+    n = x.shape[0]
+    for k in prange(rows.shape[0]):
+        row = rows[k]
+        res = 0.0
+        for o in range(offsets.shape[0]):
+            col = row + offsets[o]
+            if 0 <= col < n:
+                res += data[o, row] * x[col]
+        r[row] = b[row] - res
+
+
+@njit(
+    [
+        f8[:](Tuple((f8[:, :], i8[:], i8)), f8[:], f8[:], f8[:], i8),
+        f4[:](Tuple((f4[:, :], i8[:], i8)), f4[:], f4[:], f4[:], i8),
+    ],
+    nogil=config.config.nogil,
+    parallel=config.config.parallel,
+    cache=config.config.cache,
+)
+def st_spai0_step_(mat, b, x, m_diag, iterations):
+    x = x.copy()
+    Ax = np.empty_like(x)
+    for iteration in range(iterations):
+        st_dot_(mat, x, Ax)
+        for i in prange(x.shape[0]):
+            x[i] -= m_diag[i] * (Ax[i] - b[i])
+    return x
@@ -0,0 +1,169 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+from contextlib import contextmanager
+from threading import get_ident
+from time import perf_counter as time
+from datetime import datetime
+import numpy as np
+import json
+
+
+class Telemetry:
+    """Splits the wall time of the iterations of the solver into the time of its phases. Phases may be nested, the
+    time of an inner phase is only counted for the inner phase, such that the V-Cycle is charged for its smoothing and
+    its transfers but not for the sparse matrix vector products inside of it. Only the thread that started the time
+    window is measured, such that work on other threads, like the rebuild of the system, is not charged. Each record
+    covers a chunk of iterations, or a single iteration if the iterations are not chunked, and is a dictionary, which
+    is appended as a JSON line to the log file if one is open:
+
+        timestamp: ISO time of the end of the chunk
+        iteration: iterations performed so far
+        iterations: iterations of the chunk
+        residual: relative residual after the chunk, null if the right hand side is zero
+        time: seconds spent in each phase, in other work and in total
+        gbps: bandwidth of the sparse matrix vector products in GB/s
+        memory: bytes held by L, A and the V-Cycle hierarchy
+    """
+
+    phases = ("spmv", "preconditioner", "reductions", "publish")
+
+    def __init__(self):
+        self.file = None
+        self.iteration = 0
+        self.reset()
+
+    def reset(self):
+        """Starts the time window of the next record
+
+        :return: None
+        """
+        self.times = dict.fromkeys(self.phases, 0.0)
+        self.bytes = 0
+        self.stack = []
+        self.start = time()
+        self.thread = get_ident()
+
+    @contextmanager
+    def measure(self, phase):
+        """Charges the time spent inside the with statement to the given phase
+
+        :param phase: one of phases
+        """
+        if get_ident() != self.thread:
+            yield
+            return
+        now = time()
+        if self.stack:
+            self.times[self.stack[-1][0]] += now - self.stack[-1][1]
+        self.stack.append([phase, now])
+        try:
+            yield
+        finally:
+            now = time()
+            phase, since = self.stack.pop()
+            self.times[phase] += now - since
+            if self.stack:
+                self.stack[-1][1] = now
+
+    def transferred(self, nbytes):
+        """Adds the bytes a sparse matrix vector product has read and written to the current record
+
+        :param nbytes: bytes
+        :return: None
+        """
+        if get_ident() == self.thread:
+            self.bytes += nbytes
+
+    def record(self, iterations, residual, memory):
+        """Finishes the time window of the current record and starts the next one
+
+        :param iterations: number of iterations performed inside the time window
+        :param residual: relative residual after the iterations or None
+        :param memory: dictionary of names and bytes held by them
+        :return: record
+        """
+        wall = time() - self.start
+        spmv = self.times["spmv"]
+        self.iteration += iterations
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "iteration": self.iteration,
+            "iterations": iterations,
+            "residual": None if residual is None else float(residual),
+            "time": {
+                **self.times,
+                "other": max(wall - sum(self.times.values()), 0.0),
+                "total": wall,
+            },
+            "gbps": self.bytes / spmv / 1e9 if spmv > 0 else 0.0,
+            "memory": memory,
+        }
+        if self.file is not None:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+        self.reset()
+        return record
+
+    def open(self, path):
+        """Appends the following records to the given JSON-lines file
+
+        :param path: path of the log file
+        :return: None
+        """
+        self.close()
+        self.file = open(path, "a")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def arrays(obj):
+    """Yields the arrays held by obj, which may be an array, a tuple, list or dictionary of objects or an object whose
+    attributes are arrays like sparse matrices and the Laplacian operators.
+
+    :param obj: object
+    :return: generator of np.ndarray
+    """
+    if obj is None:
+        return
+    if isinstance(obj, np.ndarray):
+        yield obj
+    elif isinstance(obj, (tuple, list)):
+        for item in obj:
+            yield from arrays(item)
+    elif isinstance(obj, dict):
+        for item in obj.values():
+            yield from arrays(item)
+    elif hasattr(obj, "__dict__"):
+        for item in vars(obj).values():
+            if isinstance(item, np.ndarray):
+                yield item
+
+
+def nbytes(*objects):
+    """Bytes of the arrays held by the objects, each array counted as often as it is held
+
+    :param objects: objects
+    :return: bytes
+    """
+    return sum(a.nbytes for obj in objects for a in arrays(obj))
+
+
+def memory(**objects):
+    """Bytes held by each of the objects. An array shared by several objects, like the windows of the closed-form
+    Laplacian operator and its shifted operator, is only counted for the first of them.
+
+    :param objects: names and objects
+    :return: dictionary of names and bytes
+    """
+    seen = set()
+    result = {}
+    for name, obj in objects.items():
+        result[name] = 0
+        for a in arrays(obj):
+            if id(a) not in seen:
+                seen.add(id(a))
+                result[name] += a.nbytes
+    return result
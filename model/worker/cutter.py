@@ -22,9 +22,9 @@ class Cutter(BaseWorker):
     def cut(self, project: Project, nowait: bool):
         if self.running:
             try:
-                cut = cutout(
-                    project.canvas(), project.alphaMatte(), self.cutoutForeground
-                )
+                alphaMatte = project.alphaMatte()
+                with alphaMatte.lock():
+                    cut = cutout(project.canvas(), alphaMatte, self.cutoutForeground)
                 if cut:
                     self.finished.emit(cut)
                     if nowait:
@@ -1,6 +1,8 @@
 # Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
 
 settingsFileName = ".settings"
+cacheFolderName = ".cache"
+telemetryFileName = "telemetry.jsonl"
 
 brushIconName = "brush"
 paintbucketIconName = "bucket"
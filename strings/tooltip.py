@@ -54,13 +54,13 @@ brushWidthSliderToolTip = "Drag the slider to increase/decrease the brush width.
 
 colorPushButtonToolTip = "Pressing this button cycles through all possible colors"
 
-laplacianToolTip = "Laplacian that is being used"
+laplacianToolTip = "<html><head/><body><p>Set the Laplacian that is being used.</p><p>The KNN-Laplacian connects each pixel to its nearest neighbours in color and position and has the fewest nonzeros. Its neighbours may lie far apart, so the Schwarz method uses cgd with it. The Random-Walk- and the KNN-Laplacian are symmetrically normalized. The Large-Kernel-Laplacian is the Closed-Form-Laplacian, whose products are evaluated with box filters if it is stored matrix free. Only the Closed-Form- and the Large-Kernel-Laplacian support the stencil and the matrix free storage.</p><p>Default: Closed-Form-Laplacian</p></body></html>"
 
 radiusToolTip = "<html><head/><body><p>Set the radius of the local window size. </p><p>Default: 1</p></body></html>"
 
 epsilonToolTip = "<html><head/><body><p>Set the regularization strength. </p><p>Default: 0,0000001</p></body></html>"
 
-methodToolTip = "<html><head/><body><p>Set the method of the Solver.</p><p>Default: cgd (Conjugate Gradient Descent)</p></body></html>"
+methodToolTip = "<html><head/><body><p>Set the method of the Solver.</p><p>schwarz splits the image into overlapping tiles, which are solved in separate processes.</p><p>Default: cgd (Conjugate Gradient Descent)</p></body></html>"
 
 preconditionerToolTip = "<html><head/><body><p>Set the preconditioner for cgd.</p><p>Default: none</p></body></html>"
 
@@ -76,6 +76,34 @@ preIterToolTip = "<html><head/><body><p>Number of smoothing iterations before ea
 
 postIterToolTip = "<html><head/><body><p>Number of smoothing iterations after each V-Cycle</p><p>Default: 1</p></body></html>"
 
+fusedToolTip = "<html><head/><body><p>Update alpha, residual and direction of cgd in place inside preallocated buffers.</p><p>Default: enabled</p></body></html>"
+
+chunkedToolTip = "<html><head/><body><p>Perform as many iterations as fit into the time budget before checking for new events and updating the alpha matte.</p><p>Default: enabled</p></body></html>"
+
+timeBudgetToolTip = "<html><head/><body><p>Time in milliseconds the solver may iterate before checking for new events when chunked iterations are enabled.</p><p>Default: 16</p></body></html>"
+
+reducedToolTip = "<html><head/><body><p>Fix the alpha values of the known pixels and only solve for the unknown pixels. The known pixels are moved to the right hand side, which makes lambda irrelevant.</p><p>Default: disabled</p></body></html>"
+
+storageToolTip = "<html><head/><body><p>Set how the Laplacian is stored. csr stores the entries with their column indices. stencil stores the entries of the fixed neighbourhood of each pixel without indices, which needs less memory and speeds up the multiplication. matrix free evaluates the Laplacian on the fly from the image, which needs a fraction of the memory, but each multiplication is slower. The reduced system always uses csr and matrix free is only used by the CG-Method without the V-Cycle preconditioner.</p><p>Default: csr</p></body></html>"
+
+singlePrecisionToolTip = "<html><head/><body><p>Store the Laplacian, alpha and the vectors of the solver in single precision. This halves the memory and the memory traffic of the iterations, which is enough for the 256 levels of the alpha matte. The matrix free Laplacian always uses double precision.</p><p>Default: disabled</p></body></html>"
+
+refinementToolTip = "<html><head/><body><p>Recalculate the residual of a single precision solution in double precision when the tolerance is reached and continue if it is still above the tolerance.</p><p>Default: enabled</p></body></html>"
+
+progressiveToolTip = "<html><head/><body><p>Solve on a quarter and half of the resolution first when the canvas changes and use the upsampled alpha matte as initial guess of the full resolution solve.</p><p>Default: enabled</p></body></html>"
+
+schwarzTileSizeToolTip = "<html><head/><body><p>Set the size of the tiles of the Schwarz method, which bounds the memory of each worker.</p><p>Default: 512</p></body></html>"
+
+schwarzWorkersToolTip = "<html><head/><body><p>Set the number of processes that solve the tiles of the Schwarz method.</p><p>Default: number of cores</p></body></html>"
+
+previewToolTip = "<html><head/><body><p>Show a guided filter of the trimap around each stroke, with the canvas as guide, right after drawing. The solver continues from the preview if its residual is smaller and replaces it once the alpha matte improves on it.</p><p>Default: enabled</p></body></html>"
+
+localSolveToolTip = "<html><head/><body><p>Solve a window around each stroke, with the surrounding alpha matte as boundary, before the global iterations resume. Strokes far apart get windows of their own and windows above a sixteenth of the canvas are skipped.</p><p>Default: enabled</p></body></html>"
+
+telemetryLogToolTip = "<html><head/><body><p>Append a record of every chunk of iterations, with the residual, the time spent in sparse matrix vector products, the preconditioner, reductions and publishing, the achieved bandwidth and the memory held by L, A and the V-Cycle hierarchy, to telemetry.jsonl inside the project folder, or inside the working directory for unsaved projects.</p><p>Default: disabled</p></body></html>"
+
+backgroundRebuildToolTip = "<html><head/><body><p>Build the Laplacian, the system and the V-Cycle hierarchy for a new epsilon, radius or Laplacian on a separate thread, while the solver keeps iterating on the current system until the new one replaces it. Needs the memory of both systems while rebuilding.</p><p>Default: enabled</p></body></html>"
+
 increaseSmoothnessToolTip = "Increase Alpha Smoothness"
 
 decreaseSmoothnessToolTip = "Decrease Alpha Smoothness"
@@ -0,0 +1,84 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+import unittest
+import tempfile
+import shutil
+import os
+import numpy as np
+import scipy.sparse
+from model.misc import DiskCache
+from strings import cacheFolderName
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.diskCache = DiskCache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def makeMatrix(self, n=30):
+        return scipy.sparse.random(n, n, density=0.2, format="csr")
+
+    def testKey(self):
+        a = np.random.rand(10, 10, 3)
+        self.assertEqual(DiskCache.key(a, 1e-7, 1), DiskCache.key(a.copy(), 1e-7, 1))
+        self.assertNotEqual(DiskCache.key(a, 1e-7, 1), DiskCache.key(a, 1e-6, 1))
+        self.assertNotEqual(DiskCache.key(a, 1e-7, 1), DiskCache.key(a, 1e-7, 2))
+        b = a.copy()
+        b[0, 0, 0] += 1
+        self.assertNotEqual(DiskCache.key(a, 1e-7, 1), DiskCache.key(b, 1e-7, 1))
+        self.assertNotEqual(
+            DiskCache.key(a.astype(np.float32)), DiskCache.key(a.astype(np.float64))
+        )
+
+    def testLaplacian(self):
+        self.assertIsNone(self.diskCache.loadLaplacian("a"))
+        L = self.makeMatrix()
+        self.assertTrue(self.diskCache.saveLaplacian("a", L))
+        self.assertTrue(self.diskCache.has("laplacian", "a"))
+        loaded = self.diskCache.loadLaplacian("a")
+        self.assertEqual(L.shape, loaded.shape)
+        self.assertTrue(np.all(L.toarray() == loaded.toarray()))
+
+        loaded.data[:] = 0
+        self.assertTrue(
+            np.all(L.toarray() == self.diskCache.loadLaplacian("a").toarray())
+        )
+
+        self.assertTrue(self.diskCache.saveLaplacian("b", self.makeMatrix()))
+        self.assertIsNone(self.diskCache.loadLaplacian("a"))
+        self.assertEqual(
+            ["laplacian-b"], os.listdir(os.path.join(self.path, cacheFolderName))
+        )
+
+    def testHierarchy(self):
+        cache = {}
+        for shape in [(8, 6), (4, 3)]:
+            n = shape[0] * shape[1]
+            cache[shape] = (
+                self.makeMatrix(n)[: n // 4],
+                self.makeMatrix(n)[:, : n // 4],
+                np.random.rand(n),
+                self.makeMatrix(n // 4),
+                np.random.rand(n),
+            )
+        self.assertTrue(self.diskCache.saveHierarchy("a", cache))
+        self.assertTrue(self.diskCache.saveTransfer("b", cache))
+        levels = self.diskCache.loadHierarchy("a")
+        transfer = self.diskCache.loadTransfer("b")
+        self.assertEqual(set(cache.keys()), set(levels.keys()))
+        self.assertEqual(set(cache.keys()), set(transfer.keys()))
+        for shape in cache:
+            for expected, actual in zip(cache[shape], transfer[shape] + levels[shape]):
+                if scipy.sparse.issparse(expected):
+                    self.assertEqual(expected.shape, actual.shape)
+                    expected, actual = expected.toarray(), actual.toarray()
+                self.assertTrue(np.all(expected == actual))
+        self.assertIsNone(self.diskCache.loadHierarchy("b"))
+        self.assertIsNone(self.diskCache.loadTransfer("a"))
+        self.assertEqual(
+            ["hierarchy-a", "transfer-b"],
+            sorted(os.listdir(os.path.join(self.path, cacheFolderName))),
+        )
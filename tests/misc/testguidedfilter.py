@@ -0,0 +1,58 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+import unittest
+import numpy as np
+from model.misc.guidedfilter import box_mean_, guided_filter_
+
+
+class TestGuidedFilter(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+
+    def boxMean(self, a, r):
+        h, w = a.shape
+        result = np.empty_like(a)
+        for y in range(h):
+            for x in range(w):
+                result[y, x] = a[
+                    max(0, y - r) : y + r + 1, max(0, x - r) : x + r + 1
+                ].mean()
+        return result
+
+    def testBoxMean(self):
+        a = np.random.rand(23, 31)
+        for r in [0, 1, 3, 12, 40]:
+            self.assertTrue(np.allclose(box_mean_(a, r), self.boxMean(a, r)))
+
+    def testGuidedFilter(self):
+        h, w, r, epsilon = 20, 25, 2, 1e-2
+        image = np.random.rand(h, w, 3)
+        p = np.random.rand(h, w)
+        meanI = np.stack([self.boxMean(image[:, :, i], r) for i in range(3)], axis=-1)
+        meanP = self.boxMean(p, r)
+        covIp = (
+            np.stack([self.boxMean(image[:, :, i] * p, r) for i in range(3)], axis=-1)
+            - meanI * meanP[:, :, np.newaxis]
+        )
+        covII = np.empty((h, w, 3, 3))
+        for i in range(3):
+            for j in range(3):
+                covII[:, :, i, j] = (
+                    self.boxMean(image[:, :, i] * image[:, :, j], r)
+                    - meanI[:, :, i] * meanI[:, :, j]
+                )
+        a = np.linalg.solve(covII + epsilon * np.eye(3), covIp[:, :, :, np.newaxis])
+        a = a[:, :, :, 0]
+        b = meanP - np.sum(a * meanI, axis=-1)
+        meanA = np.stack([self.boxMean(a[:, :, i], r) for i in range(3)], axis=-1)
+        truth = np.sum(meanA * image, axis=-1) + self.boxMean(b, r)
+        self.assertTrue(np.allclose(guided_filter_(image, p, r, epsilon), truth))
+
+        # constant images and images that are linear in the guide are preserved
+        self.assertTrue(
+            np.allclose(guided_filter_(image, np.full((h, w), 0.3), r, 1e-6), 0.3)
+        )
+        linear = 0.2 * image[:, :, 0] - 0.5 * image[:, :, 2] + 0.1
+        self.assertTrue(
+            np.allclose(guided_filter_(image, linear, r, 1e-9), linear, atol=1e-5)
+        )
@@ -0,0 +1,78 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+import unittest
+import numpy as np
+import scipy.sparse
+from model.misc import CfLaplacianOperator, LkmLaplacianOperator
+from model.misc.laplacian import (
+    make_laplacian,
+    symmetrized,
+    cf_laplacian_rows,
+    make_stencil_laplacian,
+)
+from model.enum import Laplacian
+from pymatting import cf_laplacian, knn_laplacian
+
+
+class TestLaplacian(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.image = np.random.rand(20, 30, 3)
+
+    def testSymmetrized(self):
+        L = knn_laplacian(self.image).tocsr()
+        S = symmetrized(L)
+        self.assertAlmostEqual(abs(S - S.T).max(), 0)
+        self.assertTrue(np.allclose(S.diagonal(), L.diagonal()))
+        self.assertTrue(
+            np.allclose(
+                np.sort(np.linalg.eigvals(L.toarray()).real),
+                np.linalg.eigvalsh(S.toarray()),
+            )
+        )
+
+    def testMakeLaplacian(self):
+        n = self.image.shape[0] * self.image.shape[1]
+        for laplacian in Laplacian:
+            L = make_laplacian(laplacian, self.image, 1e-7, 1)
+            self.assertTrue(scipy.sparse.isspmatrix_csr(L))
+            self.assertEqual((n, n), L.shape)
+            self.assertAlmostEqual(abs(L - L.T).max(), 0)
+            self.assertGreater(np.linalg.eigvalsh(L.toarray()).min(), -1e-10)
+        self.assertAlmostEqual(
+            abs(
+                make_laplacian(Laplacian.largeKernel, self.image, 1e-7, 1)
+                - cf_laplacian(self.image, 1e-7, 1)
+            ).max(),
+            0,
+        )
+
+    def testRowBlocks(self):
+        for radius in [1, 2]:
+            L = cf_laplacian(self.image, 1e-7, radius).tocsr()
+            S = CfLaplacianOperator(self.image, 1e-7, radius).toStencil()
+            for blockSize in [1, 100, 2**16]:
+                progress = []
+                M = cf_laplacian_rows(
+                    self.image, 1e-7, radius, progress.append, blockSize
+                )
+                self.assertTrue(np.array_equal(M.indptr, L.indptr))
+                self.assertTrue(np.array_equal(M.indices, L.indices))
+                self.assertTrue(np.array_equal(M.data, L.data))
+                self.assertEqual(progress, sorted(progress))
+                self.assertEqual(progress[-1], 1.0)
+                T = make_stencil_laplacian(self.image, 1e-7, radius, None, blockSize)
+                self.assertEqual(T.radius, S.radius)
+                self.assertTrue(np.allclose(T.data, S.data))
+
+    def testLkmLaplacianOperator(self):
+        n = self.image.shape[0] * self.image.shape[1]
+        c = np.random.rand(n)
+        for radius in [1, 2]:
+            cf = CfLaplacianOperator(self.image, 1e-7, radius).shifted(c)
+            lkm = LkmLaplacianOperator(self.image, 1e-7, radius).shifted(c)
+            self.assertIsInstance(lkm, LkmLaplacianOperator)
+            for i in range(5):
+                x = np.random.rand(n)
+                self.assertTrue(np.allclose(lkm.dot(x), cf.dot(x)))
+            self.assertTrue(np.allclose(lkm.diagonal(), cf.diagonal()))
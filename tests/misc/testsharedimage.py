@@ -0,0 +1,46 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+import unittest
+import numpy as np
+from model.misc import Image, SharedImage
+from multiprocessing.shared_memory import SharedMemory
+from PyQt5 import QtCore as qtc
+from PyQt5 import QtGui as qtg
+
+
+class TestSharedImage(unittest.TestCase):
+    def setUp(self):
+        self.image = Image.full(qtc.QSize(7, 5), qtg.QColor(10, 20, 30, 40))
+        self.image.rawView()[1, 2] = 200
+
+    def testShare(self):
+        shared = SharedImage.share(self.image)
+        self.assertEqual(shared.size(), self.image.size())
+        self.assertEqual(shared.format(), self.image.format())
+        self.assertTrue(np.array_equal(shared.rawView(), self.image.rawView()))
+        shared.release()
+
+    def testAttach(self):
+        shared = SharedImage.share(self.image)
+        attached = SharedImage.attach(shared.descriptor())
+        self.assertTrue(np.array_equal(attached.rawView(), shared.rawView()))
+        attached.rawView()[3, 4] = 123
+        self.assertEqual(shared.rawView()[3, 4], 123)
+        copy = attached.copy()
+        copy.rawView()[3, 4] = 0
+        self.assertEqual(shared.rawView()[3, 4], 123)
+        shared.release()
+
+    def testRelease(self):
+        shared = SharedImage.share(self.image)
+        name = shared.descriptor()[0]
+        shared.release()
+        shared.release()
+        self.assertTrue(np.array_equal(shared.rawView(), self.image.rawView()))
+        with self.assertRaises(FileNotFoundError):
+            SharedMemory(name=name)
+
+    def testLock(self):
+        lock = object()
+        self.assertIs(SharedImage.share(self.image, lock).lock(), lock)
+        self.assertIsNot(SharedImage.share(self.image).lock(), lock)
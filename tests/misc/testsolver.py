@@ -1,21 +1,64 @@
 # Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
 import sys
 import unittest
+import tempfile
+import shutil
+import json
 import numpy as np
 from PyQt5 import QtCore as qtc
 from PyQt5 import QtGui as qtg
 
 from tests.utility import setupImages
 from model.misc import Solver, Image, AdjustingRect
-from model.misc.solver import getUpdatedADiag_
-from model.enum import Reason, Method, Preconditioner, Kernel, Color
-from model.events import UpdateEvent
+from model.misc.solver import (
+    getUpdatedADiag_,
+    cgd_fused_,
+    pcgd_fused_update_,
+    pcgd_fused_direction_,
+    cgd_fused_chunk_,
+    pcgd_jacobi_fused_chunk_,
+    quantize_tiles_,
+    copy_tiles_,
+    get_rect_indices_,
+    sp_diag_rows_,
+    sp_diag_ptr_,
+    sp_cols_squared_sum_,
+    sp_set_rows_,
+    sp_residual_rows_,
+    sp_update_residual_rows_,
+    sp_dot_,
+    spai0_step_rows_,
+    make_reduced_data_,
+    make_reduced_b_,
+    cf_cgd_fused_chunk_,
+    cf_pcgd_jacobi_fused_chunk_,
+    st_cgd_fused_chunk_,
+    sp_diag_,
+    make_b_,
+    make_c_,
+    solve_schwarz_tile,
+    ConstructionCancelled,
+)
+from model.misc.cflaplacian import CfLaplacianOperator
+from model.misc.laplacian import LkmLaplacianOperator, make_laplacian
+from model.misc.stencilmatrix import StencilMatrix
+from pymatting import cf_laplacian
+from model.enum import (
+    Reason,
+    Method,
+    Preconditioner,
+    Kernel,
+    Color,
+    Laplacian,
+    Storage,
+)
+from model.events import UpdateEvent, StopEvent, QuitEvent
 from model.util import trimapToRgba
 from threading import Event
 from queue import Queue
 from scipy.sparse import csr_matrix
 from skimage.metrics import structural_similarity as ssim
-import scipy.sparse
+import scipy.sparse, scipy.sparse.linalg
 from typing import Optional
 
 
@@ -140,6 +183,67 @@ class TestSolver(unittest.TestCase):
         self.assertEqual(Preconditioner.jacobi, solver.get_preconditioner())
         self.assertEqual(Kernel.linear, solver.get_kernel()[0])
 
+    def testCoalesceEvents(self):
+        canvas, trimapPreview, alphaMatte, _, eventQueue, solver = self.makeSolver()
+        radius = [UpdateEvent(Reason.radiusChanged, r) for r in range(1, 5)]
+        rects = [
+            UpdateEvent(Reason.trimapChanged, qtc.QRect(i, i, 5, 5)) for i in range(2)
+        ]
+        alpha = UpdateEvent(Reason.alphaMatteChanged, alphaMatte)
+        canvasEvents = [UpdateEvent(Reason.canvasChanged, canvas) for i in range(2)]
+        stop = StopEvent()
+        epsilon = [UpdateEvent(Reason.epsilonChanged, e) for e in [1e-5, 1e-6]]
+        events = [
+            radius[0],
+            canvasEvents[0],
+            rects[0],
+            radius[1],
+            alpha,
+            canvasEvents[1],
+            rects[1],
+            radius[2],
+            epsilon[0],
+            stop,
+            radius[3],
+            epsilon[1],
+        ]
+        self.assertEqual(
+            solver.coalesceEvents(events),
+            [
+                rects[0],
+                [alpha, canvasEvents[1]],
+                rects[1],
+                radius[2],
+                epsilon[0],
+                stop,
+                radius[3],
+                epsilon[1],
+            ],
+        )
+
+        resets = []
+        solver.reset_L = lambda: resets.append(True)
+        for r in range(2, 10):
+            eventQueue.put_nowait(UpdateEvent(Reason.radiusChanged, r))
+            eventQueue.put_nowait(UpdateEvent(Reason.epsilonChanged, 10.0**-r))
+        solver.processEvents(eventQueue)
+        self.assertEqual(9, solver.get_radius())
+        self.assertEqual(1e-9, solver.get_epsilon())
+        self.assertEqual(2, len(resets))
+
+        changes = []
+        solver.changeCanvas = lambda canvas: changes.append("canvas")
+        solver.changeTrimapPreview = lambda preview: changes.append("trimapPreview")
+        solver.changeAlphaMatte = lambda alphaMatte: changes.append("alphaMatte")
+        for i in range(3):
+            eventQueue.put_nowait(
+                UpdateEvent(Reason.trimapPreviewChanged, trimapPreview)
+            )
+            eventQueue.put_nowait(UpdateEvent(Reason.canvasChanged, canvas))
+            eventQueue.put_nowait(UpdateEvent(Reason.alphaMatteChanged, alphaMatte))
+        solver.processEvents(eventQueue)
+        self.assertEqual(changes, ["canvas", "alphaMatte", "trimapPreview"])
+
     def test_solvers(self):
         imagesPath = qtc.QFileInfo(__file__).dir()
         imagesPath.cdUp()
@@ -508,3 +612,996 @@ class TestSolver(unittest.TestCase):
                 )
             )
         )
+
+    def testSetLambda(self):
+        _, _, _, _, _, solver = self.makeSolver()
+        solver.solve()
+        A = solver.get_A()
+        solver.setLambda(321)
+        self.assertIs(A, solver.get_A())
+        self.assertTrue(np.all(solver.get_c()[solver.get_c() != 0] == 321))
+        self.assertEqual(
+            0, (A != solver.get_L() + scipy.sparse.diags(solver.get_c())).nnz
+        )
+        self.assertIsNone(solver.r)
+        self.assertIsNone(solver.A_diag)
+        self.assertIsNone(solver.M)
+        self.assertTrue(np.all(solver.get_A_diag() == A.diagonal()))
+
+    def testUpdateReducedSystem(self):
+        canvas, trimapPreview, alphaMatte, _, _, solver = self.makeSolver()
+        shape = trimapPreview.rawView().shape
+        solver.setReduced(True)
+        solver.solve()
+        solver.get_A_diag()
+        solver.get_m_diag()
+        trimapPreview.byteView()[100:200, 300:400] = Color.lightGreen.bgra()
+        trimapPreview.byteView()[0:100, :] = Color.lightRed.bgra()
+        solver.updateSystem(
+            AdjustingRect((0, 0), *shape).addRect(qtc.QRect(0, 0, shape[1], 200))
+        )
+        fresh = Solver(canvas, trimapPreview, alphaMatte, Queue(), MockEvent())
+        fresh.setReduced(True)
+        fresh.alpha = solver.get_alpha().copy()
+        self.assertTrue(np.all(solver.get_unknown() == fresh.get_unknown()))
+        self.assertTrue(np.all(solver.get_unknown_ind() == fresh.get_unknown_ind()))
+        self.assertTrue(np.all(solver.get_b() == fresh.get_b()))
+        self.assertEqual(0, (solver.get_A() != fresh.get_A()).nnz)
+        self.assertTrue(np.allclose(solver.get_r(), fresh.get_r()))
+        self.assertTrue(np.all(solver.get_alpha().reshape(shape)[0:100, :] == 0))
+        self.assertTrue(
+            np.all(solver.get_alpha().reshape(shape)[100:200, 300:400] == 1)
+        )
+        self.assertTrue(np.allclose(solver.get_A_diag(), fresh.get_A_diag()))
+        self.assertTrue(np.allclose(solver.get_m_diag(), fresh.get_m_diag()))
+
+    def testSinglePrecision(self):
+        _, _, _, _, _, solver = self.makeSolver()
+        _, _, _, _, _, reference = self.makeSolver()
+        for s in [solver, reference]:
+            s.setRtol(5)
+        solver.setSinglePrecision(True)
+        for i in range(1000):
+            if reference.solve() is not None and reference.error <= 1e-5:
+                break
+        for i in range(1000):
+            if solver.solve() is not None and solver.error <= 1e-5:
+                break
+        self.assertEqual(np.float32, solver.get_alpha().dtype)
+        self.assertEqual(np.float32, solver.get_A().dtype)
+        self.assertEqual(np.float32, solver.get_r().dtype)
+        self.assertTrue(solver.refined)
+        self.assertLess(
+            np.abs(solver.get_alpha() - reference.get_alpha()).max(), 1 / 255
+        )
+
+        solver.setSinglePrecision(False)
+        self.assertEqual(np.float64, solver.get_alpha().dtype)
+        self.assertEqual(np.float64, solver.get_A().dtype)
+
+    def testProgressive(self):
+        _, _, _, _, _, solver = self.makeSolver()
+        _, _, _, _, _, reference = self.makeSolver()
+        reference.setProgressive(False)
+        solver.solve()
+        reference.solve()
+        self.assertFalse(solver.progressivePending)
+        self.assertFalse(reference.progressivePending)
+        self.assertLess(solver.error, reference.error)
+
+        for s in [solver, reference]:
+            for i in range(1000):
+                if s.solve() is not None and s.error <= s.get_rtol():
+                    break
+        self.assertLess(
+            np.abs(solver.get_alpha() - reference.get_alpha()).max(), 1 / 255
+        )
+
+    def testProgressiveInterrupted(self):
+        canvas, _, _, _, eventQueue, solver = self.makeSolver()
+        results = []
+        original = solver.solveCoarse
+
+        def solveCoarse(*args):
+            results.append(original(*args))
+            return results[-1]
+
+        solver.solveCoarse = solveCoarse
+        eventQueue.put_nowait(UpdateEvent(Reason.printErrorChanged, False))
+        self.assertIsNotNone(solver.solve())
+        self.assertFalse(solver.progressivePending)
+        self.assertEqual(len(results), 1)
+        alpha, finished = results[0]
+        self.assertFalse(finished)
+        self.assertFalse(alpha.any())
+
+        solver.processEvents(eventQueue)
+        solver.changeCanvas(canvas)
+        results.clear()
+        eventQueue.put_nowait(UpdateEvent(Reason.canvasChanged, canvas))
+        self.assertIsNone(solver.solve())
+        self.assertEqual(results, [])
+        self.assertIsNone(solver.L)
+
+    def testSchwarz(self):
+        _, _, _, _, _, solver = self.makeSolver()
+        _, _, _, _, _, reference = self.makeSolver()
+        for s in [solver, reference]:
+            s.setProgressive(False)
+        solver.setMethod(Method.schwarz)
+        solver.setSchwarzTileSize(64)
+        solver.setSchwarzWorkers(2)
+        for s in [solver, reference]:
+            for i in range(1000):
+                if s.solve() is not None and s.error <= s.get_rtol():
+                    break
+        solver.reset_pool()
+        self.assertIsNone(solver.L)
+        self.assertLess(
+            np.abs(solver.get_alpha() - reference.get_alpha()).max(), 1 / 255
+        )
+
+    def testLaplacians(self):
+        for laplacian in Laplacian:
+            _, _, _, _, _, solver = self.makeSolver()
+            built = []
+            solver.laplacianBuilt.connect(
+                lambda *args: built.append(args), qtc.Qt.DirectConnection
+            )
+            solver.setProgressive(False)
+            solver.setLaplacian(laplacian)
+            for i in range(1000):
+                if solver.solve() is not None and solver.error <= solver.get_rtol():
+                    break
+            self.assertLessEqual(solver.error, solver.get_rtol())
+            self.assertEqual(laplacian, built[0][0])
+            self.assertEqual(solver.L.nnz, built[0][2])
+
+        _, _, _, _, _, solver = self.makeSolver()
+        solver.setLaplacian(Laplacian.largeKernel)
+        solver.setStorage(Storage.matrixFree)
+        solver.setPreconditioner(Preconditioner.jacobi)
+        self.assertIsInstance(solver.get_L(), LkmLaplacianOperator)
+        self.assertIsInstance(solver.get_A(), LkmLaplacianOperator)
+        solver.setLaplacian(Laplacian.knn)
+        self.assertTrue(solver.get_storage().isCsr())
+
+    def testKnnIsNotSplit(self):
+        _, trimapPreview, _, _, _, solver = self.makeSolver()
+        solver.setProgressive(False)
+        solver.setMethod(Method.schwarz)
+        solver.setLaplacian(Laplacian.knn)
+        self.assertTrue(solver.get_method().isCgd())
+        for i in range(1000):
+            if solver.solve() is not None and solver.error <= solver.get_rtol():
+                break
+        self.assertLessEqual(solver.error, solver.get_rtol())
+        A = solver.get_A()
+        norm_r = np.linalg.norm(solver.get_b() - A @ solver.get_alpha())
+        self.assertLessEqual(norm_r / solver.get_norm_b(), solver.get_rtol() * 1.01)
+
+        shape = trimapPreview.rawView().shape
+        trimapPreview.byteView()[20:40, 40:70] = Color.lightGreen.bgra()
+        solver.updateSystem(
+            AdjustingRect((0, 0), *shape).addRect(qtc.QRect(40, 20, 30, 20))
+        )
+        self.assertEqual([(40, 20, 70, 40)], solver.localRects)
+        alpha = solver.get_alpha().copy().reshape(shape)
+        solver.solveLocal()
+        changed = np.argwhere(solver.get_alpha().reshape(shape) != alpha)
+        self.assertTrue(len(changed) > 0)
+        self.assertTrue(np.all(changed.min(axis=0) >= (20 - solver.localMargin, 0)))
+
+        solver.setLaplacian(Laplacian.closedForm)
+        self.assertTrue(solver.get_method().isSchwarz())
+        self.assertIsNone(solver.L)
+        solver.reset_pool()
+
+    def testLargeKernelIterations(self):
+        for preconditioner in [Preconditioner.none, Preconditioner.jacobi]:
+            alphas = []
+            for laplacian in [Laplacian.closedForm, Laplacian.largeKernel]:
+                _, _, _, _, _, solver = self.makeSolver()
+                solver.setProgressive(False)
+                solver.setLaplacian(laplacian)
+                solver.setStorage(Storage.matrixFree)
+                solver.setPreconditioner(preconditioner)
+                for i in range(1000):
+                    if solver.solve() is not None and solver.error <= solver.get_rtol():
+                        break
+                self.assertLessEqual(solver.error, solver.get_rtol())
+                alphas.append(solver.get_alpha())
+            # the box filters are used instead of the windows
+            self.assertIsInstance(solver.get_A(), LkmLaplacianOperator)
+            self.assertIsNone(solver.get_A().mu)
+            self.assertLess(np.abs(alphas[0] - alphas[1]).max(), 1 / 255)
+
+    def testPreview(self):
+        _, trimapPreview, alphaMatte, _, _, solver = self.makeSolver()
+        solver.setProgressive(False)
+        for i in range(1000):
+            if solver.solve() is not None and solver.error <= solver.get_rtol():
+                break
+        alpha = solver.get_alpha().copy()
+        shape = trimapPreview.rawView().shape
+        trimapPreview.byteView()[100:120, 200:230] = Color.lightGreen.bgra()
+        solver.updateSystem(
+            AdjustingRect((0, 0), *shape).addRect(qtc.QRect(200, 100, 30, 20))
+        )
+        self.assertTrue(np.all(solver.get_alpha() == alpha))
+        self.assertTrue(np.all(alphaMatte.rawView()[100:120, 200:230] == 255))
+        preview = solver.previewAlpha.reshape(shape)
+        radius = 2 * solver.previewRadius
+        self.assertTrue(np.all(preview[100:120, 200:230] == 1))
+        self.assertTrue(
+            np.all(
+                preview[: 100 - radius]
+                == solver.get_alpha().reshape(shape)[: 100 - radius]
+            )
+        )
+
+        solver.solve()
+        self.assertIsNone(solver.previewAlpha)
+        for i in range(1000):
+            if solver.solve() is not None and solver.error <= solver.get_rtol():
+                break
+        self.assertLessEqual(solver.error, solver.get_rtol())
+        self.assertIsNone(solver.previewError)
+        self.assertTrue(
+            np.all(
+                np.abs(
+                    alphaMatte.rawView() / 255.0
+                    - solver.get_alpha().reshape(shape).clip(0, 1)
+                )
+                <= 1 / 255
+            )
+        )
+
+    def testLocalSolve(self):
+        errors = []
+        for localSolve in [True, False]:
+            _, trimapPreview, _, _, _, solver = self.makeSolver()
+            solver.setProgressive(False)
+            solver.setPreview(False)
+            solver.setLocalSolve(localSolve)
+            for i in range(1000):
+                if solver.solve() is not None and solver.error <= solver.get_rtol():
+                    break
+            shape = trimapPreview.rawView().shape
+            trimapPreview.byteView()[20:40, 40:70] = Color.lightGreen.bgra()
+            solver.updateSystem(
+                AdjustingRect((0, 0), *shape).addRect(qtc.QRect(40, 20, 30, 20))
+            )
+            self.assertEqual(
+                [(40, 20, 70, 40)] if localSolve else [], solver.localRects
+            )
+            alpha = solver.get_alpha().copy().reshape(shape)
+            solver.solve()
+            self.assertEqual([], solver.localRects)
+            errors.append(solver.error)
+            if localSolve:
+                changed = np.argwhere(solver.get_alpha().reshape(shape) != alpha)
+                margin = solver.localMargin + 2 * solver.get_radius()
+                self.assertTrue(
+                    np.all(changed.min(axis=0) >= (20 - margin, 40 - margin))
+                )
+                self.assertTrue(
+                    np.all(changed.max(axis=0) < (40 + margin, 70 + margin))
+                )
+        self.assertLess(errors[0], errors[1])
+
+    def testLocalSolveWindows(self):
+        for method, storage in [
+            (Method.cgd, Storage.csr),
+            (Method.cgd, Storage.matrixFree),
+            (Method.schwarz, Storage.csr),
+        ]:
+            _, trimapPreview, _, _, _, solver = self.makeSolver()
+            solver.setProgressive(False)
+            solver.setPreview(False)
+            solver.setMethod(method)
+            solver.setStorage(storage)
+            solver.setPreconditioner(Preconditioner.jacobi)
+            solver.localMargin = 4
+            for i in range(1000):
+                if solver.solve() is not None and solver.error <= solver.get_rtol():
+                    break
+            shape = trimapPreview.rawView().shape
+            h, w = shape
+            # strokes at opposite corners are solved in windows of their own
+            trimapPreview.byteView()[2:8, 2:8] = Color.lightGreen.bgra()
+            trimapPreview.byteView()[
+                h - 8 : h - 2, w - 8 : w - 2
+            ] = Color.lightGreen.bgra()
+            for rect in [qtc.QRect(2, 2, 6, 6), qtc.QRect(w - 8, h - 8, 6, 6)]:
+                solver.updateSystem(AdjustingRect((0, 0), *shape).addRect(rect))
+            alpha = solver.get_alpha().copy().reshape(shape)
+            solver.solveLocal()
+            changed = solver.get_alpha().reshape(shape) != alpha
+            self.assertTrue(changed[:12, :12].any())
+            self.assertTrue(changed[h - 12 :, w - 12 :].any())
+            self.assertFalse(changed[12 : h - 12].any())
+
+            # a window above localFraction of the canvas is skipped
+            trimapPreview.byteView()[:, : w // 2] = Color.lightGreen.bgra()
+            solver.updateSystem(
+                AdjustingRect((0, 0), *shape).addRect(qtc.QRect(0, 0, w // 2, h))
+            )
+            alpha = solver.get_alpha().copy()
+            solver.solveLocal()
+            self.assertTrue(np.all(solver.get_alpha() == alpha))
+            solver.reset_pool()
+
+    def testResumeState(self):
+        canvas, trimapPreview, alphaMatte, continueEvent, eventQueue, solver = (
+            self.makeSolver()
+        )
+        path = tempfile.mkdtemp()
+        try:
+            for i in range(20):
+                solver.solve()
+            solver.publish(force=True)
+            solver.setProjectPath(path)
+            self.assertTrue(solver.diskCache.has("state", solver.get_state_key()))
+
+            resumed = Solver(
+                canvas, trimapPreview, alphaMatte, eventQueue, continueEvent
+            )
+            self.assertFalse(resumed.progressivePending)
+            self.assertTrue(
+                np.all(
+                    resumed.get_alpha()
+                    == solver.flatten2D(alphaMatte.rawView() / 255.0)
+                )
+            )
+            resumed.setProjectPath(path)
+            self.assertTrue(np.all(resumed.get_alpha() == solver.get_alpha()))
+            self.assertAlmostEqual(resumed.get_norm_r(), solver.get_norm_r())
+
+            trimapPreview.rawView()[0, 0] = 0
+            other = Solver(canvas, trimapPreview, alphaMatte, eventQueue, continueEvent)
+            quantized = other.get_alpha().copy()
+            other.setProjectPath(path)
+            self.assertTrue(np.all(other.get_alpha() == quantized))
+        finally:
+            shutil.rmtree(path)
+
+    def testHierarchyCache(self):
+        canvas, trimapPreview, alphaMatte, continueEvent, eventQueue, solver = (
+            self.makeSolver()
+        )
+        path = tempfile.mkdtemp()
+        try:
+            solver.setProjectPath(path)
+            solver.setProgressive(False)
+            for i in range(1000):
+                if solver.solve() is not None and solver.error <= solver.get_rtol():
+                    break
+            solver.solve()
+            # only the transfer operators are written once the tolerance is reached
+            self.assertTrue(solver.diskCache.has("transfer", solver.get_transfer_key()))
+            self.assertFalse(
+                solver.diskCache.has("hierarchy", solver.get_hierarchy_key())
+            )
+            eventQueue.put_nowait(UpdateEvent(Reason.projectSaved))
+            solver.processEvents(eventQueue)
+            self.assertTrue(
+                solver.diskCache.has("hierarchy", solver.get_hierarchy_key())
+            )
+
+            reopened = Solver(
+                canvas, trimapPreview, alphaMatte, eventQueue, continueEvent
+            )
+            reopened.setProjectPath(path)
+            cache = reopened.get_cache()
+            self.assertEqual(set(solver.get_cache().keys()), set(cache.keys()))
+            for shape in cache:
+                for expected, actual in zip(solver.get_cache()[shape], cache[shape]):
+                    if scipy.sparse.issparse(expected):
+                        self.assertEqual((expected != actual).nnz, 0)
+                    else:
+                        self.assertTrue(np.all(expected == actual))
+        finally:
+            shutil.rmtree(path)
+
+    def testBackgroundRebuild(self):
+        _, _, _, _, eventQueue, solver = self.makeSolver()
+        solver.setProgressive(False)
+        for i in range(10):
+            solver.solve()
+        L, A = solver.L, solver.A
+        eventQueue.put_nowait(UpdateEvent(Reason.radiusChanged, 2))
+        solver.processEvents(eventQueue)
+        self.assertIs(solver.L, L)
+        self.assertIs(solver.A, A)
+        solver.solve()
+        self.assertIsNotNone(solver.rebuild)
+        self.assertIs(solver.L, L)
+
+        solver.rebuild.result()
+        alpha = solver.get_alpha().copy()
+        solver.update_rebuild()
+        self.assertIsNone(solver.rebuild)
+        self.assertIsNot(solver.L, L)
+        self.assertIsNot(solver.A, A)
+        self.assertTrue(np.all(solver.get_alpha() == alpha))
+        self.assertGreater(len(solver.get_cache()), 0)
+        expected = make_laplacian(
+            Laplacian.closedForm, solver.canvas, solver.get_epsilon(), 2
+        )
+        self.assertEqual((solver.L != expected).nnz, 0)
+        for i in range(1000):
+            if solver.solve() is not None and solver.error <= solver.get_rtol():
+                break
+        self.assertLessEqual(solver.error, solver.get_rtol())
+
+        solver.setEpsilon(1e-6)
+        solver.solve()
+        solver.setEpsilon(1e-5)
+        self.assertTrue(solver.rebuildRequested)
+        self.assertIsNone(solver.rebuild)
+        solver.setStorage(Storage.stencil)
+        self.assertFalse(solver.is_rebuilding())
+        self.assertIsNone(solver.L)
+
+        solver.get_A()
+        solver.setBackgroundRebuild(False)
+        solver.setRadius(1)
+        self.assertIsNone(solver.L)
+        self.assertFalse(solver.is_rebuilding())
+
+    def testCancelConstruction(self):
+        canvas, _, _, _, eventQueue, solver = self.makeSolver()
+        solver.setProgressive(False)
+        solver.blockSize = 1000
+        progress = []
+        solver.constructionProgressed.connect(
+            lambda stage, fraction: progress.append((stage, fraction))
+        )
+        eventQueue.put_nowait(UpdateEvent(Reason.canvasChanged, canvas))
+        self.assertIsNone(solver.solve())
+        self.assertIsNone(solver.L)
+        self.assertEqual(progress, [("laplacian", 0.0)])
+
+        solver.processEvents(eventQueue)
+        progress.clear()
+        self.assertIsNotNone(solver.solve())
+        for stage in ["laplacian", "interpolation", "galerkin"]:
+            fractions = [f for s, f in progress if s == stage]
+            # interpolation and galerkin restart on each level of the hierarchy
+            self.assertGreater(len(fractions), 2)
+            self.assertTrue(all(0 < f <= 1 for f in fractions[1:]))
+            self.assertEqual(fractions[-1], 1.0)
+        expected = make_laplacian(
+            Laplacian.closedForm, solver.canvas, solver.get_epsilon(), 1
+        )
+        self.assertEqual((solver.L != expected).nnz, 0)
+
+        cancelled = Event()
+        cancelled.set()
+        self.assertRaises(
+            ConstructionCancelled,
+            solver.rebuild_system,
+            solver.get_system_settings(),
+            solver.canvas,
+            solver.get_kernel()[1],
+            solver.get_c().copy(),
+            None,
+            cancelled,
+        )
+        # outside of solve, constructions always finish
+        eventQueue.put_nowait(QuitEvent())
+        solver.reset_L()
+        self.assertIsNotNone(solver.get_L())
+        self.assertIsNone(solver.solve())
+
+    def testTelemetry(self):
+        _, _, _, _, _, solver = self.makeSolver()
+        solver.setProgressive(False)
+        records = []
+        solver.iterated.connect(records.append)
+        path = tempfile.mkdtemp()
+        try:
+            solver.setProjectPath(path)
+            solver.setTelemetryLog(True)
+            for i in range(5):
+                solver.solve()
+            solver.setTelemetryLog(False)
+            solver.solve()
+            self.assertEqual(len(records), 6)
+            self.assertEqual(
+                [record["iteration"] for record in records],
+                list(np.cumsum([record["iterations"] for record in records])),
+            )
+            for record in records:
+                for phase in ["spmv", "preconditioner", "reductions"]:
+                    self.assertGreater(record["time"][phase], 0)
+                self.assertGreater(record["gbps"], 0)
+                self.assertGreater(record["memory"]["L"], 0)
+                self.assertGreater(record["memory"]["A"], 0)
+                self.assertGreater(record["memory"]["cache"], 0)
+            with open(solver.get_telemetry_path()) as file:
+                logged = [json.loads(line) for line in file]
+            self.assertEqual(logged, records[:5])
+        finally:
+            shutil.rmtree(path)
+        self.assertAlmostEqual(
+            records[-1]["residual"], solver.get_norm_r() / solver.get_norm_b()
+        )
+
+    def testCalculatedWithoutError(self):
+        for disabled in [True, False]:
+            _, trimapPreview, _, _, _, solver = self.makeSolver()
+            solver.setProgressive(False)
+            if disabled:
+                solver.setRtol(0)
+            else:
+                trimapPreview.byteView()[:] = Color.lightRed.bgra()
+            calculated = []
+            records = []
+            solver.calculated.connect(lambda *args: calculated.append(args))
+            solver.iterated.connect(records.append)
+            for i in range(3):
+                solver.solve()
+            self.assertEqual(len(calculated), 3)
+            self.assertTrue(all(error is None for error, _ in calculated))
+            self.assertEqual(len(records), 3)
+            if not disabled:
+                self.assertTrue(all(record["residual"] is None for record in records))
+
+
+class TestSolverKernels(unittest.TestCase):
+    """Tests for the numba kernels which do not need the test images"""
+
+    allRows = np.empty((0,), dtype=np.int64)
+
+    def testCgdFused(self):
+        A = csr_matrix(np.array([[1, 0, 0], [1, 2, 0], [1, 2, 3]], dtype=np.float64))
+        A = (A.data, A.indices, A.indptr, A.shape)
+        b = np.array([1, 2, 3], dtype=np.float64)
+        alpha = np.array([0, 0, 0], dtype=np.float64)
+        r = b.copy()
+        p = r.copy()
+        Ap = np.empty_like(alpha)
+        norm_r = cgd_fused_(A, alpha, r, p, Ap, self.allRows)
+        self.assertTrue(np.allclose(norm_r, np.linalg.norm(r)))
+        alpha, r, p = np.round(alpha, 2), np.round(r, 2), np.round(p, 2)
+        self.assertTrue(np.all(np.allclose([0.26, 0.53, 0.79], alpha, 1e-2)))
+        self.assertTrue(np.all(np.allclose([0.74, 0.68, -0.7], r, 1e-2)))
+        self.assertTrue(np.all(np.allclose([0.84, 0.89, -0.38], p, 1e-2)))
+
+        cgd_fused_(A, alpha, r, p, Ap, self.allRows)
+        alpha, r, p = np.round(alpha, 2), np.round(r, 2), np.round(p, 2)
+        self.assertTrue(np.all(np.allclose([0.77, 1.07, 0.57], alpha, 1e-1)))
+        self.assertTrue(np.all(np.allclose([0.23, -0.89, -1.59], r, 1e-1)))
+        self.assertTrue(np.all(np.allclose([2.14, 1.13, -2.45], p, 1e-1)))
+
+    def testCgdPreconditionedFused(self):
+        for i in range(10):
+            B = np.random.rand(50, 50)
+            A = csr_matrix(B @ B.T + 50 * np.eye(50))
+            b = np.random.rand(50)
+            M_diag = 1 / A.diagonal()
+            alpha = np.zeros(50)
+            r = b.copy()
+            z = M_diag * r
+            alpha_fused, r_fused, z_fused = alpha.copy(), r.copy(), z.copy()
+            Az = np.empty_like(alpha)
+            for j in range(3):
+                Az_truth = A.dot(z)
+                rz = np.inner(r, z)
+                a = rz / np.inner(z, Az_truth)
+                alpha = alpha + a * z
+                r = r - a * Az_truth
+                s = M_diag * r
+                z = s + (np.inner(r, s) / rz) * z
+
+                rz_fused, norm_r = pcgd_fused_update_(
+                    (A.data, A.indices, A.indptr, A.shape),
+                    alpha_fused,
+                    r_fused,
+                    z_fused,
+                    Az,
+                    self.allRows,
+                )
+                pcgd_fused_direction_(
+                    r_fused, M_diag * r_fused, z_fused, rz_fused, self.allRows
+                )
+                self.assertTrue(np.allclose(np.linalg.norm(r), norm_r))
+            self.assertTrue(np.allclose(alpha, alpha_fused))
+            self.assertTrue(np.allclose(r, r_fused))
+            self.assertTrue(np.allclose(z, z_fused))
+
+    def makeSPDSystem(self, n=50):
+        B = np.random.rand(n, n)
+        A = csr_matrix(B @ B.T + n * np.eye(n))
+        return (A.data, A.indices, A.indptr, A.shape), np.random.rand(n)
+
+    def testCgdFusedChunk(self):
+        for i in range(10):
+            A, b = self.makeSPDSystem()
+            alpha, r, p, Ap = np.zeros_like(b), b.copy(), b.copy(), np.empty_like(b)
+            alpha_chunk, r_chunk, p_chunk = alpha.copy(), r.copy(), p.copy()
+            for j in range(5):
+                norm_r = cgd_fused_(A, alpha, r, p, Ap, self.allRows)
+            iterations, norm_r_chunk = cgd_fused_chunk_(
+                A,
+                alpha_chunk,
+                r_chunk,
+                p_chunk,
+                Ap,
+                np.linalg.norm(b),
+                0.0,
+                5,
+                self.allRows,
+            )
+            self.assertEqual(5, iterations)
+            self.assertTrue(np.allclose(norm_r, norm_r_chunk))
+            self.assertTrue(np.allclose(alpha, alpha_chunk))
+            self.assertTrue(np.allclose(p, p_chunk))
+
+            iterations, norm_r = cgd_fused_chunk_(
+                A,
+                alpha_chunk,
+                r_chunk,
+                p_chunk,
+                Ap,
+                norm_r_chunk,
+                1e-6,
+                1000,
+                self.allRows,
+            )
+            self.assertLess(iterations, 1000)
+            self.assertLessEqual(norm_r, 1e-6)
+
+    def testJacobiFusedChunk(self):
+        for i in range(10):
+            A, b = self.makeSPDSystem()
+            data, indices, indptr, shape = A
+            A_diag_inv = 1 / csr_matrix((data, indices, indptr), shape).diagonal()
+            alpha, r = np.zeros_like(b), b.copy()
+            z = A_diag_inv * r
+            Az, s = np.empty_like(b), np.empty_like(b)
+            iterations, norm_r = pcgd_jacobi_fused_chunk_(
+                A,
+                alpha,
+                r,
+                z,
+                A_diag_inv,
+                Az,
+                s,
+                np.linalg.norm(r),
+                1e-8,
+                1000,
+                self.allRows,
+            )
+            self.assertLess(iterations, 1000)
+            self.assertLessEqual(norm_r, 1e-8)
+            truth = csr_matrix((data, indices, indptr), shape).dot(alpha)
+            self.assertTrue(np.allclose(truth, b))
+
+    def testPublishTiles(self):
+        h, w, tileSize = 100, 70, 32
+        back = np.zeros((h, w), dtype=np.uint8)
+        front = np.zeros((h, w + 2), dtype=np.uint8)[:, :w]
+        alpha = np.zeros(h * w)
+        alpha.reshape(h, w)[40, 65] = 0.5
+        alpha.reshape(h, w)[99, 0] = 2.0
+        alpha.reshape(h, w)[0, 0] = -1.0
+        dirty = quantize_tiles_(alpha, back, tileSize)
+        self.assertEqual((4, 3), dirty.shape)
+        self.assertEqual([(1, 2), (3, 0)], list(zip(*np.nonzero(dirty))))
+        copy_tiles_(back, front, dirty, tileSize)
+        truth = np.clip(alpha.reshape(h, w) * 255.0, 0, 255).astype(np.uint8)
+        self.assertTrue(np.all(truth == front))
+        self.assertFalse(np.any(quantize_tiles_(alpha, back, tileSize)))
+
+    def testRectIndices(self):
+        truth = np.arange(100).reshape(10, 10)[2:4, 3:7].flatten()
+        self.assertTrue(np.all(truth == get_rect_indices_((3, 2, 7, 4), 10)))
+        self.assertEqual(0, get_rect_indices_((3, 2, 3, 4), 10).size)
+
+    def testSpRows(self):
+        for i in range(10):
+            mask = np.random.rand(30, 30) > 0.5
+            mat = csr_matrix(np.random.rand(30, 30) * np.logical_or(mask, mask.T))
+            mat.setdiag(np.random.rand(30))
+            rows = np.random.choice(30, 10, replace=False).astype(np.int64)
+            mat_tuple = (mat.data, mat.indices, mat.indptr, mat.shape)
+            self.assertTrue(
+                np.allclose(mat.diagonal()[rows], sp_diag_rows_(mat_tuple, rows))
+            )
+            ptr = sp_diag_ptr_(mat_tuple)
+            self.assertTrue(np.all(mat.diagonal() == mat.data[ptr]))
+            truth = np.asarray(mat.multiply(mat).sum(axis=0)).ravel()[rows]
+            self.assertTrue(np.all(truth == sp_cols_squared_sum_(mat_tuple, rows)))
+
+    def testSpSetRows(self):
+        for i in range(10):
+            mat = csr_matrix(np.random.rand(30, 30) * (np.random.rand(30, 30) > 0.5))
+            rows = np.random.choice(30, 10, replace=False).astype(np.int64)
+            values = mat[rows].multiply(np.random.rand(10, 30)).tocsr()
+            truth = mat.toarray()
+            truth[rows] = values.toarray()
+            values = (values.data, values.indices, values.indptr, values.shape)
+            self.assertTrue(
+                sp_set_rows_(
+                    (mat.data, mat.indices, mat.indptr, mat.shape), rows, values
+                )
+            )
+            self.assertTrue(np.allclose(truth, mat.toarray()))
+
+            values = csr_matrix(np.ones((10, 30)))
+            values = (values.data, values.indices, values.indptr, values.shape)
+            data = mat.data.copy()
+            self.assertFalse(
+                sp_set_rows_(
+                    (mat.data, mat.indices, mat.indptr, mat.shape), rows, values
+                )
+            )
+            self.assertTrue(np.all(data == mat.data))
+
+    def testSpResidualRows(self):
+        for i in range(10):
+            A, b = self.makeSPDSystem(30)
+            x = np.random.rand(30)
+            rows = np.random.choice(30, 10, replace=False).astype(np.int64)
+            truth = b - csr_matrix(A[:3], A[3]).dot(x)
+            self.assertTrue(np.allclose(truth[rows], sp_residual_rows_(A, b, x, rows)))
+            r = np.zeros(30)
+            sp_update_residual_rows_(A, b, x, rows, r)
+            self.assertTrue(np.all((b - sp_dot_(A, x))[rows] == r[rows]))
+            self.assertTrue(np.all(np.delete(r, rows) == 0))
+
+            m_diag = np.random.rand(30)
+            x_rows = spai0_step_rows_(A, b, x.copy(), m_diag, 2, rows)
+            for j in range(2):
+                x[rows] += m_diag[rows] * (b - csr_matrix(A[:3], A[3]).dot(x))[rows]
+            self.assertTrue(np.allclose(x, x_rows))
+
+    def testReducedSystem(self):
+        for i in range(10):
+            A, _ = self.makeSPDSystem(30)
+            L = csr_matrix(A[:3], A[3]).toarray()
+            unknown = np.random.rand(30) > 0.5
+            fixed = (np.random.rand(30) > 0.5) * np.logical_not(unknown) * 1.0
+            A_red = csr_matrix((make_reduced_data_(A, unknown), A[1], A[2]), A[3])
+            b_red = make_reduced_b_(A, unknown, fixed)
+            known = np.logical_not(unknown)
+            truth = np.eye(30)
+            truth[np.ix_(unknown, unknown)] = L[np.ix_(unknown, unknown)]
+            self.assertTrue(np.allclose(truth, A_red.toarray()))
+            self.assertTrue(np.all(fixed[known] == b_red[known]))
+            self.assertTrue(
+                np.allclose(
+                    -L[np.ix_(unknown, known)].dot(fixed[known]), b_red[unknown]
+                )
+            )
+
+            rows = np.flatnonzero(unknown)
+            alpha = fixed.copy()
+            r = b_red - A_red.dot(alpha)
+            p, Ap = r.copy(), np.zeros_like(r)
+            iterations, norm_r = cgd_fused_chunk_(
+                (A_red.data, A_red.indices, A_red.indptr, A_red.shape),
+                alpha,
+                r,
+                p,
+                Ap,
+                np.linalg.norm(r),
+                1e-10,
+                1000,
+                rows,
+            )
+            self.assertLessEqual(norm_r, 1e-10)
+            self.assertTrue(np.all(fixed[known] == alpha[known]))
+            self.assertTrue(np.all(Ap[known] == 0))
+            truth = np.linalg.solve(
+                L[np.ix_(unknown, unknown)],
+                -L[np.ix_(unknown, known)].dot(fixed[known]),
+            )
+            self.assertTrue(np.allclose(truth, alpha[unknown]))
+
+    def testCfLaplacianOperator(self):
+        image = np.random.rand(12, 17, 3)
+        c = 100.0 * (np.random.rand(12 * 17) > 0.5)
+        L = cf_laplacian(image, 1e-4, 1)
+        A = (L + scipy.sparse.diags(c)).tocsr()
+        op = CfLaplacianOperator(image, 1e-4, 1).shifted(c)
+        x = np.random.rand(12 * 17)
+        self.assertTrue(np.allclose(A.dot(x), op.dot(x)))
+        self.assertTrue(np.allclose(A.diagonal(), op.diagonal()))
+        truth = np.ravel(A.multiply(A).sum(axis=0))
+        self.assertTrue(np.allclose(truth, op.squaredSum()))
+
+        b = c * (np.random.rand(12 * 17) > 0.5)
+        for rect in [(0, 0, 3, 2), (6, 4, 9, 8), (14, 9, 17, 12)]:
+            rows = get_rect_indices_(rect, 17)
+            r = np.zeros_like(b)
+            op.updateResidualRows(b, x, rows, r)
+            self.assertTrue(np.allclose(r[rows], (b - A.dot(x))[rows]))
+            self.assertFalse(np.delete(r, rows).any())
+            self.assertTrue(np.allclose(op.rows(rows).toarray(), A[rows].toarray()))
+
+        alpha, r, p, Ap = np.zeros_like(b), b.copy(), b.copy(), np.empty_like(b)
+        iterations, norm_r = cf_cgd_fused_chunk_(
+            op.tuple(), alpha, r, p, Ap, np.linalg.norm(b), 1e-8, 1000
+        )
+        self.assertLess(iterations, 1000)
+        self.assertLessEqual(norm_r, 1e-8)
+        self.assertTrue(np.allclose(A.dot(alpha), b))
+
+        A_diag_inv = 1 / op.diagonal()
+        alpha, r = np.zeros_like(b), b.copy()
+        z, Az, s = A_diag_inv * r, np.empty_like(b), np.empty_like(b)
+        iterations, norm_r = cf_pcgd_jacobi_fused_chunk_(
+            op.tuple(),
+            alpha,
+            r,
+            z,
+            A_diag_inv,
+            Az,
+            s,
+            np.linalg.norm(r),
+            1e-8,
+            1000,
+        )
+        self.assertLess(iterations, 1000)
+        self.assertLessEqual(norm_r, 1e-8)
+        self.assertTrue(np.allclose(A.dot(alpha), b))
+
+    def testStencilMatrix(self):
+        image = np.random.rand(12, 17, 3)
+        c = 100.0 * (np.random.rand(12 * 17) > 0.5)
+        A = (cf_laplacian(image, 1e-4, 1) + scipy.sparse.diags(c)).tocsr()
+        stencil = StencilMatrix.fromCsr(A, 17, 2)
+        self.assertTrue(
+            np.allclose(
+                stencil.data,
+                CfLaplacianOperator(image, 1e-4, 1).shifted(c).toStencil().data,
+            )
+        )
+        x = np.random.rand(12 * 17)
+        self.assertTrue(np.allclose(A.dot(x), stencil.dot(x)))
+        self.assertTrue(np.all(A.diagonal() == stencil.diagonal()))
+        truth = np.ravel(A.multiply(A).sum(axis=0))
+        self.assertTrue(np.allclose(truth, stencil.squaredSum()))
+        rows = np.array([0, 5, 100, 12 * 17 - 1], dtype=np.int64)
+        self.assertTrue(np.allclose(truth[rows], stencil.squaredSum(rows)))
+        self.assertTrue(np.allclose(A[rows].toarray(), stencil.rows(rows).toarray()))
+        P = scipy.sparse.random(10, 12 * 17, 0.05, format="csr")
+        self.assertTrue(np.allclose(P.dot(A).toarray(), stencil.leftDot(P).toarray()))
+
+        b = c * (np.random.rand(12 * 17) > 0.5)
+        r = np.zeros_like(b)
+        stencil.updateResidualRows(b, x, rows, r)
+        self.assertTrue(np.allclose((b - A.dot(x))[rows], r[rows]))
+        m_diag = A.diagonal() / truth
+        truth = m_diag * b
+        for i in range(3):
+            truth = truth - m_diag * (A.dot(truth) - b)
+        self.assertTrue(np.allclose(truth, stencil.spai0Step(b, None, m_diag, 4)))
+
+        alpha, r, p, Ap = np.zeros_like(b), b.copy(), b.copy(), np.empty_like(b)
+        iterations, norm_r = st_cgd_fused_chunk_(
+            stencil.tuple(), alpha, r, p, Ap, np.linalg.norm(b), 1e-8, 1000
+        )
+        self.assertLess(iterations, 1000)
+        self.assertLessEqual(norm_r, 1e-8)
+        self.assertTrue(np.allclose(A.dot(alpha), b))
+
+        A = scipy.sparse.csr_matrix(([1.0], ([0], [50])), shape=(12 * 17, 12 * 17))
+        with self.assertRaises(ValueError):
+            StencilMatrix.fromCsr(A, 17, 2)
+
+    def testSinglePrecisionKernels(self):
+        for i in range(10):
+            A, b = self.makeSPDSystem()
+            data, indices, indptr, shape = A
+            A32 = (data.astype(np.float32), indices, indptr, shape)
+            x = np.random.rand(shape[0])
+            truth = sp_dot_(A, x)
+            self.assertEqual(np.float32, sp_dot_(A32, x.astype(np.float32)).dtype)
+            self.assertTrue(
+                np.allclose(truth, sp_dot_(A32, x.astype(np.float32)), rtol=1e-5)
+            )
+            self.assertEqual(np.float64, sp_dot_(A32, x).dtype)
+            self.assertTrue(np.allclose(truth, sp_dot_(A32, x), rtol=1e-6))
+
+            b = b.astype(np.float32)
+            alpha, r, p, Ap = np.zeros_like(b), b.copy(), b.copy(), np.empty_like(b)
+            iterations, norm_r = cgd_fused_chunk_(
+                A32, alpha, r, p, Ap, np.linalg.norm(b), 1e-5, 1000, self.allRows
+            )
+            self.assertLess(iterations, 1000)
+            self.assertEqual(np.float32, alpha.dtype)
+            self.assertTrue(
+                np.allclose(sp_dot_(A, alpha.astype(np.float64)), b, atol=1e-4)
+            )
+
+    def testInt64Indices(self):
+        for i in range(10):
+            A, b = self.makeSPDSystem()
+            data, indices, indptr, shape = A
+            A64 = (data, indices.astype(np.int64), indptr.astype(np.int64), shape)
+            x = np.random.rand(shape[0])
+            self.assertTrue(np.allclose(sp_dot_(A, x), sp_dot_(A64, x)))
+            self.assertTrue(np.allclose(sp_diag_(A), sp_diag_(A64)))
+            rows = np.random.choice(shape[0], 10, replace=False).astype(np.int64)
+            self.assertTrue(
+                np.allclose(sp_diag_rows_(A, rows), sp_diag_rows_(A64, rows))
+            )
+
+            alpha, r, p, Ap = np.zeros_like(b), b.copy(), b.copy(), np.empty_like(b)
+            iterations, norm_r = cgd_fused_chunk_(
+                A64, alpha, r, p, Ap, np.linalg.norm(b), 1e-10, 1000, self.allRows
+            )
+            self.assertLess(iterations, 1000)
+            self.assertTrue(np.allclose(sp_dot_(A, alpha), b))
+
+        image = np.random.rand(6, 7, 3)
+        L = cf_laplacian(image, 1e-7, 1)
+        L64 = csr_matrix(L)
+        L64.indices = L64.indices.astype(np.int64)
+        L64.indptr = L64.indptr.astype(np.int64)
+        self.assertTrue(
+            np.allclose(
+                StencilMatrix.fromCsr(L, 7, 2).data,
+                StencilMatrix.fromCsr(L64, 7, 2).data,
+            )
+        )
+
+    def testSchwarzTile(self):
+        for i in range(3):
+            h, w, radius, lmd = 30, 34, 1, 100.0
+            canvas = np.random.rand(h, w, 3)
+            trimapPreview = np.zeros((h, w, 4), dtype=np.uint8)
+            label = np.random.choice(3, (h, w), p=[0.2, 0.2, 0.6])
+            trimapPreview[:, :, 1][label == 0] = 255
+            trimapPreview[:, :, 2][label == 1] = 255
+            A = cf_laplacian(canvas, 1e-7, radius) + scipy.sparse.diags(
+                make_c_(trimapPreview, lmd)
+            )
+            truth = scipy.sparse.linalg.spsolve(
+                A.tocsc(), make_b_(trimapPreview, lmd)
+            ).reshape(h, w)
+
+            x0, y0, xn, yn = 5, 4, 27, 25
+            alpha = truth[y0:yn, x0:xn].copy()
+            alpha[2:-2, 2:-2] = np.random.rand(yn - y0 - 4, xn - x0 - 4)
+            core = (6, 6, 16, 15)
+            values, squaredResidual = solve_schwarz_tile(
+                canvas[y0:yn, x0:xn].copy(),
+                trimapPreview[y0:yn, x0:xn].copy(),
+                alpha,
+                (2, 2, 2, 2),
+                core,
+                Laplacian.closedForm,
+                1e-7,
+                radius,
+                lmd,
+                1e-12,
+                10000,
+            )
+            self.assertGreater(squaredResidual, 0)
+            self.assertTrue(
+                np.allclose(
+                    values, truth[y0 + 6 : y0 + 15, x0 + 6 : x0 + 16], atol=1e-6
+                )
+            )
+
+            values, squaredResidual = solve_schwarz_tile(
+                canvas.copy(),
+                trimapPreview.copy(),
+                truth.copy(),
+                (0, 0, 0, 0),
+                (0, 0, w, h),
+                Laplacian.closedForm,
+                1e-7,
+                radius,
+                lmd,
+                1e-12,
+                10000,
+            )
+            self.assertLess(squaredResidual, 1e-12)
+            self.assertTrue(np.allclose(values, truth, atol=1e-6))
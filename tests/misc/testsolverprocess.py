@@ -0,0 +1,98 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+import unittest
+import time
+import numpy as np
+from queue import Queue
+from multiprocessing.shared_memory import SharedMemory
+from model.misc import Image, SharedImage, SolverProcess
+from model.misc.solverprocess import sharedContinueEvent, context
+from model.events import UpdateEvent, QuitEvent
+from model.enum import Reason
+from model.enum.color import Color
+from PyQt5 import QtCore as qtc
+from PyQt5 import QtGui as qtg
+
+
+def makeCanvas(size, seed):
+    rng = np.random.default_rng(seed)
+    canvas = Image.full(size, Color.black.value)
+    view = canvas.byteView()
+    view[:, : size.width() // 2, :3] = [40, 60, 200]
+    view[:, size.width() // 2 :, :3] = [200, 90, 30]
+    view[:, :, :3] = np.clip(
+        view[:, :, :3] + rng.normal(0, 5, view[:, :, :3].shape), 0, 255
+    )
+    return canvas
+
+
+class TestSolverProcess(unittest.TestCase):
+    def setUp(self):
+        self.size = qtc.QSize(64, 48)
+        trimapPreview = Image.full(self.size, Color.lightRed.value)
+        trimapPreview.byteView()[:, 8:56] = Color.lightBlue.bgra()
+        alphaMatte = Image.full(self.size, qtc.Qt.black, qtg.QImage.Format_Grayscale8)
+        self.canvas = SharedImage.share(makeCanvas(self.size, 0))
+        self.trimapPreview = SharedImage.share(trimapPreview)
+        self.alphaMatte = SharedImage.share(alphaMatte, context.RLock())
+        self.eventQueue = Queue()
+        self.continueEvent = sharedContinueEvent()
+        self.solver = SolverProcess(
+            self.canvas,
+            self.trimapPreview,
+            self.alphaMatte,
+            self.eventQueue,
+            self.continueEvent,
+        )
+
+    def tearDown(self):
+        if self.solver.process.is_alive():
+            self.solver.process.kill()
+        for image in [self.canvas, self.trimapPreview, self.alphaMatte]:
+            image.release()
+
+    def waitFor(self, condition, seconds=120):
+        deadline = time.time() + seconds
+        while not condition():
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.05)
+
+    def assertUnlinked(self, image):
+        with self.assertRaises(FileNotFoundError):
+            SharedMemory(name=image.descriptor()[0])
+
+    def testSolverProcess(self):
+        calculated = []
+        self.solver.calculated.connect(
+            lambda *args: calculated.append(args), qtc.Qt.DirectConnection
+        )
+        self.solver.start()
+        self.waitFor(lambda: calculated)
+        self.assertFalse(self.alphaMatte.rawView().any())
+
+        # the process reads the trimap that is painted in this process
+        self.trimapPreview.byteView()[:, :8] = Color.lightGreen.bgra()
+        self.eventQueue.put_nowait(
+            UpdateEvent(Reason.trimapChanged, qtc.QRect(0, 0, 8, 48))
+        )
+        self.continueEvent.set()
+        self.waitFor(lambda: self.alphaMatte.rawView()[:, 8:24].mean() > 200)
+        self.assertLess(self.alphaMatte.rawView()[:, 40:56].mean(), 50)
+
+        # the block of a replaced image is removed once the new one has been sent
+        previous = self.canvas
+        self.canvas = SharedImage.share(makeCanvas(self.size, 1))
+        self.eventQueue.put_nowait(UpdateEvent(Reason.canvasChanged, self.canvas))
+        self.continueEvent.set()
+        self.waitFor(lambda: self.solver.images[Reason.canvasChanged] is self.canvas)
+        self.assertUnlinked(previous)
+
+        self.eventQueue.put_nowait(QuitEvent())
+        self.continueEvent.set()
+        self.solver.join()
+        self.assertFalse(self.solver.process.is_alive())
+        self.assertEqual(self.solver.process.exitcode, 0)
+        self.assertFalse(self.solver.receiver.is_alive())
+        for image in [self.canvas, self.trimapPreview, self.alphaMatte]:
+            image.release()
+            self.assertUnlinked(image)
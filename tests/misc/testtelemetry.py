@@ -0,0 +1,66 @@
+# Copyright (C) 2020-2021  Burak Martin (see 'AUTHOR' for full notice)
+
+import unittest
+import tempfile
+import shutil
+import json
+import os
+import time
+import numpy as np
+from model.misc import Telemetry, CfLaplacianOperator
+from model.misc.telemetry import nbytes, memory
+from scipy.sparse import csr_matrix
+
+
+class TestTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.telemetry = Telemetry()
+
+    def tearDown(self):
+        self.telemetry.close()
+        shutil.rmtree(self.path)
+
+    def testMeasure(self):
+        with self.telemetry.measure("preconditioner"):
+            time.sleep(0.02)
+            with self.telemetry.measure("spmv"):
+                time.sleep(0.05)
+        times = self.telemetry.times
+        self.assertGreaterEqual(times["spmv"], 0.05)
+        self.assertGreaterEqual(times["preconditioner"], 0.02)
+        self.assertLess(times["preconditioner"], 0.05)
+        self.assertEqual(times["reductions"], 0)
+
+    def testRecord(self):
+        logPath = os.path.join(self.path, "telemetry.jsonl")
+        self.telemetry.open(logPath)
+        with self.telemetry.measure("spmv"):
+            time.sleep(0.01)
+        self.telemetry.transferred(10**6)
+        first = self.telemetry.record(3, 0.5, {"L": 1})
+        self.assertEqual(first["iteration"], 3)
+        self.assertGreater(first["gbps"], 0)
+        self.assertGreaterEqual(first["time"]["total"], first["time"]["spmv"])
+        second = self.telemetry.record(2, 0.25, {"L": 1})
+        self.assertEqual(second["iteration"], 5)
+        self.assertEqual(second["gbps"], 0)
+        self.assertEqual(second["time"]["spmv"], 0)
+        self.telemetry.close()
+        self.telemetry.record(1, 0.125, {})
+        with open(logPath) as file:
+            self.assertEqual([json.loads(line) for line in file], [first, second])
+
+    def testMemory(self):
+        A = csr_matrix(np.eye(10))
+        size = A.data.nbytes + A.indices.nbytes + A.indptr.nbytes
+        self.assertEqual(nbytes(A), size)
+        self.assertEqual(nbytes(A, (A, None)), 2 * size)
+        self.assertEqual(memory(L=A, A=A, cache=None), {"L": size, "A": 0, "cache": 0})
+
+        image = np.random.rand(6, 5, 3)
+        L = CfLaplacianOperator(image, 1e-7, 1)
+        shifted = L.shifted(np.ones(30))
+        result = memory(L=L, A=shifted)
+        self.assertEqual(result["A"], shifted.c.nbytes + shifted.ab.nbytes)
+        self.assertEqual(result["L"], nbytes(L))
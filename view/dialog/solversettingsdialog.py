@@ -2,14 +2,16 @@
 
 from PyQt5 import QtWidgets as qtw
 from PyQt5 import QtCore as qtc
+import os
 
 from view.widget import FormWidget
 from view.groupbox import VGroupBox
-from model.enum import Method, Preconditioner, Kernel
+from model.enum import Method, Preconditioner, Kernel, Storage, Laplacian
 from strings import *
 
 
 class SolverSettingsDialog(qtw.QDialog):
+    laplacianChanged = qtc.pyqtSignal(Laplacian)
     methodChanged = qtc.pyqtSignal(Method)
     radiusChanged = qtc.pyqtSignal(int)
     epsilonChanged = qtc.pyqtSignal(float)
@@ -20,6 +22,20 @@ class SolverSettingsDialog(qtw.QDialog):
     postIterChanged = qtc.pyqtSignal(int)
     preIterChanged = qtc.pyqtSignal(int)
     printErrorChanged = qtc.pyqtSignal(bool)
+    fusedChanged = qtc.pyqtSignal(bool)
+    chunkedChanged = qtc.pyqtSignal(bool)
+    timeBudgetChanged = qtc.pyqtSignal(int)
+    reducedChanged = qtc.pyqtSignal(bool)
+    storageChanged = qtc.pyqtSignal(Storage)
+    singlePrecisionChanged = qtc.pyqtSignal(bool)
+    refinementChanged = qtc.pyqtSignal(bool)
+    progressiveChanged = qtc.pyqtSignal(bool)
+    previewChanged = qtc.pyqtSignal(bool)
+    localSolveChanged = qtc.pyqtSignal(bool)
+    telemetryLogChanged = qtc.pyqtSignal(bool)
+    backgroundRebuildChanged = qtc.pyqtSignal(bool)
+    schwarzTileSizeChanged = qtc.pyqtSignal(int)
+    schwarzWorkersChanged = qtc.pyqtSignal(int)
     hasVcycle = qtc.pyqtSignal(bool)
 
     def __init__(self):
@@ -35,15 +51,36 @@ class SolverSettingsDialog(qtw.QDialog):
         self.tabWidget = qtw.QTabWidget(self)
         self.setupGeneralTab()
         self.setupMethodTab()
+        self.setupPerformanceTab()
         self.layout().addWidget(self.tabWidget)
 
     def setupGeneralTab(self):
         formWidget = FormWidget()
         self.laplacianNameComboBox = formWidget.addComboBox(
-            "Laplacian", ["Closed-Form-Laplacian"], [None], laplacianToolTip
+            "Laplacian",
+            [
+                "Closed-Form-Laplacian",
+                "KNN-Laplacian",
+                "Random-Walk-Laplacian",
+                "Learning-Based-Laplacian",
+                "Large-Kernel-Laplacian",
+            ],
+            [
+                Laplacian.closedForm,
+                Laplacian.knn,
+                Laplacian.randomWalk,
+                Laplacian.learningBased,
+                Laplacian.largeKernel,
+            ],
+            laplacianToolTip,
+            0,
         )
         self.methodComboBox = formWidget.addComboBox(
-            "Method", ["cgd", "vcycle"], [Method.cgd, Method.vcycle], methodToolTip, 0
+            "Method",
+            ["cgd", "vcycle", "schwarz"],
+            [Method.cgd, Method.vcycle, Method.schwarz],
+            methodToolTip,
+            0,
         )
         self.radiusSpinBox = formWidget.addSpinBox(
             "Radius", 1, 5, 1, radiusToolTip, wrapping=False
@@ -64,7 +101,13 @@ class SolverSettingsDialog(qtw.QDialog):
         self.lambdaSpinBox = formWidget.addSpinBox(
             "Lambda", 1, 100000, 100, lambdaToolTip, wrapping=False
         )
+        self.reducedCheckBox = formWidget.addCheckBox("Reduced System", checked=False)
+        self.reducedCheckBox.setToolTip(reducedToolTip)
         self.printErrorCheckBox = formWidget.addCheckBox("Print Error", checked=False)
+        self.telemetryLogCheckBox = formWidget.addCheckBox(
+            "Telemetry Log", checked=False
+        )
+        self.telemetryLogCheckBox.setToolTip(telemetryLogToolTip)
         self.tabWidget.addTab(formWidget, "General")
 
     def setupMethodTab(self):
@@ -96,15 +139,71 @@ class SolverSettingsDialog(qtw.QDialog):
             "Post-Iterations", 1, 1000, 1, postIterToolTip, wrapping=False
         )
         vcycleGroupBox.addWidget(vcycleFormWidget)
+        schwarzFormWidget = FormWidget()
+        schwarzGroupBox = VGroupBox("Schwarz")
+        self.schwarzTileSizeSpinBox = schwarzFormWidget.addSpinBox(
+            "Tile Size", 64, 8192, 512, schwarzTileSizeToolTip, wrapping=False
+        )
+        self.schwarzWorkersSpinBox = schwarzFormWidget.addSpinBox(
+            "Workers", 1, 256, os.cpu_count(), schwarzWorkersToolTip, wrapping=False
+        )
+        schwarzGroupBox.addWidget(schwarzFormWidget)
         container.layout().addWidget(cgdGroupBox)
         container.layout().addWidget(vcycleGroupBox)
+        container.layout().addWidget(schwarzGroupBox)
         self.tabWidget.addTab(container, "Solver")
 
+    def setupPerformanceTab(self):
+        formWidget = FormWidget()
+        self.fusedCheckBox = formWidget.addCheckBox("Fused CGD", checked=True)
+        self.fusedCheckBox.setToolTip(fusedToolTip)
+        self.chunkedCheckBox = formWidget.addCheckBox(
+            "Chunked Iterations", checked=True
+        )
+        self.chunkedCheckBox.setToolTip(chunkedToolTip)
+        self.timeBudgetSpinBox = formWidget.addSpinBox(
+            "Time Budget (ms)", 1, 1000, 16, timeBudgetToolTip, wrapping=False
+        )
+        self.storageComboBox = formWidget.addComboBox(
+            "Storage",
+            ["csr", "stencil", "matrix free"],
+            [Storage.csr, Storage.stencil, Storage.matrixFree],
+            storageToolTip,
+        )
+        self.singlePrecisionCheckBox = formWidget.addCheckBox(
+            "Single Precision", checked=False
+        )
+        self.singlePrecisionCheckBox.setToolTip(singlePrecisionToolTip)
+        self.refinementCheckBox = formWidget.addCheckBox(
+            "Double Precision Refinement", checked=True
+        )
+        self.refinementCheckBox.setToolTip(refinementToolTip)
+        self.progressiveCheckBox = formWidget.addCheckBox(
+            "Progressive Solve", checked=True
+        )
+        self.progressiveCheckBox.setToolTip(progressiveToolTip)
+        self.previewCheckBox = formWidget.addCheckBox(
+            "Guided Filter Preview", checked=True
+        )
+        self.previewCheckBox.setToolTip(previewToolTip)
+        self.localSolveCheckBox = formWidget.addCheckBox(
+            "Local Pre-Solve", checked=True
+        )
+        self.localSolveCheckBox.setToolTip(localSolveToolTip)
+        self.backgroundRebuildCheckBox = formWidget.addCheckBox(
+            "Background Rebuild", checked=True
+        )
+        self.backgroundRebuildCheckBox.setToolTip(backgroundRebuildToolTip)
+        self.tabWidget.addTab(formWidget, "Performance")
+
     def setupConnections(self):
         self.buttonBox.button(qtw.QDialogButtonBox.Ok).pressed.connect(self.accept)
         self.buttonBox.button(qtw.QDialogButtonBox.RestoreDefaults).pressed.connect(
             self.restoreDefaults
         )
+        self.laplacianNameComboBox.currentIndexChanged.connect(
+            lambda i: self.laplacianChanged.emit(self.laplacianNameComboBox.itemData(i))
+        )
         self.methodComboBox.currentIndexChanged.connect(
             lambda i: self.methodChanged.emit(self.methodComboBox.itemData(i))
         )
@@ -125,6 +224,26 @@ class SolverSettingsDialog(qtw.QDialog):
         self.postIterSpinBox.valueChanged.connect(self.postIterChanged.emit)
         self.preIterSpinBox.valueChanged.connect(self.preIterChanged.emit)
         self.printErrorCheckBox.clicked.connect(self.printErrorChanged.emit)
+        self.telemetryLogCheckBox.toggled.connect(self.telemetryLogChanged.emit)
+        self.fusedCheckBox.toggled.connect(self.fusedChanged.emit)
+        self.chunkedCheckBox.toggled.connect(self.chunkedChanged.emit)
+        self.timeBudgetSpinBox.valueChanged.connect(self.timeBudgetChanged.emit)
+        self.reducedCheckBox.toggled.connect(self.reducedChanged.emit)
+        self.storageComboBox.currentIndexChanged.connect(
+            lambda i: self.storageChanged.emit(self.storageComboBox.itemData(i))
+        )
+        self.singlePrecisionCheckBox.toggled.connect(self.singlePrecisionChanged.emit)
+        self.refinementCheckBox.toggled.connect(self.refinementChanged.emit)
+        self.progressiveCheckBox.toggled.connect(self.progressiveChanged.emit)
+        self.previewCheckBox.toggled.connect(self.previewChanged.emit)
+        self.localSolveCheckBox.toggled.connect(self.localSolveChanged.emit)
+        self.backgroundRebuildCheckBox.toggled.connect(
+            self.backgroundRebuildChanged.emit
+        )
+        self.schwarzTileSizeSpinBox.valueChanged.connect(
+            self.schwarzTileSizeChanged.emit
+        )
+        self.schwarzWorkersSpinBox.valueChanged.connect(self.schwarzWorkersChanged.emit)
 
     def emitHasVcycle(self):
         preconditioner = self.preconditionerComboBox.itemData(
@@ -152,10 +271,24 @@ class SolverSettingsDialog(qtw.QDialog):
         self.epsilonSpinBox.setValue(0.0000001)
         self.toleranceSpinBox.setValue(7)
         self.lambdaSpinBox.setValue(100)
+        self.reducedCheckBox.setChecked(False)
         self.preconditionerComboBox.setCurrentIndex(2)
         self.kernelComboBox.setCurrentIndex(1)
         self.preIterSpinBox.setValue(1)
         self.postIterSpinBox.setValue(1)
+        self.schwarzTileSizeSpinBox.setValue(512)
+        self.schwarzWorkersSpinBox.setValue(os.cpu_count())
+        self.fusedCheckBox.setChecked(True)
+        self.chunkedCheckBox.setChecked(True)
+        self.timeBudgetSpinBox.setValue(16)
+        self.storageComboBox.setCurrentIndex(0)
+        self.singlePrecisionCheckBox.setChecked(False)
+        self.refinementCheckBox.setChecked(True)
+        self.progressiveCheckBox.setChecked(True)
+        self.previewCheckBox.setChecked(True)
+        self.localSolveCheckBox.setChecked(True)
+        self.backgroundRebuildCheckBox.setChecked(True)
+        self.telemetryLogCheckBox.setChecked(False)
 
     def logIncreaseEpsilon(self):
         self.epsilonSpinBox.setValue(self.epsilonSpinBox.value() * 10.0)
@@ -184,7 +184,9 @@ class RightGraphicsScene(BaseScene):
             if self.hovered():
                 painter.drawPolygon(self.project.cutoutRect().polygonF())
         else:
-            painter.drawImage(0, 0, self.project.alphaMatte())
+            alphaMatte = self.project.alphaMatte()
+            with alphaMatte.lock():
+                painter.drawImage(0, 0, alphaMatte)
 
     def restartTimer(self):
         timer = self.timer()
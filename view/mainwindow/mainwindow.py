@@ -163,8 +163,14 @@ class MainWindow(qtw.QMainWindow):
         self.controller.calculated.connect(self.setProgressBarValue)
         self.controller.toleranceReached.connect(self.setMaximumProgressBarValue)
         self.controller.toleranceChanged.connect(self.calculationProgressBar.reset)
+        self.controller.memoryEstimated.connect(self.showMemoryEstimate)
+        self.controller.laplacianBuilt.connect(self.showLaplacianBuilt)
+        self.controller.constructionProgressed.connect(self.showConstructionProgress)
 
         """ Dialog """
+        self.solverSettingsDialog.laplacianChanged.connect(
+            self.controller.changeLaplacian
+        )
         self.solverSettingsDialog.methodChanged.connect(self.controller.changeMethod)
         self.solverSettingsDialog.radiusChanged.connect(self.controller.changeRadius)
         self.solverSettingsDialog.epsilonChanged.connect(self.controller.changeEpsilon)
@@ -186,6 +192,38 @@ class MainWindow(qtw.QMainWindow):
         self.solverSettingsDialog.printErrorChanged.connect(
             self.controller.changePrintError
         )
+        self.solverSettingsDialog.telemetryLogChanged.connect(
+            self.controller.changeTelemetryLog
+        )
+        self.solverSettingsDialog.fusedChanged.connect(self.controller.changeFused)
+        self.solverSettingsDialog.chunkedChanged.connect(self.controller.changeChunked)
+        self.solverSettingsDialog.timeBudgetChanged.connect(
+            self.controller.changeTimeBudget
+        )
+        self.solverSettingsDialog.reducedChanged.connect(self.controller.changeReduced)
+        self.solverSettingsDialog.storageChanged.connect(self.controller.changeStorage)
+        self.solverSettingsDialog.singlePrecisionChanged.connect(
+            self.controller.changeSinglePrecision
+        )
+        self.solverSettingsDialog.refinementChanged.connect(
+            self.controller.changeRefinement
+        )
+        self.solverSettingsDialog.progressiveChanged.connect(
+            self.controller.changeProgressive
+        )
+        self.solverSettingsDialog.previewChanged.connect(self.controller.changePreview)
+        self.solverSettingsDialog.localSolveChanged.connect(
+            self.controller.changeLocalSolve
+        )
+        self.solverSettingsDialog.backgroundRebuildChanged.connect(
+            self.controller.changeBackgroundRebuild
+        )
+        self.solverSettingsDialog.schwarzTileSizeChanged.connect(
+            self.controller.changeSchwarzTileSize
+        )
+        self.solverSettingsDialog.schwarzWorkersChanged.connect(
+            self.controller.changeSchwarzWorkers
+        )
         """ Filehandler """
         self.fileHandler.finished.connect(self.showStatusMessage)
         self.fileHandler.error.connect(showWarning)
@@ -603,5 +641,17 @@ class MainWindow(qtw.QMainWindow):
             f"Epsilon: {self.solverSettingsDialog.epsilonSpinBox.value()}"
         )
 
+    def showMemoryEstimate(self, size):
+        self.showStatusMessage(f"Estimated Memory: {size / 2 ** 30:.2f} GiB")
+
+    def showLaplacianBuilt(self, laplacian, seconds, nnz):
+        entries = "matrix free" if nnz is None else f"{nnz} nonzeros"
+        self.showStatusMessage(
+            f"{laplacian.name} Laplacian: {seconds:.2f} s, {entries}"
+        )
+
+    def showConstructionProgress(self, stage, fraction):
+        self.showStatusMessage(f"Building {stage}: {fraction:.0%}")
+
     def showStatusMessage(self, text, duration=3000):
         self.statusBar().showMessage(text, duration)